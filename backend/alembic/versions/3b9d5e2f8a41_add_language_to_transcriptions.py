@@ -0,0 +1,42 @@
+"""add language to transcriptions
+
+Revision ID: 3b9d5e2f8a41
+Revises: 7606299effe3
+Create Date: 2026-10-19 09:12:31.204518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b9d5e2f8a41'
+down_revision: Union[str, None] = '7606299effe3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'transcriptions',
+        sa.Column('language', sa.String(10), nullable=True)
+    )
+    op.add_column(
+        'transcriptions',
+        sa.Column('language_probability', sa.Float, nullable=True)
+    )
+    # filter transcriptions by language on list and search endpoints
+    op.create_index(
+        'ix_transcriptions_language', 'transcriptions', ['language']
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_transcriptions_language', table_name='transcriptions')
+    with op.batch_alter_table('transcriptions') as batch_op:
+        batch_op.drop_column('language_probability')
+        batch_op.drop_column('language')
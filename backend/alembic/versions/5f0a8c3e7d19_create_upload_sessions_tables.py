@@ -0,0 +1,68 @@
+"""create upload sessions tables
+
+Revision ID: 5f0a8c3e7d19
+Revises: c4e7a19d2b56
+Create Date: 2026-10-19 14:26:05.671193
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5f0a8c3e7d19'
+down_revision: Union[str, None] = 'c4e7a19d2b56'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'upload_sessions',
+        sa.Column('id', sa.String(32), primary_key=True),
+        sa.Column('file_name', sa.String(100), nullable=False),
+        sa.Column('content_type', sa.String(50), nullable=False),
+        sa.Column('total_size', sa.BigInteger, nullable=False),
+        sa.Column('sha256', sa.String(64)),
+        sa.Column('status', sa.String(20), nullable=False),
+        sa.Column('early_status', sa.String(20)),
+        sa.Column('early_text', sa.UnicodeText),
+        sa.Column('early_language', sa.String(10)),
+        sa.Column('early_language_probability', sa.Float),
+        sa.Column(
+            'transcription_id',
+            sa.Integer,
+            sa.ForeignKey('transcriptions.id')
+        ),
+        sa.Column('created_at', sa.DateTime, nullable=False),
+        sa.Column('updated_at', sa.DateTime, nullable=False),
+    )
+    # one row per received chunk, inserted only, so parallel chunk uploads
+    # never update the same row
+    op.create_table(
+        'upload_chunks',
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column(
+            'session_id',
+            sa.String(32),
+            sa.ForeignKey('upload_sessions.id', ondelete='CASCADE'),
+            nullable=False
+        ),
+        sa.Column('offset', sa.BigInteger, nullable=False),
+        sa.Column('length', sa.Integer, nullable=False),
+        sa.Column('sha256', sa.String(64), nullable=False),
+        sa.Column('created_at', sa.DateTime, nullable=False),
+    )
+    op.create_index(
+        'ix_upload_chunks_session_id', 'upload_chunks', ['session_id']
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_upload_chunks_session_id', table_name='upload_chunks')
+    op.drop_table('upload_chunks')
+    op.drop_table('upload_sessions')
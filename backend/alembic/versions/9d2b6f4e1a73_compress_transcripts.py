@@ -0,0 +1,55 @@
+"""compress transcripts
+
+Revision ID: 9d2b6f4e1a73
+Revises: 5f0a8c3e7d19
+Create Date: 2026-10-19 16:02:41.318520
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d2b6f4e1a73'
+down_revision: Union[str, None] = '5f0a8c3e7d19'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# start of every zstd frame
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # existing rows are compressed separately, with
+    # `python -m htx_transcriber.compress_transcripts train` and `convert`
+    op.create_table(
+        'transcript_dictionaries',
+        sa.Column('id', sa.Integer, primary_key=True, autoincrement=False),
+        sa.Column('data', sa.LargeBinary, nullable=False),
+        sa.Column('sample_count', sa.Integer, nullable=False),
+        sa.Column('created_at', sa.DateTime, nullable=False),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # compressed rows can not be read without their dictionaries
+    transcriptions = sa.table(
+        'transcriptions', sa.column('transcribed_text', sa.LargeBinary)
+    )
+    compressed = op.get_bind().execute(
+        sa.select(sa.literal(1)).where(
+            sa.func.substr(transcriptions.c.transcribed_text, 1, 4)
+            == ZSTD_MAGIC
+        ).limit(1)
+    ).first()
+    if compressed:
+        raise RuntimeError(
+            "Transcripts are compressed, run `python -m "
+            "htx_transcriber.compress_transcripts convert --decompress` "
+            "before downgrading"
+        )
+    op.drop_table('transcript_dictionaries')
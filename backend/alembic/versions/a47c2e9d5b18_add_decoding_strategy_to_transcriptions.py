@@ -0,0 +1,40 @@
+"""add decoding strategy to transcriptions
+
+Revision ID: a47c2e9d5b18
+Revises: e81c4a7b3f20
+Create Date: 2026-10-19 21:05:37.184203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a47c2e9d5b18'
+down_revision: Union[str, None] = 'e81c4a7b3f20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing rows were decoded greedily, but without a recorded tier
+    op.add_column(
+        'transcriptions', sa.Column('decoding_strategy', sa.String(50))
+    )
+    op.add_column('transcriptions', sa.Column('quality_tier', sa.String(20)))
+    op.add_column('transcriptions', sa.Column('latency_budget', sa.Float))
+    op.add_column('transcriptions', sa.Column('latency_seconds', sa.Float))
+    op.add_column('transcriptions', sa.Column('sla_met', sa.Boolean))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('transcriptions') as batch_op:
+        batch_op.drop_column('sla_met')
+        batch_op.drop_column('latency_seconds')
+        batch_op.drop_column('latency_budget')
+        batch_op.drop_column('quality_tier')
+        batch_op.drop_column('decoding_strategy')
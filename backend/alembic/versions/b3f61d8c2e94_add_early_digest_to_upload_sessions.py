@@ -0,0 +1,32 @@
+"""add early digest to upload sessions
+
+Revision ID: b3f61d8c2e94
+Revises: a47c2e9d5b18
+Create Date: 2026-10-19 10:12:08.451937
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3f61d8c2e94'
+down_revision: Union[str, None] = 'a47c2e9d5b18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Early transcripts without a digest are not reused on completion
+    op.add_column('upload_sessions', sa.Column('early_bytes', sa.BigInteger))
+    op.add_column('upload_sessions', sa.Column('early_sha256', sa.String(64)))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('upload_sessions') as batch_op:
+        batch_op.drop_column('early_sha256')
+        batch_op.drop_column('early_bytes')
@@ -0,0 +1,40 @@
+"""add audio metadata to transcriptions
+
+Revision ID: c4e7a19d2b56
+Revises: 3b9d5e2f8a41
+Create Date: 2026-10-19 11:02:47.918342
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e7a19d2b56'
+down_revision: Union[str, None] = '3b9d5e2f8a41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Read from the file headers, nullable for rows created before probing
+    op.add_column(
+        'transcriptions', sa.Column('audio_container', sa.String(10))
+    )
+    op.add_column('transcriptions', sa.Column('audio_codec', sa.String(20)))
+    op.add_column('transcriptions', sa.Column('duration', sa.Float))
+    op.add_column('transcriptions', sa.Column('sample_rate', sa.Integer))
+    op.add_column('transcriptions', sa.Column('channels', sa.Integer))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('transcriptions') as batch_op:
+        batch_op.drop_column('channels')
+        batch_op.drop_column('sample_rate')
+        batch_op.drop_column('duration')
+        batch_op.drop_column('audio_codec')
+        batch_op.drop_column('audio_container')
@@ -0,0 +1,44 @@
+"""add audio archive to transcriptions
+
+Revision ID: e81c4a7b3f20
+Revises: 9d2b6f4e1a73
+Create Date: 2026-10-19 17:40:12.506831
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e81c4a7b3f20'
+down_revision: Union[str, None] = '9d2b6f4e1a73'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing uploads stay as they are until compacted
+    op.add_column(
+        'transcriptions', sa.Column('archive_file_name', sa.String(150))
+    )
+    op.add_column(
+        'transcriptions', sa.Column('archive_format', sa.String(10))
+    )
+    op.add_column(
+        'transcriptions', sa.Column('original_size', sa.BigInteger)
+    )
+    op.add_column('transcriptions', sa.Column('archive_size', sa.BigInteger))
+    op.add_column('transcriptions', sa.Column('archived_at', sa.DateTime))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('transcriptions') as batch_op:
+        batch_op.drop_column('archived_at')
+        batch_op.drop_column('archive_size')
+        batch_op.drop_column('original_size')
+        batch_op.drop_column('archive_format')
+        batch_op.drop_column('archive_file_name')
@@ -0,0 +1,63 @@
+import asyncio
+import secrets
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from fastapi.responses import PlainTextResponse
+from htx_transcriber.services.profiler import (
+    ProfilerBusy,
+    profiler,
+    route_labels,
+)
+from htx_transcriber.settings import (
+    ADMIN_TOKEN,
+    PROFILER_INTERVAL,
+    MAX_PROFILE_SECONDS,
+)
+
+router = APIRouter()
+
+# Shortest sampling interval accepted, in seconds
+MIN_PROFILER_INTERVAL = 0.001
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not ADMIN_TOKEN:
+        # Admin endpoints do not exist unless a token is configured
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_admin_token is None or \
+            not secrets.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@router.post("/admin/profile", dependencies=[Depends(require_admin)])
+async def profile(
+    request: Request,
+    seconds: float = 10,
+    requests: Optional[int] = None,
+    interval: float = PROFILER_INTERVAL,
+    format: Literal["collapsed", "speedscope"] = "collapsed"
+):
+    """Profile this worker for `seconds`, or until `requests` complete."""
+    if not 0 < seconds <= MAX_PROFILE_SECONDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"seconds must be between 0 and {MAX_PROFILE_SECONDS}"
+        )
+    if requests is not None and requests < 1:
+        raise HTTPException(status_code=400, detail="requests must be >= 1")
+    interval = max(interval, MIN_PROFILER_INTERVAL)
+    try:
+        result = profiler.start(
+            seconds, interval, route_labels(request.app.routes), requests
+        )
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    try:
+        while not profiler.wait(0):
+            await asyncio.sleep(0.05)
+    finally:
+        # Also stops sampling when the client goes away
+        profiler.stop()
+    if format == "speedscope":
+        return result.speedscope()
+    return PlainTextResponse(result.collapsed())
@@ -0,0 +1,27 @@
+import os
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+from htx_transcriber.database import get_db
+from htx_transcriber.services.admission import admission_controller
+from htx_transcriber.services.audio_archive import archive_stats
+from htx_transcriber.services.decoding_strategy import (
+    real_time_factors,
+    tier_stats,
+)
+from htx_transcriber.utils import read_memory_usage
+
+router = APIRouter()
+
+
+@router.get("/metrics")
+def get_metrics(db: Session = Depends(get_db)):
+    return {
+        "pid": os.getpid(),
+        "memory": read_memory_usage(),
+        "admission": admission_controller.stats(),
+        "audio_archive": archive_stats(db),
+        "decoding": {
+            "real_time_factors": real_time_factors.stats(),
+            "tiers": tier_stats(db),
+        },
+    }
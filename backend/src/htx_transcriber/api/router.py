@@ -1,13 +1,19 @@
 from fastapi import APIRouter
 from htx_transcriber.api import (
+    admin,
     health_check,
+    metrics,
     transcribe,
+    uploads,
 )
 
 router = APIRouter()
 
 for route in [
+    admin.router,
     health_check.router,
+    metrics.router,
     transcribe.router,
+    uploads.router,
 ]:
     router.include_router(route)
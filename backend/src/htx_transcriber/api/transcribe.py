@@ -1,11 +1,26 @@
-from typing import List
-from fastapi import APIRouter, UploadFile, File, Depends
+import time
+from typing import List, Optional
+from fastapi import (
+    APIRouter, BackgroundTasks, UploadFile, File, Form, Depends,
+    HTTPException, Query
+)
 from sqlalchemy.orm import Session
 from htx_transcriber.database import get_db
+from htx_transcriber.services.admission import AdmissionRejected
+from htx_transcriber.services.audio_archive import compact_transcriptions
+from htx_transcriber.services.decoding_strategy import (
+    admit_decoding,
+    resolve_quality_tier,
+)
 from htx_transcriber.services.transcription_service import (
     validate_audio_file,
-    process_audio_file,
+    validate_request_limits,
+    inspect_audio_file,
+    process_audio_files,
+    saved_transcription_ids,
     get_all_transcriptions,
+    get_transcription,
+    retranscribe,
     search_transcriptions
 )
 
@@ -14,32 +29,96 @@ router = APIRouter()
 
 @router.post("/transcribe")
 def transcribe(
+    background_tasks: BackgroundTasks,
     audio_files: List[UploadFile] = File(...),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    tier: Optional[str] = Form(None),
+    latency_budget: Optional[float] = Form(None)
 ):
-    results = []
-    for audio_file in audio_files:
+    started_at = time.monotonic()
+    tier, latency_budget = resolve_quality_tier(tier, latency_budget)
+    validate_request_limits(audio_files)
+    results: List[dict] = [{} for _ in audio_files]
+    valid_indices = []
+    metadata = []
+    for index, audio_file in enumerate(audio_files):
         try:
             validate_audio_file(audio_file)
-            result = process_audio_file(audio_file, db)
-            results.append(result)
+            metadata.append(inspect_audio_file(audio_file))
+            valid_indices.append(index)
         except Exception as e:
-            results.append({
+            results[index] = {
                 "filename": audio_file.filename,
                 "status": "error",
                 "message": str(e)
-            })
+            }
+    if not valid_indices:
+        return results
+    try:
+        with admit_decoding(
+            tier,
+            latency_budget,
+            [item.duration for item in metadata],
+            started_at
+        ) as plan:
+            processed = process_audio_files(
+                [audio_files[index] for index in valid_indices],
+                db,
+                metadata,
+                plan
+            )
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    # Runs after the response is sent
+    background_tasks.add_task(
+        compact_transcriptions, saved_transcription_ids(processed)
+    )
+    for index, result in zip(valid_indices, processed):
+        results[index] = result
     return results
 
 
+@router.post("/transcriptions/{transcription_id}/retranscribe")
+def retranscribe_endpoint(
+    transcription_id: int,
+    tier: Optional[str] = Query(None),
+    latency_budget: Optional[float] = Query(None),
+    db: Session = Depends(get_db)
+):
+    started_at = time.monotonic()
+    tier, latency_budget = resolve_quality_tier(tier, latency_budget)
+    transcription = get_transcription(transcription_id, db)
+    try:
+        with admit_decoding(
+            tier, latency_budget, [transcription.duration], started_at
+        ) as plan:
+            return retranscribe(transcription, db, plan)
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+
 @router.get("/transcriptions")
-def get_transcriptions(db: Session = Depends(get_db)):
-    return get_all_transcriptions(db)
+def get_transcriptions(
+    language: Optional[str] = None,
+    include_text: bool = True,
+    db: Session = Depends(get_db)
+):
+    return get_all_transcriptions(db, language, include_text)
 
 
 @router.get("/search")
 def search_transcriptions_endpoint(
     query: str,
+    language: Optional[str] = None,
+    include_text: bool = True,
     db: Session = Depends(get_db)
 ):
-    return search_transcriptions(query, db)
+    return search_transcriptions(query, db, language, include_text)
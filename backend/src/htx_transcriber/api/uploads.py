@@ -0,0 +1,105 @@
+import time
+from typing import Optional
+from fastapi import (
+    APIRouter, BackgroundTasks, Depends, Header, HTTPException, Query,
+    Request
+)
+from fastapi.concurrency import run_in_threadpool
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+from htx_transcriber.database import get_db
+from htx_transcriber.services.admission import AdmissionRejected
+from htx_transcriber.services.audio_archive import compact_transcriptions
+from htx_transcriber.services.decoding_strategy import resolve_quality_tier
+from htx_transcriber.services.transcription_service import (
+    saved_transcription_ids,
+)
+from htx_transcriber.services.upload_service import (
+    abort_upload,
+    complete_upload,
+    create_upload_session,
+    expire_upload_sessions,
+    get_upload_session,
+    run_early_transcription,
+    upload_status,
+    write_chunk,
+)
+
+router = APIRouter()
+
+
+class UploadSessionCreate(BaseModel):
+    file_name: str
+    content_type: str
+    size: int
+    sha256: Optional[str] = None
+
+
+@router.post("/uploads", status_code=201)
+def create_upload(
+    upload: UploadSessionCreate,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+):
+    session = create_upload_session(
+        upload.file_name, upload.content_type, upload.size, upload.sha256, db
+    )
+    # Abandoned uploads are cleaned up as new ones start
+    background_tasks.add_task(expire_upload_sessions)
+    return upload_status(session, db)
+
+
+@router.get("/uploads/{session_id}")
+def get_upload(session_id: str, db: Session = Depends(get_db)):
+    return upload_status(get_upload_session(session_id, db), db)
+
+
+@router.put("/uploads/{session_id}/chunks")
+async def put_upload_chunk(
+    session_id: str,
+    offset: int,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    x_chunk_sha256: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    data = await request.body()
+    status, window_bytes = await run_in_threadpool(
+        write_chunk, session_id, offset, data, x_chunk_sha256, db
+    )
+    if window_bytes:
+        background_tasks.add_task(
+            run_early_transcription, session_id, window_bytes
+        )
+    return status
+
+
+@router.post("/uploads/{session_id}/complete")
+def complete(
+    session_id: str,
+    background_tasks: BackgroundTasks,
+    tier: Optional[str] = Query(None),
+    latency_budget: Optional[float] = Query(None),
+    db: Session = Depends(get_db)
+):
+    started_at = time.monotonic()
+    tier, latency_budget = resolve_quality_tier(tier, latency_budget)
+    try:
+        result = complete_upload(
+            session_id, db, tier, latency_budget, started_at
+        )
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    background_tasks.add_task(
+        compact_transcriptions, saved_transcription_ids([result])
+    )
+    return result
+
+
+@router.delete("/uploads/{session_id}", status_code=204)
+def delete_upload(session_id: str, db: Session = Depends(get_db)):
+    abort_upload(session_id, db)
@@ -1,11 +1,26 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from htx_transcriber.api.router import router as api_router
+from htx_transcriber.services.profiler import ProfilerMiddleware
+from htx_transcriber.services.transcribe_processor import get_processor
+from htx_transcriber.settings import WHISPER_MODELS
+
+
+@asynccontextmanager
+async def lifespan(application: FastAPI):
+    # Load the models at startup rather than on the first request. Under the
+    # pre-forking server the parent has already loaded them, so this is a
+    # no-op.
+    for model_name in WHISPER_MODELS:
+        get_processor(model_name)
+    yield
 
 
 def get_application() -> FastAPI:
-    application = FastAPI(title="HTX Transcriber")
+    application = FastAPI(title="HTX Transcriber", lifespan=lifespan)
     application.include_router(api_router)
+    application.add_middleware(ProfilerMiddleware)
     return application
 
 
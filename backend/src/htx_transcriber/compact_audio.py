@@ -0,0 +1,144 @@
+"""Compact stored audio to 16 kHz mono archives.
+
+    python -m htx_transcriber.compact_audio compact
+    python -m htx_transcriber.compact_audio report
+    python -m htx_transcriber.compact_audio benchmark FILE [FILE ...]
+
+`compact` archives the audio of transcriptions saved before compaction was
+enabled, a batch of rows at a time. `report` prints the disk used by the
+archives against the uploads they replaced. `benchmark` archives the given
+files into a temporary directory and prints, as JSON, the size and Whisper
+decode time of each file and its archives.
+"""
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from whisper.audio import SAMPLE_RATE, load_audio
+
+from htx_transcriber.database import SessionLocal
+from htx_transcriber.models.transcription import TranscriptionModel
+from htx_transcriber.services.audio_archive import (
+    ARCHIVE_FORMATS,
+    archive_stats,
+    compact_transcriptions,
+    encode_archive,
+)
+from htx_transcriber.settings import AUDIO_ARCHIVE_FORMAT
+
+COMPACT_BATCH_SIZE = 100
+
+
+def compact(batch_size: int) -> None:
+    after_id = 0
+    while True:
+        with SessionLocal() as db:
+            ids = [
+                row.id for row in db.query(TranscriptionModel.id).filter(
+                    TranscriptionModel.id > after_id,
+                    TranscriptionModel.archived_at.is_(None)
+                ).order_by(TranscriptionModel.id).limit(batch_size)
+            ]
+        if not ids:
+            return
+        compact_transcriptions(ids)
+        after_id = ids[-1]
+
+
+def _decode_seconds(path: Path, repeats: int) -> tuple[float, np.ndarray]:
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        audio = load_audio(str(path))
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), audio
+
+
+def benchmark(
+    files: List[Path], formats: List[str], repeats: int
+) -> Dict[str, Any]:
+    report: Dict[str, Any] = {"files": []}
+    totals = {"original": 0, **{name: 0 for name in formats}}
+    with tempfile.TemporaryDirectory() as directory:
+        for path in files:
+            decode_seconds, original = _decode_seconds(path, repeats)
+            entry: Dict[str, Any] = {
+                "file": path.name,
+                "seconds": round(len(original) / SAMPLE_RATE, 2),
+                "original": {
+                    "bytes": path.stat().st_size,
+                    "decode_seconds": round(decode_seconds, 4),
+                },
+            }
+            totals["original"] += path.stat().st_size
+            for name in formats:
+                extension = ARCHIVE_FORMATS[name][0]
+                target = Path(directory) / f"{path.name}{extension}"
+                started = time.perf_counter()
+                encode_archive(path, target, name)
+                encode_seconds = time.perf_counter() - started
+                decode_seconds, archived = _decode_seconds(target, repeats)
+                length = min(len(original), len(archived))
+                entry[name] = {
+                    "bytes": target.stat().st_size,
+                    "encode_seconds": round(encode_seconds, 4),
+                    "decode_seconds": round(decode_seconds, 4),
+                    # Largest difference from the samples Whisper reads
+                    # from the original, 0 when nothing was lost
+                    "max_sample_error": float(np.max(np.abs(
+                        original[:length] - archived[:length]
+                    ))) if length else 0.0,
+                }
+                totals[name] += target.stat().st_size
+            report["files"].append(entry)
+    report["total_bytes"] = totals
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="htx_transcriber.compact_audio",
+        description=__doc__.split("\n\n")[0]
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    compact_parser = commands.add_parser(
+        "compact", help="Archive audio saved before compaction was enabled"
+    )
+    compact_parser.add_argument(
+        "--batch-size", type=int, default=COMPACT_BATCH_SIZE
+    )
+    commands.add_parser("report", help="Disk use of archived audio")
+    bench_parser = commands.add_parser(
+        "benchmark", help="Compare archive formats on audio files"
+    )
+    bench_parser.add_argument("files", nargs="+", type=Path)
+    bench_parser.add_argument(
+        "--formats", nargs="+", choices=sorted(ARCHIVE_FORMATS),
+        default=sorted(ARCHIVE_FORMATS)
+    )
+    bench_parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    if args.command == "compact":
+        if not AUDIO_ARCHIVE_FORMAT:
+            sys.exit("Set AUDIO_ARCHIVE_FORMAT to compact audio")
+        compact(args.batch_size)
+        with SessionLocal() as db:
+            print(json.dumps(archive_stats(db), indent=2))
+    elif args.command == "report":
+        with SessionLocal() as db:
+            print(json.dumps(archive_stats(db), indent=2))
+    else:
+        print(json.dumps(
+            benchmark(args.files, args.formats, args.repeats), indent=2
+        ))
+
+
+if __name__ == "__main__":
+    main()
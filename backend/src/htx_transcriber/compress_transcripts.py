@@ -0,0 +1,314 @@
+"""Manage compressed transcript storage.
+
+    python -m htx_transcriber.compress_transcripts train
+    python -m htx_transcriber.compress_transcripts convert [--decompress]
+    python -m htx_transcriber.compress_transcripts benchmark
+
+`train` trains a zstd dictionary on the stored transcripts, which new
+transcripts are compressed with once the server restarts. `convert`
+compresses the stored transcripts with the newest dictionary, or restores
+them to plain text, committing every batch. `benchmark` compares database
+size, read latency and page cache reach of plain and compressed storage on
+throwaway databases and prints the results as JSON.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import create_engine, insert, select
+
+from htx_transcriber.database import Base, engine
+from htx_transcriber.models.compressed_text import (
+    TranscriptCodec,
+    transcript_codec,
+    zstandard,
+)
+from htx_transcriber.models.transcription import TranscriptionModel
+from htx_transcriber.services.transcript_storage import (
+    CONVERT_BATCH_SIZE,
+    DICTIONARY_SIZE,
+    convert_batch,
+    train_dictionary,
+)
+
+SYLLABLES = [
+    "a", "an", "ba", "be", "con", "da", "de", "di", "en", "er", "fa", "ga",
+    "in", "ka", "la", "le", "lo", "ma", "me", "mo", "na", "ne", "no", "o",
+    "pa", "pe", "ra", "re", "ri", "sa", "se", "so", "ta", "te", "ti", "to",
+    "tion", "u", "un", "va", "ve", "wa", "ya", "za",
+]
+
+
+def synthetic_transcripts(
+    count: int, max_words: int, seed: int = 0
+) -> List[str]:
+    """Speech-like text: Zipf-distributed words in short sentences."""
+    rng = random.Random(seed)
+    vocabulary = sorted({
+        "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 4)))
+        for _ in range(5000)
+    })
+    rng.shuffle(vocabulary)
+    weights = [1 / rank for rank in range(1, len(vocabulary) + 1)]
+    transcripts = []
+    for _ in range(count):
+        words = rng.choices(
+            vocabulary, weights, k=rng.randint(max_words // 10, max_words)
+        )
+        sentences, start = [], 0
+        while start < len(words):
+            end = start + rng.randint(4, 20)
+            sentence = " ".join(words[start:end])
+            sentences.append(sentence[:1].upper() + sentence[1:] + ".")
+            start = end
+        transcripts.append(" ".join(sentences))
+    return transcripts
+
+
+def stored_transcripts(count: int) -> List[str]:
+    """The newest transcripts in the application database."""
+    with engine.connect() as connection:
+        values = connection.execute(
+            select(TranscriptionModel.transcribed_text)
+            .where(TranscriptionModel.transcribed_text.is_not(None))
+            .order_by(TranscriptionModel.id.desc())
+            .limit(count)
+        ).scalars()
+        return [text for text in values if text]
+
+
+def build_database(path: str, texts: List[str], codec: TranscriptCodec):
+    bench_engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bench_engine)
+    now = datetime.now()
+    with bench_engine.begin() as connection:
+        connection.execute(
+            insert(TranscriptionModel.__table__),
+            [
+                {
+                    "audio_file_name": f"audio_{index}_ver_1.mp3",
+                    "transcribed_text": codec.compress(text),
+                    "language": "en",
+                    "duration": len(text) / 15,
+                    "created_at": now,
+                    "updated_at": now,
+                }
+                for index, text in enumerate(texts)
+            ]
+        )
+    bench_engine.dispose()
+    connection = sqlite3.connect(path)
+    connection.execute("VACUUM")
+    connection.close()
+
+
+def _percentile(samples: List[float], percentile: float) -> float:
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(percentile / 100 * len(ordered)) - 1)]
+
+
+def _drop_os_cache(path: str) -> None:
+    """Evict the database file from the OS page cache, where supported."""
+    if hasattr(os, "posix_fadvise"):
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+
+
+def _open(path: str, cache_kb: int) -> sqlite3.Connection:
+    # A new connection starts with an empty SQLite page cache
+    connection = sqlite3.connect(path)
+    connection.execute(f"PRAGMA cache_size = -{cache_kb}")
+    return connection
+
+
+def measure(
+    path: str,
+    codec: TranscriptCodec,
+    count: int,
+    cache_kb: int,
+    lookups: int,
+    repeats: int
+) -> Dict[str, Any]:
+    connection = _open(path, cache_kb)
+    page_size = connection.execute("PRAGMA page_size").fetchone()[0]
+    page_count = connection.execute("PRAGMA page_count").fetchone()[0]
+    connection.close()
+
+    def best_of(query: str, decompress: bool, cold: bool) -> float:
+        timings = []
+        for _ in range(repeats):
+            if cold:
+                _drop_os_cache(path)
+            connection = _open(path, cache_kb)
+            started = time.perf_counter()
+            for row in connection.execute(query):
+                if decompress:
+                    codec.decompress(row[-1])
+            timings.append(time.perf_counter() - started)
+            connection.close()
+        return min(timings)
+
+    rng = random.Random(1)
+    connection = _open(path, cache_kb)
+    latencies = []
+    for _ in range(lookups):
+        row_id = rng.randint(1, count)
+        started = time.perf_counter()
+        value = connection.execute(
+            "SELECT transcribed_text FROM transcriptions WHERE id = ?",
+            (row_id,)
+        ).fetchone()[0]
+        codec.decompress(value)
+        latencies.append(time.perf_counter() - started)
+    connection.close()
+
+    full_read = (
+        "SELECT id, audio_file_name, created_at, transcribed_text "
+        "FROM transcriptions"
+    )
+    metadata_read = (
+        "SELECT id, audio_file_name, language, duration, created_at "
+        "FROM transcriptions"
+    )
+    cache_pages = cache_kb * 1024 // page_size
+    return {
+        "db_bytes": os.path.getsize(path),
+        "page_count": page_count,
+        # Share of the database the page cache holds, which is the hit
+        # rate of uniformly random reads once the cache is warm
+        "cache_hit_rate": round(min(1.0, cache_pages / page_count), 3),
+        # Every row with its transcript, and metadata only, read with the
+        # file in the OS page cache and read again from disk
+        "full_read_seconds": round(
+            best_of(full_read, decompress=True, cold=False), 4
+        ),
+        "full_read_cold_seconds": round(
+            best_of(full_read, decompress=True, cold=True), 4
+        ),
+        "metadata_read_seconds": round(
+            best_of(metadata_read, decompress=False, cold=False), 4
+        ),
+        "metadata_read_cold_seconds": round(
+            best_of(metadata_read, decompress=False, cold=True), 4
+        ),
+        "lookup_ms": {
+            "p50": round(_percentile(latencies, 50) * 1000, 3),
+            "p95": round(_percentile(latencies, 95) * 1000, 3),
+        },
+    }
+
+
+def benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    if zstandard is None:
+        raise SystemExit("The benchmark needs the zstandard package")
+    if args.source == "database":
+        texts = stored_transcripts(args.rows)
+        training = texts
+    else:
+        texts = synthetic_transcripts(args.rows, args.words)
+        training = synthetic_transcripts(args.rows, args.words, seed=1)
+    dictionary = zstandard.train_dictionary(
+        DICTIONARY_SIZE, [text.encode("utf-8") for text in training]
+    )
+    with_dictionary = TranscriptCodec(True, lambda dict_id: None)
+    with_dictionary.use_dictionary(
+        dictionary.dict_id(), dictionary.as_bytes()
+    )
+    codecs = {
+        "plain": TranscriptCodec(False, lambda dict_id: None),
+        "zstd": TranscriptCodec(True, lambda dict_id: None),
+        "zstd_dictionary": with_dictionary,
+    }
+    report: Dict[str, Any] = {
+        "rows": len(texts),
+        "text_bytes": sum(len(text.encode("utf-8")) for text in texts),
+        "dictionary_bytes": len(dictionary.as_bytes()),
+        "cache_kb": args.cache_kb,
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        for name, codec in codecs.items():
+            path = os.path.join(directory, f"{name}.db")
+            build_database(path, texts, codec)
+            report[name] = measure(
+                path, codec, len(texts), args.cache_kb, args.lookups,
+                args.repeats
+            )
+    return report
+
+
+def convert(decompress: bool, batch_size: int) -> int:
+    after_id: Optional[int] = 0
+    converted = 0
+    while after_id is not None:
+        # Commit every batch so the database is not locked for long
+        with engine.begin() as connection:
+            after_id, count = convert_batch(
+                connection, transcript_codec, not decompress, after_id,
+                batch_size
+            )
+        converted += count
+    return converted
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="htx_transcriber.compress_transcripts",
+        description=__doc__.split("\n\n")[0]
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("train", help="Train a dictionary on stored rows")
+    convert_parser = commands.add_parser(
+        "convert", help="Compress or decompress stored rows"
+    )
+    convert_parser.add_argument("--decompress", action="store_true")
+    convert_parser.add_argument(
+        "--batch-size", type=int, default=CONVERT_BATCH_SIZE
+    )
+    bench_parser = commands.add_parser(
+        "benchmark", help="Compare plain and compressed storage"
+    )
+    bench_parser.add_argument(
+        "--source", choices=("synthetic", "database"), default="synthetic"
+    )
+    bench_parser.add_argument("--rows", type=int, default=2000)
+    bench_parser.add_argument(
+        "--words", type=int, default=3000,
+        help="Longest synthetic transcript in words"
+    )
+    bench_parser.add_argument(
+        "--cache-kb", type=int, default=2000,
+        help="SQLite page cache size, the default is SQLite's own"
+    )
+    bench_parser.add_argument("--lookups", type=int, default=2000)
+    bench_parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    if args.command == "train":
+        try:
+            with engine.begin() as connection:
+                dict_id = train_dictionary(connection, transcript_codec)
+        except ValueError as e:
+            sys.exit(str(e))
+        print(f"Trained dictionary {dict_id}")
+    elif args.command == "convert":
+        if not args.decompress and not transcript_codec.enabled:
+            sys.exit("Set TRANSCRIPT_COMPRESSION=zstd to compress transcripts")
+        converted = convert(args.decompress, args.batch_size)
+        print(f"Converted {converted} transcripts")
+    else:
+        print(json.dumps(benchmark(args), indent=2))
+
+
+if __name__ == "__main__":
+    main()
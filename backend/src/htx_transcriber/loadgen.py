@@ -0,0 +1,679 @@
+"""Replay a production-like request mix against the HTTP API.
+
+    python -m htx_transcriber.loadgen --stub-processor --concurrency 1 2 4 8
+    python -m htx_transcriber.loadgen --url http://localhost:8000
+
+Without `--url`, the application from `app.get_application()` is served on a
+local port with a throwaway database and upload directory. With
+`--stub-processor` that server does not load Whisper: transcription sleeps
+for the seconds of audio Whisper would decode, at most the first 30 of each
+file, times `--stub-rtf`, so the run needs no network or GPU and measures
+everything around the model.
+
+Each step runs `concurrency` clients for `--step-seconds`. Every client
+picks a request from `--mix` (weights of `transcribe`, `transcriptions` and
+`search`), waits for the response, then `--think-time` seconds. Uploads are
+WAV files whose durations are drawn from `--upload-mix`, as
+`seconds:weight` pairs, sent with a quality tier drawn from `--tier-mix`
+when it is given. The report, printed as JSON, gives throughput, latency
+percentiles and error rates per endpoint for every step, the server's
+admission and per-tier SLA statistics, and the saturation point: the last
+step before throughput stopped growing or errors appeared.
+"""
+import argparse
+import http.client
+import io
+import json
+import math
+import os
+import random
+import socket
+import tempfile
+import threading
+import time
+import wave
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlencode, urlsplit
+
+# Imports nothing from settings, so is safe to load before the environment
+from htx_transcriber.services.scheduler import WINDOW_SECONDS, estimate_cost
+
+# The application is imported only once the environment of a local server
+# is set up, as settings are read when `htx_transcriber.settings` is first
+# imported.
+
+ENDPOINTS = {
+    "transcribe": "POST /transcribe",
+    "transcriptions": "GET /transcriptions",
+    "search": "GET /search",
+}
+DEFAULT_MIX = "transcribe=1,transcriptions=2,search=2"
+DEFAULT_UPLOAD_MIX = "10:6,60:3,600:1"
+# Words of the stub transcripts, searched for by the `search` requests
+VOCABULARY = ["budget", "meeting", "review", "schedule", "customer"]
+# Pause after a failed request so rejected clients do not spin
+ERROR_PAUSE = 0.1
+# A step saturates when throughput grows less than this over the previous
+# one, or more than MAX_ERROR_RATE of its requests fail
+MIN_THROUGHPUT_GAIN = 0.1
+MAX_ERROR_RATE = 0.01
+
+
+def parse_weights(spec: str, parse_key=str) -> List[Tuple[Any, float]]:
+    """Parse `key=weight,...` (or `key:weight,...`) into pairs."""
+    pairs = []
+    for item in spec.split(","):
+        key, separator, weight = item.replace(":", "=").partition("=")
+        try:
+            pair = (parse_key(key.strip()), float(weight))
+        except ValueError:
+            pair = None
+        if not separator or pair is None or pair[1] < 0:
+            raise ValueError(f"Invalid weight {item!r}")
+        pairs.append(pair)
+    if not any(weight for _, weight in pairs):
+        raise ValueError(f"No positive weight in {spec!r}")
+    return pairs
+
+
+def parse_mix(spec: str) -> List[Tuple[str, float]]:
+    mix = parse_weights(spec)
+    for name, _ in mix:
+        if name not in ENDPOINTS:
+            raise ValueError(
+                f"Unknown request {name!r}, expected one of "
+                f"{', '.join(ENDPOINTS)}"
+            )
+    return mix
+
+
+def parse_upload_mix(spec: str) -> List[Tuple[float, float]]:
+    mix = parse_weights(spec, float)
+    if any(seconds <= 0 for seconds, _ in mix):
+        raise ValueError("Upload durations must be positive")
+    return mix
+
+
+def make_wav(seconds: float, sample_rate: int, channels: int) -> bytes:
+    """A 16-bit PCM WAV file of a 440 Hz tone."""
+    period = [
+        int(8000 * math.sin(2 * math.pi * 440 * i / sample_rate))
+        for i in range(sample_rate)
+    ]
+    second = b"".join(
+        sample.to_bytes(2, "little", signed=True) * channels
+        for sample in period
+    )
+    frames = int(seconds * sample_rate)
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        whole, rest = divmod(frames, sample_rate)
+        for _ in range(whole):
+            wav.writeframes(second)
+        wav.writeframes(second[:rest * 2 * channels])
+    return buffer.getvalue()
+
+
+def encode_multipart(
+    files: Sequence[Tuple[str, bytes]],
+    fields: Optional[Dict[str, str]] = None,
+    field_name: str = "audio_files"
+) -> Tuple[bytes, str]:
+    """Encode WAV files as a multipart form, returning body and type."""
+    boundary = f"loadgen{random.getrandbits(64):016x}"
+    parts = []
+    for name, value in (fields or {}).items():
+        parts.append(
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="{name}"\r\n\r\n'
+            f"{value}\r\n".encode()
+        )
+    for name, data in files:
+        parts.append(
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="{field_name}"; '
+            f'filename="{name}"\r\n'
+            "Content-Type: audio/wav\r\n\r\n".encode()
+        )
+        parts.append(data)
+        parts.append(b"\r\n")
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+def percentile(samples: Sequence[float], percent: float) -> float:
+    """Nearest-rank percentile, 0 when there are no samples."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(percent / 100 * len(ordered)) - 1)]
+
+
+@dataclass
+class Sample:
+    endpoint: str
+    finished_at: float
+    seconds: float
+    # HTTP status, or "connection" when no response arrived
+    status: Any
+    # Files in a 200 response to /transcribe that failed to transcribe
+    failed_files: int = 0
+    # Seconds of audio decoded for the request
+    decoded_seconds: float = 0.0
+
+
+@dataclass
+class Recorder:
+    samples: List[Sample] = field(default_factory=list)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def add(self, sample: Sample) -> None:
+        with self.lock:
+            self.samples.append(sample)
+
+
+def summarize(samples: Sequence[Sample], elapsed: float) -> Dict[str, Any]:
+    """Throughput, latency and errors per endpoint and in total."""
+    by_endpoint: Dict[str, List[Sample]] = {}
+    for sample in samples:
+        by_endpoint.setdefault(sample.endpoint, []).append(sample)
+
+    def describe(group: Sequence[Sample]) -> Dict[str, Any]:
+        errors: Counter[str] = Counter()
+        for sample in group:
+            if sample.status != 200:
+                errors[str(sample.status)] += 1
+            elif sample.failed_files:
+                errors["failed_files"] += sample.failed_files
+        succeeded = [s for s in group if s.status == 200]
+        latencies = [s.seconds * 1000 for s in succeeded]
+        failed = sum(1 for s in group if s.status != 200)
+        return {
+            "requests": len(group),
+            "throughput": round(len(succeeded) / elapsed, 3),
+            "error_rate": round(failed / len(group), 4) if group else 0.0,
+            "errors": dict(errors),
+            "latency_ms": {
+                "mean": round(sum(latencies) / len(latencies), 1)
+                if latencies else 0.0,
+                **{
+                    f"p{p}": round(percentile(latencies, p), 1)
+                    for p in (50, 90, 95, 99)
+                },
+                "max": round(max(latencies, default=0.0), 1),
+            },
+        }
+
+    report = describe(samples)
+    report["decoded_seconds_per_second"] = round(sum(
+        s.decoded_seconds for s in samples if s.status == 200
+    ) / elapsed, 3)
+    report["endpoints"] = {
+        name: describe(group) for name, group in sorted(by_endpoint.items())
+    }
+    return report
+
+
+def find_saturation(
+    steps: Sequence[Dict[str, Any]],
+    min_gain: float = MIN_THROUGHPUT_GAIN,
+    max_error_rate: float = MAX_ERROR_RATE
+) -> Dict[str, Any]:
+    """The last step before throughput levelled off or errors appeared."""
+    previous = None
+    for step in steps:
+        reason = None
+        if step["error_rate"] > max_error_rate:
+            reason = "errors"
+        elif previous is not None and \
+                step["throughput"] < previous["throughput"] * (1 + min_gain):
+            reason = "throughput"
+        if reason is not None:
+            return {
+                "reached": True,
+                "reason": reason,
+                "concurrency": previous and previous["concurrency"],
+                "throughput": previous and previous["throughput"],
+                "at_concurrency": step["concurrency"],
+            }
+        previous = step
+    return {
+        "reached": False,
+        "reason": None,
+        "concurrency": previous and previous["concurrency"],
+        "throughput": previous and previous["throughput"],
+        "at_concurrency": None,
+    }
+
+
+class Client:
+    """Keep-alive HTTP connection of one simulated user."""
+
+    def __init__(self, base_url: str, timeout: float):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname or "localhost"
+        self.port = parts.port
+        self.https = parts.scheme == "https"
+        self.prefix = parts.path.rstrip("/")
+        self.timeout = timeout
+        self.connection: Optional[http.client.HTTPConnection] = None
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        body: Optional[bytes] = None,
+        headers: Optional[Dict[str, str]] = None
+    ) -> Tuple[int, bytes]:
+        if self.connection is None:
+            connection_class = (
+                http.client.HTTPSConnection if self.https
+                else http.client.HTTPConnection
+            )
+            self.connection = connection_class(
+                self.host, self.port, timeout=self.timeout
+            )
+        try:
+            self.connection.request(
+                method, self.prefix + path, body, headers or {}
+            )
+            response = self.connection.getresponse()
+            return response.status, response.read()
+        except Exception:
+            self.close()
+            raise
+
+    def close(self) -> None:
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+@dataclass
+class LoadConfig:
+    mix: List[Tuple[str, float]]
+    upload_mix: List[Tuple[float, float]]
+    files_per_request: int = 1
+    sample_rate: int = 16000
+    channels: int = 1
+    think_time: float = 0.0
+    timeout: float = 300.0
+    # Quality tiers of uploads, none sent when empty
+    tiers: List[Tuple[str, float]] = field(default_factory=list)
+
+
+class LoadGenerator:
+    """Drive steps of closed-loop clients against a server."""
+
+    def __init__(self, base_url: str, config: LoadConfig, seed: int = 0):
+        self.base_url = base_url
+        self.config = config
+        self.seed = seed
+        self._uploads: Dict[float, bytes] = {}
+        self._uploads_lock = threading.Lock()
+        self._sequence = 0
+
+    def upload(self, seconds: float) -> bytes:
+        with self._uploads_lock:
+            if seconds not in self._uploads:
+                self._uploads[seconds] = make_wav(
+                    seconds, self.config.sample_rate, self.config.channels
+                )
+            return self._uploads[seconds]
+
+    def _file_name(self, seconds: float) -> str:
+        with self._uploads_lock:
+            self._sequence += 1
+            return f"loadgen_{seconds:g}s_{self._sequence}.wav"
+
+    def _transcribe(self, client: Client, rng: random.Random) -> Sample:
+        durations, weights = zip(*self.config.upload_mix)
+        chosen = rng.choices(
+            durations, weights, k=self.config.files_per_request
+        )
+        fields = {}
+        if self.config.tiers:
+            names, tier_weights = zip(*self.config.tiers)
+            fields["tier"] = rng.choices(names, tier_weights)[0]
+        body, content_type = encode_multipart([
+            (self._file_name(seconds), self.upload(seconds))
+            for seconds in chosen
+        ], fields)
+        started = time.monotonic()
+        status, content = client.request(
+            "POST", "/transcribe", body, {"Content-Type": content_type}
+        )
+        finished = time.monotonic()
+        failed_files = 0
+        if status == 200:
+            failed_files = sum(
+                1 for result in json.loads(content)
+                if result.get("status") != "success"
+            )
+        return Sample(
+            ENDPOINTS["transcribe"], finished, finished - started, status,
+            failed_files, estimate_cost(chosen)
+        )
+
+    def _poll(
+        self, client: Client, rng: random.Random, name: str
+    ) -> Sample:
+        params = {"include_text": "false"}
+        if name == "search":
+            params["query"] = rng.choice(VOCABULARY)
+            path = "/search"
+        else:
+            path = "/transcriptions"
+        started = time.monotonic()
+        status, _ = client.request("GET", f"{path}?{urlencode(params)}")
+        finished = time.monotonic()
+        return Sample(ENDPOINTS[name], finished, finished - started, status)
+
+    def _run_client(
+        self,
+        index: int,
+        stop: threading.Event,
+        recorder: Recorder
+    ) -> None:
+        rng = random.Random(self.seed * 100003 + index)
+        names, weights = zip(*self.config.mix)
+        client = Client(self.base_url, self.config.timeout)
+        try:
+            while not stop.is_set():
+                name = rng.choices(names, weights)[0]
+                started = time.monotonic()
+                try:
+                    if name == "transcribe":
+                        sample = self._transcribe(client, rng)
+                    else:
+                        sample = self._poll(client, rng, name)
+                except (OSError, http.client.HTTPException):
+                    now = time.monotonic()
+                    sample = Sample(
+                        ENDPOINTS[name], now, now - started, "connection"
+                    )
+                recorder.add(sample)
+                pause = self.config.think_time
+                if sample.status != 200:
+                    pause = max(pause, ERROR_PAUSE)
+                if pause:
+                    stop.wait(pause)
+        finally:
+            client.close()
+
+    def server_metrics(self) -> Optional[Dict[str, Any]]:
+        client = Client(self.base_url, self.config.timeout)
+        try:
+            status, content = client.request("GET", "/metrics")
+        except (OSError, http.client.HTTPException):
+            return None
+        finally:
+            client.close()
+        return json.loads(content) if status == 200 else None
+
+    def run_step(
+        self, concurrency: int, seconds: float, warmup: float = 0.0
+    ) -> Dict[str, Any]:
+        """Run `concurrency` clients, measuring after `warmup` seconds.
+
+        Only requests that finish within the measured window count, and
+        the step waits for requests still in flight before returning.
+        """
+        recorder = Recorder()
+        stop = threading.Event()
+        threads = [
+            threading.Thread(
+                target=self._run_client,
+                args=(index, stop, recorder),
+                name=f"loadgen-client-{index}",
+                daemon=True
+            )
+            for index in range(concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        time.sleep(warmup)
+        measured_from = time.monotonic()
+        time.sleep(seconds)
+        measured_to = time.monotonic()
+        stop.set()
+        for thread in threads:
+            thread.join()
+        samples = [
+            s for s in recorder.samples
+            if measured_from <= s.finished_at <= measured_to
+        ]
+        step = {"concurrency": concurrency}
+        step.update(summarize(samples, measured_to - measured_from))
+        metrics = self.server_metrics()
+        if metrics is not None:
+            step["server"] = {
+                "admission": metrics.get("admission"),
+                "decoding": metrics.get("decoding"),
+            }
+        return step
+
+    def run(
+        self,
+        concurrency: Sequence[int],
+        seconds: float,
+        warmup: float = 0.0
+    ) -> Dict[str, Any]:
+        steps = [
+            self.run_step(level, seconds, warmup) for level in concurrency
+        ]
+        return {"steps": steps, "saturation": find_saturation(steps)}
+
+
+class StubProcessor:
+    """Stand-in for WhisperProcessor that only takes time.
+
+    Transcribing sleeps for the seconds of audio Whisper would decode times
+    `rtf`, the real-time factor of the default model's greedy decoding,
+    counting unknown durations as a full window, and returns a few words
+    of `VOCABULARY` so that searches find rows. Other decoding strategies
+    take longer in proportion to their prior real-time factors.
+    """
+
+    def __init__(self, rtf: float):
+        self.rtf = rtf
+        self._rng = random.Random(0)
+
+    def _text(self) -> str:
+        return " ".join(self._rng.choices(VOCABULARY, k=8))
+
+    def transcribe_audio(self, audio_path, language=None) -> str:
+        time.sleep(WINDOW_SECONDS * self.rtf)
+        return self._text()
+
+    def _duration(self, audio_path) -> Optional[float]:
+        from htx_transcriber.services.audio_probe import (
+            AudioProbeError,
+            probe_audio,
+        )
+        try:
+            with open(audio_path, "rb") as f:
+                return probe_audio(f).duration
+        except (OSError, AudioProbeError):
+            return None
+
+    def transcribe_batch(self, audio_paths, batch_size=None, strategy=None):
+        from htx_transcriber.services.decoding_strategy import (
+            DEFAULT_STRATEGY,
+        )
+        from htx_transcriber.services.transcribe_processor import (
+            TranscriptionResult,
+        )
+        strategy = strategy or DEFAULT_STRATEGY
+        time.sleep(
+            estimate_cost([self._duration(path) for path in audio_paths])
+            * self.rtf
+            * strategy.prior_rtf() / DEFAULT_STRATEGY.prior_rtf()
+        )
+        return [
+            TranscriptionResult(
+                text=self._text(), language="en", language_probability=1.0
+            )
+            for _ in audio_paths
+        ]
+
+
+def prepare_environment(workdir: Path) -> None:
+    """Point the application at a database and uploads under `workdir`."""
+    uploads = workdir / "uploads"
+    uploads.mkdir(parents=True, exist_ok=True)
+    os.environ["DATABASE_URL"] = str(workdir / "loadgen.db")
+    os.environ["UPLOAD_DIR"] = str(uploads)
+
+
+class LocalServer:
+    """`app.get_application()` served by uvicorn on a background thread."""
+
+    def __init__(self, stub_rtf: Optional[float], host: str = "127.0.0.1"):
+        import uvicorn
+
+        from htx_transcriber.app import get_application
+        from htx_transcriber.database import Base, engine
+        from htx_transcriber.services import transcribe_processor
+        from htx_transcriber.settings import WHISPER_MODELS
+
+        Base.metadata.create_all(engine)
+        if stub_rtf is not None:
+            # The lifespan and every request get the stub from the cache
+            stub = StubProcessor(stub_rtf)
+            for model_name in WHISPER_MODELS:
+                transcribe_processor._processors[model_name] = stub
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket.bind((host, 0))
+        self.url = f"http://{host}:{self.socket.getsockname()[1]}"
+        self.server = uvicorn.Server(uvicorn.Config(
+            get_application(), log_level="warning"
+        ))
+        self.thread = threading.Thread(
+            target=self.server.run,
+            kwargs={"sockets": [self.socket]},
+            name="loadgen-server",
+            daemon=True
+        )
+
+    def __enter__(self) -> "LocalServer":
+        self.thread.start()
+        while not self.server.started:
+            if not self.thread.is_alive():
+                raise RuntimeError("Local server failed to start")
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.server.should_exit = True
+        self.thread.join()
+        self.socket.close()
+
+
+def _argument(parse):
+    def parse_argument(value: str):
+        try:
+            return parse(value)
+        except ValueError as e:
+            raise argparse.ArgumentTypeError(str(e))
+    return parse_argument
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="htx_transcriber.loadgen",
+        description=__doc__.split("\n\n")[0]
+    )
+    parser.add_argument(
+        "--url", help="Server to load, a local one is started when omitted"
+    )
+    parser.add_argument(
+        "--stub-processor", action="store_true",
+        help="Serve locally without loading Whisper"
+    )
+    parser.add_argument(
+        "--stub-rtf", type=float, default=0.1,
+        help="Seconds the stub takes per second of audio decoded"
+    )
+    parser.add_argument(
+        "--workdir", type=Path,
+        help="Database and uploads of the local server, temporary if omitted"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, nargs="+", default=[1, 2, 4, 8]
+    )
+    parser.add_argument("--step-seconds", type=float, default=30)
+    parser.add_argument("--warmup", type=float, default=5)
+    parser.add_argument(
+        "--mix", type=_argument(parse_mix), default=parse_mix(DEFAULT_MIX)
+    )
+    parser.add_argument(
+        "--upload-mix", type=_argument(parse_upload_mix),
+        default=parse_upload_mix(DEFAULT_UPLOAD_MIX)
+    )
+    parser.add_argument(
+        "--tier-mix", type=_argument(parse_weights), default=[],
+        help="Weights of quality tiers, e.g. interactive=3,batch=1"
+    )
+    parser.add_argument("--files-per-request", type=int, default=1)
+    parser.add_argument("--sample-rate", type=int, default=16000)
+    parser.add_argument("--channels", type=int, default=1)
+    parser.add_argument("--think-time", type=float, default=0.0)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, help="Write the report here")
+    args = parser.parse_args(argv)
+    if args.url and (args.stub_processor or args.workdir):
+        parser.error("--stub-processor and --workdir need a local server")
+
+    config = LoadConfig(
+        mix=args.mix,
+        upload_mix=args.upload_mix,
+        files_per_request=args.files_per_request,
+        sample_rate=args.sample_rate,
+        channels=args.channels,
+        think_time=args.think_time,
+        timeout=args.timeout,
+        tiers=args.tier_mix
+    )
+    report: Dict[str, Any] = {
+        "target": args.url or "local",
+        "stub_rtf": args.stub_rtf if args.stub_processor else None,
+        "mix": dict(args.mix),
+        "upload_mix": {f"{seconds:g}": w for seconds, w in args.upload_mix},
+        "tier_mix": dict(args.tier_mix),
+        "files_per_request": args.files_per_request,
+        "step_seconds": args.step_seconds,
+        "warmup_seconds": args.warmup,
+    }
+    if args.url:
+        generator = LoadGenerator(args.url, config, args.seed)
+        report.update(generator.run(
+            args.concurrency, args.step_seconds, args.warmup
+        ))
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            prepare_environment(args.workdir or Path(directory))
+            stub_rtf = args.stub_rtf if args.stub_processor else None
+            with LocalServer(stub_rtf) as server:
+                generator = LoadGenerator(server.url, config, args.seed)
+                report.update(generator.run(
+                    args.concurrency, args.step_seconds, args.warmup
+                ))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""Column type storing transcript bodies as zstd frames.
+
+Transcripts are compressed with a dictionary trained on earlier transcripts,
+which mostly helps short transcripts that give zstd little to go on. Every
+frame carries the ID of its dictionary, and the dictionaries are kept in the
+`transcript_dictionaries` table, so older rows stay readable after a new
+dictionary is trained.
+
+Rows written while compression was disabled keep their plain text and are
+returned unchanged, so compression can be enabled on an existing database
+and rows converted later, see `services.transcript_storage`.
+"""
+import threading
+import time
+from contextlib import nullcontext
+from typing import Callable, Optional, Tuple, Union
+
+from sqlalchemy import UnicodeText, select
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.types import TypeDecorator
+
+from htx_transcriber.database import engine
+from htx_transcriber.models.transcript_dictionary import (
+    TranscriptDictionaryModel,
+)
+from htx_transcriber.settings import (
+    TRANSCRIPT_COMPRESSION,
+    TRANSCRIPT_COMPRESSION_LEVEL,
+    TRANSCRIPT_DICTIONARY_REFRESH,
+)
+
+try:
+    import zstandard
+except ImportError:  # optional, only needed with TRANSCRIPT_COMPRESSION
+    zstandard = None
+
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+# Looks up a dictionary by ID, or the newest one when the ID is None.
+# Returns the dictionary ID and data, or None when there is no dictionary.
+DictionaryLoader = Callable[[Optional[int]], Optional[Tuple[int, bytes]]]
+
+
+def dictionary_loader(bind: Union[Engine, Connection]) -> DictionaryLoader:
+    """Load dictionaries from the `transcript_dictionaries` table."""
+    table = TranscriptDictionaryModel.__table__
+
+    def load(dict_id: Optional[int]) -> Optional[Tuple[int, bytes]]:
+        query = select(table.c.id, table.c.data)
+        if dict_id is None:
+            query = query.order_by(table.c.created_at.desc()).limit(1)
+        else:
+            query = query.where(table.c.id == dict_id)
+        connect = bind.connect if isinstance(bind, Engine) else (
+            lambda: nullcontext(bind)
+        )
+        with connect() as connection:
+            row = connection.execute(query).first()
+        return None if row is None else (row.id, row.data)
+
+    return load
+
+
+def is_compressed(value: Union[str, bytes, None]) -> bool:
+    return isinstance(value, bytes) and value.startswith(ZSTD_MAGIC)
+
+
+class TranscriptCodec:
+    """Compress transcripts with the newest dictionary, decompress with any.
+
+    Args:
+        enabled: Compress new values. Compressed values are always
+            decompressed on read.
+        loader: Source of trained dictionaries
+        level: zstd compression level
+        refresh_interval: Seconds before the newest dictionary is looked up
+            again, to pick up one trained by another process
+    """
+
+    def __init__(
+        self,
+        enabled: bool,
+        loader: DictionaryLoader,
+        level: int = TRANSCRIPT_COMPRESSION_LEVEL,
+        refresh_interval: float = TRANSCRIPT_DICTIONARY_REFRESH
+    ):
+        if enabled and zstandard is None:
+            raise ValueError(
+                "Transcript compression needs the zstandard package"
+            )
+        self.enabled = enabled
+        self.level = level
+        self.refresh_interval = refresh_interval
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._dictionaries: dict[int, "zstandard.ZstdCompressionDict"] = {}
+        # zstd contexts are not thread safe, but are costly to set up with a
+        # dictionary, so every thread keeps its own
+        self._contexts = threading.local()
+        # ID of the dictionary new values are compressed with, 0 for none,
+        # and when it was last looked up
+        self._current_id: Optional[int] = None
+        self._checked_at = 0.0
+
+    def _register(self, dict_id: int, data: bytes):
+        dictionary = zstandard.ZstdCompressionDict(data)
+        self._dictionaries[dict_id] = dictionary
+        return dictionary
+
+    def _dictionary(self, dict_id: int):
+        with self._lock:
+            dictionary = self._dictionaries.get(dict_id)
+            if dictionary is None:
+                loaded = self._loader(dict_id)
+                if loaded is None:
+                    raise ValueError(
+                        f"Transcript dictionary {dict_id} is missing"
+                    )
+                dictionary = self._register(*loaded)
+            return dictionary
+
+    def _current_dictionary_id(self) -> int:
+        with self._lock:
+            now = time.monotonic()
+            if self._current_id is None or \
+                    now - self._checked_at >= self.refresh_interval:
+                loaded = self._loader(None)
+                if loaded is None:
+                    self._current_id = 0
+                else:
+                    if loaded[0] not in self._dictionaries:
+                        self._register(*loaded)
+                    self._current_id = loaded[0]
+                self._checked_at = now
+            return self._current_id
+
+    def _context(self, kind: str, dict_id: int):
+        contexts = self._contexts.__dict__.setdefault(kind, {})
+        context = contexts.get(dict_id)
+        if context is None:
+            dictionary = self._dictionary(dict_id) if dict_id else None
+            if kind == "compress":
+                context = zstandard.ZstdCompressor(
+                    level=self.level, dict_data=dictionary
+                )
+            else:
+                context = zstandard.ZstdDecompressor(dict_data=dictionary)
+            contexts[dict_id] = context
+        return context
+
+    def use_dictionary(self, dict_id: int, data: bytes) -> None:
+        """Compress new values with a newly trained dictionary."""
+        with self._lock:
+            self._register(dict_id, data)
+            self._current_id = dict_id
+            self._checked_at = time.monotonic()
+
+    def compress(self, text: str) -> Union[str, bytes]:
+        """Compress text when enabled, otherwise return it unchanged."""
+        if not self.enabled:
+            return text
+        compressor = self._context("compress", self._current_dictionary_id())
+        return compressor.compress(text.encode("utf-8"))
+
+    def decompress(self, value: Union[str, bytes]) -> str:
+        """Return the text of a stored value, compressed or not."""
+        if isinstance(value, str):
+            return value
+        if not is_compressed(value):
+            return value.decode("utf-8")
+        if zstandard is None:
+            raise ValueError(
+                "Reading compressed transcripts needs the zstandard package"
+            )
+        dict_id = zstandard.get_frame_parameters(value).dict_id
+        decompressor = self._context("decompress", dict_id)
+        return decompressor.decompress(value).decode("utf-8")
+
+
+transcript_codec = TranscriptCodec(
+    enabled=TRANSCRIPT_COMPRESSION == "zstd",
+    loader=dictionary_loader(engine),
+)
+
+
+class CompressedText(TypeDecorator):
+    """Unicode text compressed by `transcript_codec` on write.
+
+    SQLite keeps the compressed value as a BLOB in the TEXT column, so the
+    column needs no schema change and can hold both forms at once.
+    """
+
+    impl = UnicodeText
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return transcript_codec.compress(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return transcript_codec.decompress(value)
@@ -0,0 +1,12 @@
+from sqlalchemy import Column, Integer, LargeBinary, DateTime
+from htx_transcriber.database import Base
+
+
+class TranscriptDictionaryModel(Base):
+    __tablename__ = "transcript_dictionaries"
+
+    # The dictionary ID zstd writes into every frame compressed with it
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    data = Column(LargeBinary, nullable=False)
+    sample_count = Column(Integer, nullable=False)
+    created_at = Column(DateTime, nullable=False)
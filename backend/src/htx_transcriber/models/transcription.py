@@ -1,5 +1,8 @@
-from sqlalchemy import Column, Integer, String, UnicodeText, DateTime
+from sqlalchemy import (
+    Column, Integer, BigInteger, Boolean, String, DateTime, Float
+)
 from htx_transcriber.database import Base
+from htx_transcriber.models.compressed_text import CompressedText
 
 
 class TranscriptionModel(Base):
@@ -7,16 +10,65 @@ class TranscriptionModel(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     audio_file_name = Column(String(100), nullable=False, unique=True)
-    transcribed_text = Column(UnicodeText)
+    # zstd compressed when TRANSCRIPT_COMPRESSION is enabled
+    transcribed_text = Column(CompressedText)
+    # ISO 639-1 code detected by Whisper, filterable on list endpoints
+    language = Column(String(10), index=True)
+    language_probability = Column(Float)
+    # Read from the file headers before transcription
+    audio_container = Column(String(10))
+    audio_codec = Column(String(20))
+    duration = Column(Float)
+    sample_rate = Column(Integer)
+    channels = Column(Integer)
+    # 16 kHz mono copy of the upload under UPLOAD_DIR/archive, see
+    # services.audio_archive. archived_at is set once compaction has run,
+    # archive_file_name only when the archive replaced the upload.
+    archive_file_name = Column(String(150))
+    archive_format = Column(String(10))
+    original_size = Column(BigInteger)
+    archive_size = Column(BigInteger)
+    archived_at = Column(DateTime)
+    # How the audio was decoded, see services.decoding_strategy. The tier is
+    # unset when the request named neither a tier nor a latency budget, and
+    # sla_met when it had no budget. latency_seconds runs from the request
+    # start to the end of transcription, including time queued.
+    decoding_strategy = Column(String(50))
+    quality_tier = Column(String(20))
+    latency_budget = Column(Float)
+    latency_seconds = Column(Float)
+    sla_met = Column(Boolean)
     created_at = Column(DateTime, nullable=False)
     updated_at = Column(DateTime, nullable=False)
 
-    def as_JSON(self):
-        """Convert the model to a JSON-compatible dictionary."""
-        return {
+    def as_JSON(self, include_text: bool = True):
+        """Convert the model to a JSON-compatible dictionary.
+
+        Args:
+            include_text: Include the transcript. Leave it out when the
+                query deferred `transcribed_text`, or it is loaded row by row.
+        """
+        data = {
             "id": self.id,
             "audio_file_name": self.audio_file_name,
-            "transcribed_text": self.transcribed_text,
+            "language": self.language,
+            "language_probability": self.language_probability,
+            "audio_container": self.audio_container,
+            "audio_codec": self.audio_codec,
+            "duration": self.duration,
+            "sample_rate": self.sample_rate,
+            "channels": self.channels,
+            "archive_format": self.archive_format,
+            "original_size": self.original_size,
+            "archive_size": self.archive_size,
+            "decoding_strategy": self.decoding_strategy,
+            "quality_tier": self.quality_tier,
+            "latency_budget": self.latency_budget,
+            "latency_seconds": self.latency_seconds,
+            "sla_met": self.sla_met,
             "created_at": self.created_at.isoformat(),
             "updated_at": self.updated_at.isoformat()
         }
+        if include_text:
+            data["transcribed_text"] = self.transcribed_text
+        return data
@@ -0,0 +1,71 @@
+from sqlalchemy import (
+    Column, Integer, BigInteger, String, UnicodeText, DateTime, Float,
+    ForeignKey
+)
+from htx_transcriber.database import Base
+
+UPLOAD_STATUS_OPEN = "open"
+# Claimed by the request that is completing it
+UPLOAD_STATUS_COMPLETING = "completing"
+UPLOAD_STATUS_COMPLETE = "complete"
+
+EARLY_STATUS_RUNNING = "running"
+EARLY_STATUS_DONE = "done"
+EARLY_STATUS_FAILED = "failed"
+
+
+class UploadSessionModel(Base):
+    __tablename__ = "upload_sessions"
+
+    id = Column(String(32), primary_key=True)
+    file_name = Column(String(100), nullable=False)
+    content_type = Column(String(50), nullable=False)
+    total_size = Column(BigInteger, nullable=False)
+    # Optional SHA-256 of the whole file, checked when the upload completes
+    sha256 = Column(String(64))
+    status = Column(String(20), nullable=False)
+    # Transcript of the first window, started before the upload completes
+    early_status = Column(String(20))
+    early_text = Column(UnicodeText)
+    early_language = Column(String(10))
+    early_language_probability = Column(Float)
+    # Leading bytes the early transcript was made from, and their SHA-256
+    early_bytes = Column(BigInteger)
+    early_sha256 = Column(String(64))
+    transcription_id = Column(Integer, ForeignKey("transcriptions.id"))
+    created_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
+
+    def as_JSON(self):
+        """Convert the model to a JSON-compatible dictionary."""
+        return {
+            "id": self.id,
+            "file_name": self.file_name,
+            "content_type": self.content_type,
+            "total_size": self.total_size,
+            "status": self.status,
+            "early_status": self.early_status,
+            "early_transcription": (
+                self.early_text
+                if self.early_status == EARLY_STATUS_DONE else None
+            ),
+            "transcription_id": self.transcription_id,
+            "created_at": self.created_at.isoformat(),
+            "updated_at": self.updated_at.isoformat()
+        }
+
+
+class UploadChunkModel(Base):
+    __tablename__ = "upload_chunks"
+
+    id = Column(Integer, primary_key=True, index=True)
+    session_id = Column(
+        String(32),
+        ForeignKey("upload_sessions.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True
+    )
+    offset = Column(BigInteger, nullable=False)
+    length = Column(Integer, nullable=False)
+    sha256 = Column(String(64), nullable=False)
+    created_at = Column(DateTime, nullable=False)
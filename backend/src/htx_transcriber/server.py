@@ -0,0 +1,214 @@
+"""Pre-forking server which shares one Whisper model across workers.
+
+The parent process loads the model and binds the listening socket, then
+forks the web workers. Each worker inherits the model weights copy-on-write,
+so adding a worker costs its private heap rather than another model copy.
+
+Run with:
+
+    python -m htx_transcriber.server --host 0.0.0.0 --port 8000 --workers 4
+
+Send SIGUSR1 to the parent to log the memory used by every worker.
+"""
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+import torch
+import uvicorn
+
+from htx_transcriber.app import app
+from htx_transcriber.settings import (
+    WEB_WORKERS,
+    TORCH_THREADS_PER_WORKER,
+    WHISPER_MODELS,
+)
+from htx_transcriber.services.transcribe_processor import get_processor
+from htx_transcriber.utils import read_memory_usage
+
+logger = logging.getLogger("htx_transcriber.server")
+
+# Seconds to wait for workers to exit before killing them
+SHUTDOWN_TIMEOUT = 30
+# Seconds before a dead worker is restarted, doubled after every worker in a
+# row that died within MIN_WORKER_UPTIME, up to MAX_RESTART_DELAY
+RESTART_DELAY = 1
+MAX_RESTART_DELAY = 60
+MIN_WORKER_UPTIME = 10
+# Seconds between checks for workers that exited
+POLL_INTERVAL = 0.5
+# Workers in a row that may die within MIN_WORKER_UPTIME before the server
+# gives up
+MAX_FAST_CRASHES = 5
+
+
+def create_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(sock: socket.socket, threads: int) -> None:
+    """Serve the application on an inherited socket."""
+    # uvicorn installs its own handlers for graceful shutdown
+    for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGUSR1):
+        signal.signal(sig, signal.SIG_DFL)
+    if threads > 0:
+        torch.set_num_threads(threads)
+    config = uvicorn.Config(app, log_level="info")
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+class Arbiter:
+    """Fork workers, restart the ones that die and stop them on shutdown."""
+
+    def __init__(self, sock: socket.socket, workers: int, threads: int):
+        self.sock = sock
+        self.num_workers = workers
+        self.threads = threads
+        # Start time of every running worker, by pid
+        self.workers: dict[int, float] = {}
+        self.stopping = False
+        # Set when workers kept crashing on startup
+        self.failed = False
+        self.fast_crashes = 0
+        self.restarts: list[float] = []
+
+    def spawn_worker(self) -> None:
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                run_worker(self.sock, self.threads)
+                code = 0
+            except SystemExit as e:
+                code = e.code if isinstance(e.code, int) else 1
+            except BaseException:
+                logger.exception("Worker %s crashed", os.getpid())
+            finally:
+                logging.shutdown()
+                os._exit(code)
+        self.workers[pid] = time.monotonic()
+        logger.info("Started worker %s", pid)
+
+    def reap_worker(self, pid: int, status: int) -> None:
+        """Schedule the restart of a worker that exited."""
+        started = self.workers.pop(pid, None)
+        if started is None or self.stopping:
+            return
+        code = os.waitstatus_to_exitcode(status)
+        if time.monotonic() - started < MIN_WORKER_UPTIME:
+            self.fast_crashes += 1
+        else:
+            self.fast_crashes = 0
+        if self.fast_crashes >= MAX_FAST_CRASHES:
+            logger.error(
+                "Worker %s exited with status %s, %s workers in a row "
+                "died on startup, stopping", pid, code, self.fast_crashes
+            )
+            self.failed = True
+            self.handle_stop(signal.SIGTERM, None)
+            return
+        delay = min(RESTART_DELAY * 2 ** self.fast_crashes, MAX_RESTART_DELAY)
+        logger.warning(
+            "Worker %s exited with status %s, restarting in %s seconds",
+            pid, code, delay
+        )
+        self.restarts.append(time.monotonic() + delay)
+
+    def handle_stop(self, signum, frame) -> None:
+        self.stopping = True
+        for pid in self.workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def handle_report(self, signum, frame) -> None:
+        parent = read_memory_usage()
+        logger.info("Parent %s memory: %s", os.getpid(), parent)
+        total_pss = parent.get("pss", 0)
+        for pid in sorted(self.workers):
+            usage = read_memory_usage(pid)
+            total_pss += usage.get("pss", 0)
+            logger.info("Worker %s memory: %s", pid, usage)
+        logger.info("Total PSS: %s bytes", total_pss)
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self.handle_stop)
+        signal.signal(signal.SIGINT, self.handle_stop)
+        signal.signal(signal.SIGUSR1, self.handle_report)
+        for _ in range(self.num_workers):
+            self.spawn_worker()
+
+        deadline = None
+        while self.workers or self.restarts:
+            if self.stopping:
+                # Workers waiting to restart are not started again
+                self.restarts.clear()
+                if deadline is None:
+                    deadline = time.monotonic() + SHUTDOWN_TIMEOUT
+            if deadline is not None and time.monotonic() > deadline:
+                for pid in self.workers:
+                    try:
+                        os.kill(pid, signal.SIGKILL)
+                    except ProcessLookupError:
+                        pass
+            now = time.monotonic()
+            for restart_at in [t for t in self.restarts if t <= now]:
+                self.restarts.remove(restart_at)
+                self.spawn_worker()
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                pid = 0
+            if pid == 0:
+                time.sleep(POLL_INTERVAL)
+                continue
+            self.reap_worker(pid, status)
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=WEB_WORKERS)
+    parser.add_argument(
+        "--threads",
+        type=int,
+        default=TORCH_THREADS_PER_WORKER,
+        help="torch threads per worker, 0 keeps the torch default"
+    )
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, stream=sys.stdout)
+
+    # Load the models before forking so workers share their pages
+    for model_name in WHISPER_MODELS:
+        get_processor(model_name)
+    # Move everything allocated so far out of the garbage collector's reach.
+    # Otherwise the first collection in each worker writes to every tracked
+    # object header and un-shares the pages they live on.
+    gc.collect()
+    gc.freeze()
+
+    sock = create_socket(args.host, args.port)
+    logger.info(
+        "Listening on %s:%s with %s workers",
+        args.host, args.port, args.workers
+    )
+    arbiter = Arbiter(sock, args.workers, args.threads)
+    arbiter.run()
+    if arbiter.failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
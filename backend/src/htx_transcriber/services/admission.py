@@ -0,0 +1,169 @@
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator
+
+from htx_transcriber.services.scheduler import select_next
+from htx_transcriber.settings import (
+    MAX_CONCURRENT_TRANSCRIPTIONS,
+    MAX_QUEUED_TRANSCRIPTIONS,
+    TRANSCRIPTION_QUEUE_TIMEOUT,
+    RETRY_AFTER_SECONDS,
+    SCHEDULER_MAX_DELAY,
+)
+
+# Number of recent samples kept for wait and service time statistics
+STATS_WINDOW = 1000
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _percentile(samples: list[float], percentile: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = max(0, math.ceil(percentile / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+class _Waiter:
+    def __init__(self, cost: float, enqueued_at: float):
+        self.cost = cost
+        self.enqueued_at = enqueued_at
+        self.admitted = False
+        self.event = threading.Event()
+
+
+class AdmissionController:
+    """Limit how many transcriptions run at once.
+
+    Callers beyond `max_concurrent` wait in a queue of at most `max_queue`
+    entries for up to `queue_timeout` seconds. When the queue is full or the
+    wait times out the caller is rejected with `AdmissionRejected`.
+
+    A freed slot goes to the oldest queued caller. With a `max_delay` above
+    0 it goes to the one with the least estimated work instead, unless one
+    has waited `max_delay` seconds, see `scheduler.select_next`.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int,
+        max_queue: int,
+        queue_timeout: float,
+        retry_after: int = RETRY_AFTER_SECONDS,
+        max_delay: float = SCHEDULER_MAX_DELAY
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.max_delay = max_delay
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._waiters: list[_Waiter] = []
+        self._admitted = 0
+        self._rejected = 0
+        self._wait_times: deque[float] = deque(maxlen=STATS_WINDOW)
+        self._service_times: deque[float] = deque(maxlen=STATS_WINDOW)
+
+    def _estimate_retry_after(self) -> int:
+        """Estimate when a slot frees up from recent service times."""
+        if not self._service_times:
+            return self.retry_after
+        mean_service = sum(self._service_times) / len(self._service_times)
+        rounds = (len(self._waiters) + 1) / max(self.max_concurrent, 1)
+        return max(1, math.ceil(mean_service * rounds))
+
+    def _reject(self, message: str) -> AdmissionRejected:
+        self._rejected += 1
+        return AdmissionRejected(message, self._estimate_retry_after())
+
+    @contextmanager
+    def admit(self, cost: float = 0.0) -> Iterator[None]:
+        """Hold a transcription slot for the duration of the block.
+
+        Args:
+            cost: Estimated work, in seconds of audio, used to order the
+                queue
+        """
+        queued_at = time.monotonic()
+        with self._lock:
+            if self._in_flight < self.max_concurrent and not self._waiters:
+                self._in_flight += 1
+                waiter = None
+            elif len(self._waiters) >= self.max_queue:
+                raise self._reject("Transcription queue is full")
+            else:
+                waiter = _Waiter(cost, queued_at)
+                self._waiters.append(waiter)
+        if waiter is not None:
+            waiter.event.wait(self.queue_timeout)
+            with self._lock:
+                # The slot may have been handed over just after the timeout
+                if not waiter.admitted:
+                    self._waiters.remove(waiter)
+                    raise self._reject(
+                        "Timed out waiting for a transcription slot"
+                    )
+        with self._lock:
+            self._admitted += 1
+            started_at = time.monotonic()
+            self._wait_times.append(started_at - queued_at)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._service_times.append(time.monotonic() - started_at)
+                if self._waiters:
+                    # Hand the slot straight to the next caller
+                    waiter = select_next(
+                        self._waiters, time.monotonic(), self.max_delay
+                    )
+                    self._waiters.remove(waiter)
+                    waiter.admitted = True
+                    waiter.event.set()
+                else:
+                    self._in_flight -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of queue depth and wait times for capacity planning."""
+        with self._lock:
+            wait_times = list(self._wait_times)
+            service_times = list(self._service_times)
+            return {
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "in_flight": self._in_flight,
+                "queue_depth": len(self._waiters),
+                "admitted": self._admitted,
+                "rejected": self._rejected,
+                "wait_seconds": {
+                    "mean": (
+                        sum(wait_times) / len(wait_times)
+                        if wait_times else 0.0
+                    ),
+                    "p95": _percentile(wait_times, 95),
+                    "max": max(wait_times, default=0.0),
+                },
+                "service_seconds": {
+                    "mean": (
+                        sum(service_times) / len(service_times)
+                        if service_times else 0.0
+                    ),
+                    "p95": _percentile(service_times, 95),
+                },
+            }
+
+
+admission_controller = AdmissionController(
+    max_concurrent=MAX_CONCURRENT_TRANSCRIPTIONS,
+    max_queue=MAX_QUEUED_TRANSCRIPTIONS,
+    queue_timeout=TRANSCRIPTION_QUEUE_TIMEOUT,
+)
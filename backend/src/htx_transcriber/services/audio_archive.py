@@ -0,0 +1,186 @@
+"""Compact transcribed audio into a 16 kHz mono archive.
+
+Whisper only reads 16 kHz mono 16-bit audio, so after a transcription is
+saved its upload is re-encoded to exactly that. FLAC keeps every sample
+Whisper would decode from the original, Opus trades a little of it for a
+much smaller file. The archive name is recorded on the transcription row and
+later re-transcriptions read the archive instead of the upload.
+"""
+import logging
+import os
+import subprocess
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from whisper.audio import SAMPLE_RATE
+
+from htx_transcriber.database import SessionLocal
+from htx_transcriber.models.transcription import TranscriptionModel
+from htx_transcriber.settings import (
+    UPLOAD_DIR,
+    AUDIO_ARCHIVE_FORMAT,
+    AUDIO_ARCHIVE_OPUS_BITRATE,
+    AUDIO_ARCHIVE_TIMEOUT,
+    KEEP_ORIGINAL_AUDIO,
+)
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR_NAME = "archive"
+# File extension, ffmpeg container and encoder options of each format
+ARCHIVE_FORMATS = {
+    "flac": (".flac", "flac", [
+        "-c:a", "flac", "-sample_fmt", "s16", "-compression_level", "8"
+    ]),
+    "opus": (".opus", "ogg", [
+        "-c:a", "libopus", "-b:a", AUDIO_ARCHIVE_OPUS_BITRATE,
+        "-application", "voip"
+    ]),
+}
+
+# Compaction competes with Whisper for CPU, so only one runs at a time
+_compaction_lock = threading.Lock()
+
+
+class ArchiveError(Exception):
+    pass
+
+
+def archive_dir() -> Path:
+    path = Path(str(UPLOAD_DIR)) / ARCHIVE_DIR_NAME
+    path.mkdir(exist_ok=True)
+    return path
+
+
+def resolve_audio_path(transcription: TranscriptionModel) -> Path:
+    """Path of the audio to decode for a transcription, archive first."""
+    if transcription.archive_file_name:
+        return (
+            Path(str(UPLOAD_DIR)) / ARCHIVE_DIR_NAME
+            / transcription.archive_file_name
+        )
+    return Path(str(UPLOAD_DIR)) / transcription.audio_file_name
+
+
+def encode_archive(source: Path, target: Path, archive_format: str) -> None:
+    """Re-encode audio to 16 kHz mono in an archive format."""
+    _, container, codec_options = ARCHIVE_FORMATS[archive_format]
+    # Written beside the target and renamed, so a crash never leaves a
+    # truncated archive under the final name
+    partial = target.with_name(f".{target.name}.part")
+    command = [
+        "ffmpeg", "-nostdin", "-y", "-loglevel", "error",
+        "-i", str(source),
+        "-vn", "-map_metadata", "-1",
+        "-ac", "1", "-ar", str(SAMPLE_RATE),
+        *codec_options,
+        "-f", container,
+        str(partial),
+    ]
+    try:
+        subprocess.run(
+            command,
+            capture_output=True,
+            check=True,
+            timeout=AUDIO_ARCHIVE_TIMEOUT
+        )
+    except subprocess.CalledProcessError as e:
+        partial.unlink(missing_ok=True)
+        raise ArchiveError(
+            f"Failed to archive {source.name}: {e.stderr.decode().strip()}"
+        )
+    except subprocess.TimeoutExpired:
+        partial.unlink(missing_ok=True)
+        raise ArchiveError(
+            f"Archiving {source.name} took over {AUDIO_ARCHIVE_TIMEOUT}s"
+        )
+    os.replace(partial, target)
+
+
+def compact_transcription(
+    transcription_id: int,
+    db: Session,
+    archive_format: str = AUDIO_ARCHIVE_FORMAT
+) -> bool:
+    """Archive the audio of one transcription.
+
+    The archive is only kept when it is smaller than the upload. Either way
+    `archived_at` is set, so the row is not compacted again.
+
+    Returns:
+        True when an archive replaced the upload
+    """
+    transcription = db.get(TranscriptionModel, transcription_id)
+    if transcription is None or transcription.archived_at is not None:
+        return False
+    source = Path(str(UPLOAD_DIR)) / transcription.audio_file_name
+    if not source.exists():
+        return False
+    extension = ARCHIVE_FORMATS[archive_format][0]
+    # The upload's extension is kept in the name, as uploads of the same
+    # name can differ only by extension
+    target = archive_dir() / f"{source.name}{extension}"
+    encode_archive(source, target, archive_format)
+
+    original_size = source.stat().st_size
+    archive_size = target.stat().st_size
+    transcription.original_size = original_size
+    transcription.archived_at = datetime.now()
+    if archive_size >= original_size:
+        target.unlink()
+        db.commit()
+        return False
+    transcription.archive_file_name = target.name
+    transcription.archive_format = archive_format
+    transcription.archive_size = archive_size
+    # Committed first, so a reader that finds the upload gone sees the
+    # archive on reloading the row
+    db.commit()
+    if not KEEP_ORIGINAL_AUDIO:
+        source.unlink()
+    return True
+
+
+def compact_transcriptions(
+    transcription_ids: Iterable[int],
+    session_factory: Callable[[], Session] = SessionLocal
+) -> None:
+    """Archive the audio of saved transcriptions, in the background."""
+    if not AUDIO_ARCHIVE_FORMAT:
+        return
+    db = session_factory()
+    try:
+        with _compaction_lock:
+            for transcription_id in transcription_ids:
+                try:
+                    compact_transcription(transcription_id, db)
+                except Exception:
+                    db.rollback()
+                    # The upload is kept and re-transcription reads it
+                    logger.exception(
+                        "Failed to compact transcription %s", transcription_id
+                    )
+    finally:
+        db.close()
+
+
+def archive_stats(db: Session) -> Dict[str, Any]:
+    """Disk use of archived audio against the uploads it replaced."""
+    files, original_bytes, archive_bytes = db.query(
+        func.count(TranscriptionModel.id),
+        func.coalesce(func.sum(TranscriptionModel.original_size), 0),
+        func.coalesce(func.sum(TranscriptionModel.archive_size), 0),
+    ).filter(
+        TranscriptionModel.archive_file_name.is_not(None)
+    ).one()
+    return {
+        "format": AUDIO_ARCHIVE_FORMAT or None,
+        "files": files,
+        "original_bytes": original_bytes,
+        "archive_bytes": archive_bytes,
+        "ratio": archive_bytes / original_bytes if original_bytes else None,
+    }
@@ -0,0 +1,413 @@
+"""Identify audio files from their headers, without decoding them."""
+import struct
+from dataclasses import dataclass
+from typing import BinaryIO, Optional
+
+# Bytes read from the start and, for Ogg, from the end of the file
+HEADER_BYTES = 64 * 1024
+# How far past any ID3 tag the first MPEG frame may start
+MP3_SYNC_WINDOW = 16 * 1024
+
+CONTAINER_WAV = "wav"
+CONTAINER_FLAC = "flac"
+CONTAINER_OGG = "ogg"
+CONTAINER_MP3 = "mp3"
+CONTAINER_AAC = "aac"
+CONTAINER_MP4 = "mp4"
+
+WAV_CODECS = {
+    0x0003: "pcm_f{bits}le",
+    0x0006: "pcm_alaw",
+    0x0007: "pcm_mulaw",
+    0x0055: "mp3",
+}
+MP4_CODECS = {
+    b"mp4a": "aac",
+    b"alac": "alac",
+    b"Opus": "opus",
+    b"fLaC": "flac",
+    b".mp3": "mp3",
+}
+MP3_BITRATES = {
+    # (MPEG-1, layer) and (MPEG-2/2.5, layer) bitrate tables in kbit/s
+    (1, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384,
+             416, 448],
+    (1, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320,
+             384],
+    (1, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256,
+             320],
+    (2, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224,
+             256],
+    (2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (2, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+MP3_SAMPLE_RATES = {
+    3: [44100, 48000, 32000],  # MPEG-1
+    2: [22050, 24000, 16000],  # MPEG-2
+    0: [11025, 12000, 8000],   # MPEG-2.5
+}
+AAC_SAMPLE_RATES = [
+    96000, 88200, 64000, 48000, 44100, 32000, 24000, 22050, 16000, 12000,
+    11025, 8000, 7350,
+]
+MP4_CONTAINER_BOXES = {b"moov", b"trak", b"mdia", b"minf", b"stbl"}
+
+
+class AudioProbeError(Exception):
+    pass
+
+
+@dataclass
+class AudioMetadata:
+    container: str
+    codec: Optional[str] = None
+    duration: Optional[float] = None
+    sample_rate: Optional[int] = None
+    channels: Optional[int] = None
+
+
+def _read_at(stream: BinaryIO, offset: int, size: int) -> bytes:
+    stream.seek(offset)
+    return stream.read(size)
+
+
+def _id3_size(head: bytes) -> int:
+    """Size of a leading ID3v2 tag, 0 when there is none."""
+    if len(head) < 10 or head[:3] != b"ID3":
+        return 0
+    size = 0
+    for byte in head[6:10]:
+        size = (size << 7) | (byte & 0x7F)
+    footer = 10 if head[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def _probe_wav(stream: BinaryIO, file_size: int) -> AudioMetadata:
+    metadata = AudioMetadata(container=CONTAINER_WAV)
+    byte_rate = 0
+    offset = 12
+    while offset + 8 <= file_size:
+        chunk = _read_at(stream, offset, 8)
+        if len(chunk) < 8:
+            break
+        chunk_id, chunk_size = chunk[:4], struct.unpack("<I", chunk[4:])[0]
+        if chunk_id == b"fmt ":
+            fmt = _read_at(stream, offset + 8, min(chunk_size, 40))
+            if len(fmt) < 16:
+                raise AudioProbeError("Truncated WAV format chunk")
+            (audio_format, channels, sample_rate, byte_rate, _,
+             bits) = struct.unpack("<HHIIHH", fmt[:16])
+            if audio_format == 0xFFFE and len(fmt) >= 26:
+                # WAVE_FORMAT_EXTENSIBLE keeps the real format in the GUID
+                audio_format = struct.unpack("<H", fmt[24:26])[0]
+            if audio_format == 0x0001:
+                metadata.codec = "pcm_u8" if bits == 8 else f"pcm_s{bits}le"
+            else:
+                metadata.codec = WAV_CODECS.get(
+                    audio_format, f"wav_0x{audio_format:04x}"
+                ).format(bits=bits)
+            metadata.channels = channels
+            metadata.sample_rate = sample_rate
+        elif chunk_id == b"data":
+            if not byte_rate:
+                raise AudioProbeError("WAV data chunk before format chunk")
+            # Streamed WAV files may leave the size unset
+            data_size = min(chunk_size, file_size - offset - 8)
+            metadata.duration = data_size / byte_rate
+            return metadata
+        offset += 8 + chunk_size + (chunk_size & 1)
+    raise AudioProbeError("WAV file has no audio data")
+
+
+def _probe_flac(head: bytes, start: int) -> AudioMetadata:
+    block = head[start + 4:start + 8]
+    if len(block) < 4 or block[0] & 0x7F != 0:
+        raise AudioProbeError("FLAC file has no STREAMINFO block")
+    info = head[start + 8:start + 8 + 34]
+    if len(info) < 34:
+        raise AudioProbeError("Truncated FLAC STREAMINFO block")
+    packed = int.from_bytes(info[10:18], "big")
+    sample_rate = packed >> 44
+    channels = ((packed >> 41) & 0x7) + 1
+    total_samples = packed & 0xFFFFFFFFF
+    if not sample_rate:
+        raise AudioProbeError("Invalid FLAC sample rate")
+    return AudioMetadata(
+        container=CONTAINER_FLAC,
+        codec="flac",
+        duration=total_samples / sample_rate if total_samples else None,
+        sample_rate=sample_rate,
+        channels=channels,
+    )
+
+
+def _probe_ogg(
+    stream: BinaryIO, head: bytes, file_size: int
+) -> AudioMetadata:
+    if len(head) < 28:
+        raise AudioProbeError("Truncated Ogg page")
+    segments = head[26]
+    packet = head[27 + segments:27 + segments + 64]
+    metadata = AudioMetadata(container=CONTAINER_OGG)
+    granule_rate = None
+    pre_skip = 0
+    if packet.startswith(b"OpusHead") and len(packet) >= 16:
+        metadata.codec = "opus"
+        metadata.channels = packet[9]
+        pre_skip = struct.unpack("<H", packet[10:12])[0]
+        input_rate = struct.unpack("<I", packet[12:16])[0]
+        metadata.sample_rate = input_rate or 48000
+        # Opus granule positions always count 48 kHz samples
+        granule_rate = 48000
+    elif packet.startswith(b"\x01vorbis") and len(packet) >= 16:
+        metadata.codec = "vorbis"
+        metadata.channels = packet[11]
+        metadata.sample_rate = struct.unpack("<I", packet[12:16])[0]
+        granule_rate = metadata.sample_rate
+    elif packet.startswith(b"\x7fFLAC") and len(packet) >= 51:
+        flac = _probe_flac(packet, 9)
+        metadata.codec = "flac"
+        metadata.channels = flac.channels
+        metadata.sample_rate = flac.sample_rate
+        granule_rate = flac.sample_rate
+    else:
+        raise AudioProbeError("Ogg stream does not contain audio")
+
+    # The granule position of the last page is the stream length in samples
+    tail_start = max(0, file_size - HEADER_BYTES)
+    tail = _read_at(stream, tail_start, HEADER_BYTES)
+    last_page = tail.rfind(b"OggS")
+    if granule_rate and last_page != -1 and last_page + 14 <= len(tail):
+        granule = struct.unpack("<q", tail[last_page + 6:last_page + 14])[0]
+        if granule > 0:
+            metadata.duration = max(0, granule - pre_skip) / granule_rate
+    return metadata
+
+
+def _parse_mp3_header(head: bytes, offset: int) -> Optional[dict]:
+    if offset + 4 > len(head):
+        return None
+    header = int.from_bytes(head[offset:offset + 4], "big")
+    if header >> 21 != 0x7FF:
+        return None
+    version = (header >> 19) & 0x3
+    layer = 4 - ((header >> 17) & 0x3)
+    bitrate_index = (header >> 12) & 0xF
+    rate_index = (header >> 10) & 0x3
+    if version == 1 or layer == 4 or bitrate_index in (0, 15) \
+            or rate_index == 3:
+        return None
+    table = (1 if version == 3 else 2, layer)
+    bitrate = MP3_BITRATES[table][bitrate_index] * 1000
+    sample_rate = MP3_SAMPLE_RATES[version][rate_index]
+    padding = (header >> 9) & 0x1
+    if layer == 1:
+        samples = 384
+        length = (12 * bitrate // sample_rate + padding) * 4
+    else:
+        samples = 1152 if version == 3 or layer == 2 else 576
+        length = samples // 8 * bitrate // sample_rate + padding
+    return {
+        "version": version,
+        "layer": layer,
+        "bitrate": bitrate,
+        "sample_rate": sample_rate,
+        "channels": 1 if (header >> 6) & 0x3 == 3 else 2,
+        "samples": samples,
+        "length": length,
+    }
+
+
+def _probe_mp3(head: bytes, start: int, file_size: int) -> AudioMetadata:
+    # Find two consecutive frame headers so random 0xFFE bytes in a
+    # corrupt file are not taken for audio
+    frame = None
+    offset = start
+    while offset < min(len(head) - 4, start + MP3_SYNC_WINDOW):
+        offset = head.find(b"\xff", offset)
+        if offset == -1:
+            break
+        frame = _parse_mp3_header(head, offset)
+        if frame and (
+            offset + frame["length"] + 4 > len(head)
+            or _parse_mp3_header(head, offset + frame["length"])
+        ):
+            break
+        frame = None
+        offset += 1
+    if frame is None:
+        raise AudioProbeError("No MPEG audio frames found")
+
+    metadata = AudioMetadata(
+        container=CONTAINER_MP3,
+        codec=f"mp{frame['layer']}",
+        sample_rate=frame["sample_rate"],
+        channels=frame["channels"],
+    )
+    # A Xing/Info or VBRI header in the first frame carries the frame count
+    if frame["version"] == 3:
+        side_info = 17 if frame["channels"] == 1 else 32
+    else:
+        side_info = 9 if frame["channels"] == 1 else 17
+    xing = offset + 4 + side_info
+    frames = None
+    if head[xing:xing + 4] in (b"Xing", b"Info") and \
+            len(head) >= xing + 12:
+        flags = struct.unpack(">I", head[xing + 4:xing + 8])[0]
+        if flags & 0x1:
+            frames = struct.unpack(">I", head[xing + 8:xing + 12])[0]
+    elif head[offset + 36:offset + 40] == b"VBRI" and \
+            len(head) >= offset + 54:
+        frames = struct.unpack(">I", head[offset + 50:offset + 54])[0]
+    if frames:
+        metadata.duration = frames * frame["samples"] / frame["sample_rate"]
+    else:
+        # Constant bitrate: duration follows from the audio byte count
+        metadata.duration = (file_size - offset) * 8 / frame["bitrate"]
+    return metadata
+
+
+def _probe_adts(head: bytes, start: int, file_size: int) -> AudioMetadata:
+    offset = start
+    frames = 0
+    frame_bytes = 0
+    sample_rate = channels = None
+    # Average the first frames to estimate the bitrate
+    while offset + 7 <= len(head) and frames < 64:
+        if head[offset] != 0xFF or head[offset + 1] & 0xF6 != 0xF0:
+            break
+        rate_index = (head[offset + 2] >> 2) & 0xF
+        if rate_index >= len(AAC_SAMPLE_RATES):
+            break
+        sample_rate = AAC_SAMPLE_RATES[rate_index]
+        channels = ((head[offset + 2] & 0x1) << 2) | (head[offset + 3] >> 6)
+        length = ((head[offset + 3] & 0x3) << 11) | \
+            (head[offset + 4] << 3) | (head[offset + 5] >> 5)
+        if length < 7:
+            break
+        frames += 1
+        frame_bytes += length
+        offset += length
+    if not frames or not sample_rate:
+        raise AudioProbeError("No ADTS frames found")
+    total_frames = (file_size - start) / (frame_bytes / frames)
+    return AudioMetadata(
+        container=CONTAINER_AAC,
+        codec="aac",
+        duration=total_frames * 1024 / sample_rate,
+        sample_rate=sample_rate,
+        channels=channels or None,
+    )
+
+
+def _mp4_boxes(stream: BinaryIO, start: int, end: int):
+    """Yield (type, payload offset, payload size) for boxes in a range."""
+    offset = start
+    while offset + 8 <= end:
+        header = _read_at(stream, offset, 16)
+        if len(header) < 8:
+            return
+        size, box_type = struct.unpack(">I4s", header[:8])
+        header_size = 8
+        if size == 1 and len(header) == 16:
+            size = struct.unpack(">Q", header[8:16])[0]
+            header_size = 16
+        elif size == 0:
+            size = end - offset
+        if size < header_size:
+            raise AudioProbeError("Invalid MP4 box size")
+        yield box_type, offset + header_size, size - header_size
+        offset += size
+
+
+def _probe_mp4(stream: BinaryIO, file_size: int) -> AudioMetadata:
+    metadata = AudioMetadata(container=CONTAINER_MP4)
+    found_moov = False
+    track: dict = {}
+
+    def walk(start: int, end: int) -> None:
+        nonlocal found_moov, track
+        for box_type, payload, size in _mp4_boxes(stream, start, end):
+            if box_type == b"moov":
+                found_moov = True
+            if box_type == b"trak":
+                track = {}
+                walk(payload, payload + size)
+                if track.get("handler") == b"soun" and not metadata.codec:
+                    metadata.codec = track.get("codec")
+                    metadata.channels = track.get("channels")
+                    metadata.sample_rate = track.get("sample_rate")
+                    if track.get("duration") is not None:
+                        metadata.duration = track["duration"]
+            elif box_type in MP4_CONTAINER_BOXES:
+                walk(payload, payload + size)
+            elif box_type == b"mdhd":
+                data = _read_at(stream, payload, 32)
+                if data[:1] == b"\x01":
+                    timescale, duration = struct.unpack(">IQ", data[20:32])
+                else:
+                    timescale, duration = struct.unpack(">II", data[12:20])
+                if timescale:
+                    track["duration"] = duration / timescale
+            elif box_type == b"hdlr":
+                track["handler"] = _read_at(stream, payload + 8, 4)
+            elif box_type == b"stsd":
+                entry = _read_at(stream, payload + 8, 36)
+                if len(entry) == 36:
+                    fourcc = entry[4:8]
+                    track["codec"] = MP4_CODECS.get(
+                        fourcc, fourcc.decode("latin-1").strip()
+                    )
+                    track["channels"] = struct.unpack(">H", entry[24:26])[0]
+                    track["sample_rate"] = struct.unpack(
+                        ">I", entry[32:36]
+                    )[0] >> 16
+
+    walk(0, file_size)
+    if not found_moov:
+        raise AudioProbeError("MP4 file has no movie header")
+    if not metadata.codec:
+        raise AudioProbeError("MP4 file has no audio track")
+    return metadata
+
+
+def probe_audio(stream: BinaryIO) -> AudioMetadata:
+    """Identify the container and codec of an audio stream.
+
+    Args:
+        stream: Seekable binary file, left positioned at its start
+    Returns:
+        AudioMetadata with the fields the headers provide
+    Raises:
+        AudioProbeError: If the stream is not a supported audio file
+    """
+    try:
+        stream.seek(0, 2)
+        file_size = stream.tell()
+        head = _read_at(stream, 0, HEADER_BYTES)
+        if not head:
+            raise AudioProbeError("File is empty")
+
+        if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+            return _probe_wav(stream, file_size)
+        if head[:4] == b"OggS":
+            return _probe_ogg(stream, head, file_size)
+        if head[4:8] == b"ftyp":
+            return _probe_mp4(stream, file_size)
+        start = _id3_size(head)
+        if start:
+            # Tags with cover art can end anywhere in or past the first
+            # read, so the audio headers are read from the end of the tag
+            head = _read_at(stream, start, HEADER_BYTES)
+            file_size -= start
+            start = 0
+        if head[start:start + 4] == b"fLaC":
+            return _probe_flac(head, start)
+        if head[start:start + 1] == b"\xff" and \
+                len(head) > start + 1 and head[start + 1] & 0xF6 == 0xF0:
+            return _probe_adts(head, start, file_size)
+        return _probe_mp3(head, start, file_size)
+    except (struct.error, IndexError) as e:
+        raise AudioProbeError(f"Corrupt audio header: {str(e)}")
+    finally:
+        stream.seek(0)
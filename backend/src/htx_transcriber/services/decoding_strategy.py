@@ -0,0 +1,290 @@
+"""Choose how to decode a request from its quality tier or latency budget."""
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import Integer, cast, func
+from sqlalchemy.orm import Session
+
+from htx_transcriber.models.transcription import TranscriptionModel
+from htx_transcriber.services.admission import admission_controller
+from htx_transcriber.services.scheduler import estimate_cost
+from htx_transcriber.settings import (
+    DECODE_BEAM_SIZE,
+    INTERACTIVE_LATENCY_BUDGET,
+    STANDARD_LATENCY_BUDGET,
+    WHISPER_MODEL,
+    WHISPER_MODELS,
+)
+
+# Temperatures tried in turn while a decode looks like a failure, as in
+# whisper.transcribe
+FALLBACK_TEMPERATURES = (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)
+
+# Latency budget of each tier in seconds. Batch requests have none and get
+# the most accurate strategy.
+QUALITY_TIERS: Dict[str, Optional[float]] = {
+    "interactive": INTERACTIVE_LATENCY_BUDGET,
+    "standard": STANDARD_LATENCY_BUDGET,
+    "batch": None,
+}
+# Tier recorded for requests that only give a latency budget
+CUSTOM_TIER = "custom"
+# Share of the remaining budget a prediction may use, as run times vary
+BUDGET_HEADROOM = 0.8
+# Weight of the newest run in a strategy's real-time factor
+RTF_SMOOTHING = 0.2
+# Real-time factors on CPU before a strategy has run, by model size
+MODEL_RTF = {
+    "tiny": 0.03,
+    "base": 0.06,
+    "small": 0.2,
+    "medium": 0.5,
+    "turbo": 0.4,
+    "large": 1.0,
+}
+BEAM_SEARCH_COST = 2.0
+FALLBACK_COST = 1.2
+
+
+@dataclass(frozen=True)
+class DecodingStrategy:
+    model: str
+    # Greedy decoding when None
+    beam_size: Optional[int] = None
+    temperatures: Tuple[float, ...] = (0.0,)
+
+    @property
+    def name(self) -> str:
+        search = f"beam{self.beam_size}" if self.beam_size else "greedy"
+        fallback = "+fallback" if len(self.temperatures) > 1 else ""
+        return f"{self.model}/{search}{fallback}"
+
+    def prior_rtf(self) -> float:
+        """Real-time factor assumed before the strategy has been measured."""
+        size = self.model.split(".")[0].split("-")[0]
+        rtf = MODEL_RTF.get(size, 1.0)
+        if self.beam_size:
+            rtf *= BEAM_SEARCH_COST
+        if len(self.temperatures) > 1:
+            rtf *= FALLBACK_COST
+        return rtf
+
+
+DEFAULT_STRATEGY = DecodingStrategy(WHISPER_MODEL)
+
+
+def available_strategies(
+    models: Sequence[str] = WHISPER_MODELS,
+    beam_size: int = DECODE_BEAM_SIZE
+) -> List[DecodingStrategy]:
+    """Decoding strategies, from the fastest to the most accurate."""
+    strategies = []
+    for model in models:
+        strategies += [
+            DecodingStrategy(model),
+            DecodingStrategy(model, None, FALLBACK_TEMPERATURES),
+            DecodingStrategy(model, beam_size, FALLBACK_TEMPERATURES),
+        ]
+    return strategies
+
+
+STRATEGIES = available_strategies()
+
+
+class RealTimeFactors:
+    """Smoothed real-time factor of every strategy that has run.
+
+    Strategies that have not run yet get their prior, scaled by how much
+    faster or slower than their priors the measured strategies ran on this
+    machine.
+    """
+
+    def __init__(self, smoothing: float = RTF_SMOOTHING):
+        self.smoothing = smoothing
+        self._lock = threading.Lock()
+        self._factors: Dict[str, float] = {}
+        self._priors: Dict[str, float] = {}
+        self._runs: Dict[str, int] = {}
+
+    def get(self, strategy: DecodingStrategy) -> float:
+        with self._lock:
+            if strategy.name in self._factors:
+                return self._factors[strategy.name]
+            if not self._factors:
+                return strategy.prior_rtf()
+            speed = sum(
+                factor / self._priors[name]
+                for name, factor in self._factors.items()
+            ) / len(self._factors)
+            return strategy.prior_rtf() * speed
+
+    def record(
+        self, strategy: DecodingStrategy, audio_seconds: float, seconds: float
+    ) -> None:
+        """Add a run that took `seconds` to decode `audio_seconds`."""
+        if audio_seconds <= 0:
+            return
+        measured = seconds / audio_seconds
+        with self._lock:
+            current = self._factors.get(strategy.name)
+            self._factors[strategy.name] = (
+                measured if current is None
+                else current + self.smoothing * (measured - current)
+            )
+            self._priors[strategy.name] = strategy.prior_rtf()
+            self._runs[strategy.name] = self._runs.get(strategy.name, 0) + 1
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {
+                name: {"rtf": factor, "runs": self._runs[name]}
+                for name, factor in sorted(self._factors.items())
+            }
+
+
+real_time_factors = RealTimeFactors()
+
+
+@dataclass
+class DecodingPlan:
+    """Strategy chosen for a request and the deadline it was chosen for."""
+    strategy: DecodingStrategy
+    tier: Optional[str] = None
+    latency_budget: Optional[float] = None
+    started_at: float = field(default_factory=time.monotonic)
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    def sla_met(self, latency: float) -> Optional[bool]:
+        if self.latency_budget is None:
+            return None
+        return latency <= self.latency_budget
+
+
+def resolve_quality_tier(
+    tier: Optional[str], latency_budget: Optional[float]
+) -> Tuple[Optional[str], Optional[float]]:
+    """Validate a requested tier and budget, returning both to use.
+
+    A budget overrides the tier's own. A budget without a tier is recorded
+    under the custom tier.
+    """
+    if tier is not None and tier not in QUALITY_TIERS:
+        error_msg = f"Unknown quality tier {tier}. "
+        error_msg += f"Must be one of: {', '.join(QUALITY_TIERS)}"
+        raise HTTPException(status_code=400, detail=error_msg)
+    if latency_budget is not None and latency_budget <= 0:
+        raise HTTPException(
+            status_code=400, detail="Latency budget must be positive"
+        )
+    if tier is None:
+        return (CUSTOM_TIER if latency_budget else None), latency_budget
+    if latency_budget is None:
+        latency_budget = QUALITY_TIERS[tier]
+    return tier, latency_budget
+
+
+def choose_strategy(
+    audio_seconds: float,
+    remaining: Optional[float],
+    strategies: Sequence[DecodingStrategy] = STRATEGIES,
+    factors: RealTimeFactors = real_time_factors
+) -> DecodingStrategy:
+    """The most accurate strategy predicted to finish within `remaining`.
+
+    `audio_seconds` is the audio that will be decoded, not the length of
+    the files.
+
+    Falls back to the fastest strategy when none fits, and returns the most
+    accurate one when there is no deadline.
+    """
+    if remaining is None:
+        return strategies[-1]
+    limit = remaining * BUDGET_HEADROOM
+    for strategy in reversed(strategies):
+        if factors.get(strategy) * audio_seconds <= limit:
+            return strategy
+    return strategies[0]
+
+
+def plan_decoding(
+    tier: Optional[str],
+    latency_budget: Optional[float],
+    audio_seconds: float,
+    started_at: float
+) -> DecodingPlan:
+    """Choose the strategy for an admitted request.
+
+    Call once the request is admitted, so time spent queueing is taken out
+    of the budget. Requests without a tier keep the default strategy.
+    """
+    if tier is None:
+        return DecodingPlan(DEFAULT_STRATEGY, started_at=started_at)
+    remaining = None
+    if latency_budget is not None:
+        remaining = latency_budget - (time.monotonic() - started_at)
+    return DecodingPlan(
+        choose_strategy(audio_seconds, remaining),
+        tier,
+        latency_budget,
+        started_at
+    )
+
+
+@contextmanager
+def admit_decoding(
+    tier: Optional[str],
+    latency_budget: Optional[float],
+    durations: Sequence[Optional[float]],
+    started_at: float
+) -> Iterator[DecodingPlan]:
+    """Hold a transcription slot and plan the decoding of files in it.
+
+    Raises:
+        AdmissionRejected: If no transcription slot is free
+    """
+    cost = estimate_cost(durations)
+    with admission_controller.admit(cost):
+        # Chosen once admitted, from what is left of the budget
+        yield plan_decoding(tier, latency_budget, cost, started_at)
+
+
+def tier_stats(db: Session) -> Dict[str, Dict[str, Any]]:
+    """SLA hit rate, latency and strategies used per quality tier."""
+    stats: Dict[str, Dict[str, Any]] = {}
+    rows = db.query(
+        TranscriptionModel.quality_tier,
+        func.count(TranscriptionModel.id),
+        func.count(TranscriptionModel.sla_met),
+        func.sum(cast(TranscriptionModel.sla_met, Integer)),
+        func.avg(TranscriptionModel.latency_seconds),
+        func.max(TranscriptionModel.latency_seconds),
+    ).filter(
+        TranscriptionModel.quality_tier.isnot(None)
+    ).group_by(TranscriptionModel.quality_tier)
+    for tier, count, with_budget, met, mean, longest in rows:
+        stats[tier] = {
+            "transcriptions": count,
+            "sla_met": int(met or 0),
+            "sla_hit_rate": (met or 0) / with_budget if with_budget else None,
+            "latency_seconds": {"mean": mean or 0.0, "max": longest or 0.0},
+            "strategies": {},
+        }
+    strategies = db.query(
+        TranscriptionModel.quality_tier,
+        TranscriptionModel.decoding_strategy,
+        func.count(TranscriptionModel.id),
+    ).filter(
+        TranscriptionModel.quality_tier.isnot(None)
+    ).group_by(
+        TranscriptionModel.quality_tier,
+        TranscriptionModel.decoding_strategy
+    )
+    for tier, strategy, count in strategies:
+        stats[tier]["strategies"][strategy] = count
+    return stats
@@ -0,0 +1,235 @@
+"""Sampling profiler for the threads of a running worker."""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from types import CodeType, FrameType
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import htx_transcriber
+
+# (function, file, first line) of one stack frame
+Frame = Tuple[str, str, int]
+
+PACKAGE_DIR = os.path.dirname(htx_transcriber.__file__)
+API_DIR = os.path.join(PACKAGE_DIR, "api")
+# Application modules every thread passes through, never the attribution
+_IGNORED_FILES = {
+    os.path.join(PACKAGE_DIR, name) for name in ("server.py", "main.py")
+} | {__file__, os.path.join(API_DIR, "admin.py")}
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+def _short_path(filename: str) -> str:
+    for marker in ("site-packages" + os.sep, os.sep + "src" + os.sep):
+        if marker in filename:
+            return filename.rsplit(marker, 1)[1]
+    return filename
+
+
+def _frame_key(code: CodeType) -> Frame:
+    return (code.co_qualname, _short_path(code.co_filename),
+            code.co_firstlineno)
+
+
+class Profile:
+    """Samples collected by one profiling run."""
+
+    def __init__(self, interval: float, routes: Dict[CodeType, str]):
+        self.interval = interval
+        self.routes = routes
+        self.samples: Counter[Tuple[str, Tuple[Frame, ...]]] = Counter()
+        # Wall time each stack stood for. Under load the sampler waits for
+        # the GIL, so rounds are further apart than `interval`.
+        self.seconds: Counter[Tuple[str, Tuple[Frame, ...]]] = Counter()
+        self.requests: Counter[str] = Counter()
+        self.started_at = time.monotonic()
+        self.duration = 0.0
+
+    def add_stack(self, frame: FrameType, seconds: float) -> None:
+        """Record a thread's stack, from its attributed frame to the leaf."""
+        codes = []
+        while frame is not None:
+            codes.append(frame.f_code)
+            frame = frame.f_back
+        codes.reverse()
+        start, label = None, None
+        for index, code in enumerate(codes):
+            if code in self.routes:
+                start, label = index, self.routes[code]
+                break
+            if start is None and code.co_filename.startswith(PACKAGE_DIR) \
+                    and code.co_filename not in _IGNORED_FILES:
+                start = index
+        if start is None:
+            return
+        if label is None:
+            code = codes[start]
+            label = f"{_short_path(code.co_filename)}:{code.co_qualname}"
+        stack = tuple(_frame_key(code) for code in codes[start:])
+        self.samples[(label, stack)] += 1
+        self.seconds[(label, stack)] += seconds
+
+    def collapsed(self) -> str:
+        """Folded stacks, one `label;frame;...;frame count` per line."""
+        lines = []
+        for (label, stack), count in sorted(self.samples.items()):
+            frames = [f"{name} ({path}:{line})" for name, path, line in stack]
+            lines.append(f"{';'.join([label, *frames])} {count}")
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self) -> Dict[str, Any]:
+        """Speedscope file with one sampled profile per route."""
+        frame_index: Dict[Frame, int] = {}
+        profiles: Dict[str, Dict[str, Any]] = {}
+        for label, stack in sorted(self.samples):
+            indices = [
+                frame_index.setdefault(frame, len(frame_index))
+                for frame in stack
+            ]
+            profile = profiles.setdefault(label, {
+                "type": "sampled",
+                "name": f"{label} ({self.requests[label]} requests)",
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": 0,
+                "samples": [],
+                "weights": [],
+            })
+            seconds = self.seconds[(label, stack)]
+            profile["samples"].append(indices)
+            profile["weights"].append(seconds)
+            profile["endValue"] += seconds
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": f"htx_transcriber pid {os.getpid()}",
+            "exporter": "htx_transcriber.services.profiler",
+            "activeProfileIndex": 0,
+            "shared": {
+                "frames": [
+                    {"name": name, "file": path, "line": line}
+                    for name, path, line in frame_index
+                ],
+            },
+            "profiles": list(profiles.values()),
+        }
+
+
+class SamplingProfiler:
+    """Run one profile at a time for a duration or a number of requests."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._request_limit: Optional[int] = None
+        self._request_count = 0
+        # Read by the middleware on every request, None when idle
+        self.profile: Optional[Profile] = None
+
+    def start(
+        self,
+        seconds: float,
+        interval: float,
+        routes: Dict[CodeType, str],
+        requests: Optional[int] = None
+    ) -> Profile:
+        """Start sampling until `seconds` pass or `requests` complete."""
+        with self._lock:
+            if self.profile is not None:
+                raise ProfilerBusy("A profile is already running")
+            profile = Profile(interval, routes)
+            self._stop.clear()
+            self._request_limit = requests
+            self._request_count = 0
+            self._thread = threading.Thread(
+                target=self._run,
+                args=(profile, seconds),
+                name="sampling-profiler",
+                daemon=True
+            )
+            self.profile = profile
+        self._thread.start()
+        return profile
+
+    def _run(self, profile: Profile, seconds: float) -> None:
+        own_id = threading.get_ident()
+        deadline = profile.started_at + seconds
+        last = profile.started_at
+        try:
+            while not self._stop.is_set() and time.monotonic() < deadline:
+                now = time.monotonic()
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id != own_id:
+                        profile.add_stack(frame, now - last)
+                last = now
+                self._stop.wait(profile.interval)
+        finally:
+            profile.duration = time.monotonic() - profile.started_at
+            with self._lock:
+                self.profile = None
+
+    def request_finished(self, label: str) -> None:
+        with self._lock:
+            profile = self.profile
+            if profile is None:
+                return
+            profile.requests[label] += 1
+            self._request_count += 1
+            if self._request_limit and \
+                    self._request_count >= self._request_limit:
+                self._stop.set()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Wait for the running profile to finish."""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+            return not thread.is_alive()
+        return True
+
+
+profiler = SamplingProfiler()
+
+
+def route_labels(routes: Iterable[Any]) -> Dict[CodeType, str]:
+    """Map endpoint code objects to `METHOD /path` labels."""
+    labels = {}
+    for route in routes:
+        # Newer FastAPI versions keep included routers nested
+        included = getattr(route, "original_router", None)
+        if included is not None:
+            labels.update(route_labels(included.routes))
+            continue
+        endpoint = getattr(route, "endpoint", None)
+        code = getattr(endpoint, "__code__", None)
+        if code is None or code.co_filename in _IGNORED_FILES:
+            continue
+        methods = ",".join(sorted(getattr(route, "methods", None) or []))
+        labels[code] = f"{methods} {route.path}".strip()
+    return labels
+
+
+class ProfilerMiddleware:
+    """Count finished requests per route while a profile runs."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if profiler.profile is None or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route = scope.get("route")
+            path = getattr(route, "path", scope.get("path", ""))
+            profiler.request_finished(f"{scope.get('method', '')} {path}")
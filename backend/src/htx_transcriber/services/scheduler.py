@@ -0,0 +1,40 @@
+"""Order pending transcription work by the audio Whisper will decode."""
+from typing import Optional, Protocol, Sequence, TypeVar
+
+# Audio Whisper decodes per file, in seconds, and the estimate used when
+# the headers did not give a duration
+WINDOW_SECONDS = 30.0
+
+
+class PendingJob(Protocol):
+    cost: float
+    enqueued_at: float
+
+
+Job = TypeVar("Job", bound=PendingJob)
+
+
+def decoded_seconds(duration: Optional[float]) -> float:
+    """Seconds of audio Whisper decodes from a file of this duration."""
+    if duration is None:
+        return WINDOW_SECONDS
+    return min(duration, WINDOW_SECONDS)
+
+
+def estimate_cost(durations: Sequence[Optional[float]]) -> float:
+    """Estimate the work in a set of files as seconds of audio decoded."""
+    return sum(decoded_seconds(duration) for duration in durations)
+
+
+def select_next(jobs: Sequence[Job], now: float, max_delay: float) -> Job:
+    """Pick the pending job to run next.
+
+    Jobs that have waited at least `max_delay` seconds run first, oldest
+    first, so a `max_delay` of 0 is first come, first served. Otherwise the
+    cheapest job runs, oldest first among equals.
+    """
+    overdue = [job for job in jobs if now - job.enqueued_at >= max_delay]
+    if overdue:
+        return min(overdue, key=lambda job: job.enqueued_at)
+    return min(jobs, key=lambda job: (job.cost, job.enqueued_at))
+
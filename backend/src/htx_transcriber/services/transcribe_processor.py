@@ -1,11 +1,55 @@
+import threading
+import time
+import torch
 import whisper
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Optional, Sequence
+from htx_transcriber.services.decoding_strategy import (
+    DEFAULT_STRATEGY,
+    DecodingStrategy,
+    real_time_factors,
+)
+from htx_transcriber.services.scheduler import estimate_cost
+from htx_transcriber.settings import WHISPER_MODEL, DECODE_BATCH_SIZE
+
+# whisper.transcribe's thresholds for decoding again at a higher temperature
+COMPRESSION_RATIO_THRESHOLD = 2.4
+LOGPROB_THRESHOLD = -1.0
+# Above this no-speech probability a low log probability is silence, not a
+# failed decode
+NO_SPEECH_THRESHOLD = 0.6
 
 
 class TranscriptionError(Exception):
     pass
 
 
+@dataclass
+class TranscriptionResult:
+    text: str = ""
+    language: str | None = None
+    language_probability: float | None = None
+    error: str | None = None
+
+
+def _chunks(items: list, size: int) -> list[list]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def needs_fallback(result: whisper.DecodingResult) -> bool:
+    """Whether a decode looks repetitive or unlikely enough to retry.
+
+    As in whisper.transcribe, a window that is probably silence is never
+    retried, whatever its compression ratio.
+    """
+    if result.no_speech_prob > NO_SPEECH_THRESHOLD and \
+            result.avg_logprob < LOGPROB_THRESHOLD:
+        return False
+    return result.compression_ratio > COMPRESSION_RATIO_THRESHOLD or \
+        result.avg_logprob < LOGPROB_THRESHOLD
+
+
 class WhisperProcessor:
     def __init__(self, model_name: str = "tiny"):
         try:
@@ -13,34 +57,206 @@ class WhisperProcessor:
         except Exception as e:
             raise TranscriptionError(f"Failed to load Whisper model: {str(e)}")
 
-    def transcribe_audio(self, audio_path: str | Path) -> str:
+    def load_mel(self, audio_path: str | Path) -> torch.Tensor:
+        """Load audio and compute the log-mel spectrogram of its start."""
+        audio = whisper.load_audio(str(audio_path))
+        audio = whisper.pad_or_trim(audio)
+        return whisper.log_mel_spectrogram(
+            audio, n_mels=self.model.dims.n_mels
+        ).to(self.model.device)
+
+    def encode(self, mels: Sequence[torch.Tensor]) -> torch.Tensor:
+        """Run the audio encoder once over a batch of mel spectrograms.
+
+        Both language detection and decoding accept the encoded features and
+        skip the encoder, so the expensive forward pass is shared.
+        """
+        with torch.no_grad():
+            return self.model.embed_audio(torch.stack(list(mels)))
+
+    def detect_languages(
+        self, features: torch.Tensor
+    ) -> list[tuple[str, float]]:
+        """Detect the spoken language of every item in a batch."""
+        if not self.model.is_multilingual:
+            return [("en", 1.0)] * features.shape[0]
+        _, probabilities = self.model.detect_language(features)
+        languages = []
+        for language_probs in probabilities:
+            language = max(language_probs, key=language_probs.get)
+            languages.append((language, language_probs[language]))
+        return languages
+
+    def decode(
+        self,
+        features: torch.Tensor,
+        language: str,
+        strategy: DecodingStrategy = DEFAULT_STRATEGY
+    ) -> list[str]:
+        """Decode a batch of encoded audio in one known language.
+
+        With temperature fallback, items whose result `needs_fallback` are
+        decoded again at the next temperature, sampling `beam_size`
+        candidates, until one passes or the temperatures run out. Beam
+        search and sampling several candidates decode one item at a time,
+        as whisper.decode does not batch them.
+        """
+        results: list = [None] * features.shape[0]
+        pending = list(range(features.shape[0]))
+        for temperature in strategy.temperatures:
+            if temperature == 0:
+                options = whisper.DecodingOptions(
+                    fp16=False,
+                    language=language,
+                    beam_size=strategy.beam_size
+                )
+            else:
+                options = whisper.DecodingOptions(
+                    fp16=False,
+                    language=language,
+                    temperature=temperature,
+                    best_of=strategy.beam_size
+                )
+            if strategy.beam_size:
+                decoded = [
+                    whisper.decode(self.model, features[index], options)
+                    for index in pending
+                ]
+            else:
+                decoded = whisper.decode(
+                    self.model, features[pending], options
+                )
+            retry = []
+            for index, result in zip(pending, decoded):
+                results[index] = result
+                if needs_fallback(result):
+                    retry.append(index)
+            pending = retry
+            if not pending:
+                break
+        return [result.text for result in results]
+
+    def transcribe_audio(
+        self, audio_path: str | Path, language: str | None = None
+    ) -> str:
         try:
             # Load and pre-process the audio
-            audio = whisper.load_audio(str(audio_path))
-            audio = whisper.pad_or_trim(audio)
-
-            # Create mel spectrogram
-            mel = whisper.log_mel_spectrogram(audio).to(self.model.device)
+            mel = self.load_mel(audio_path)
 
             # Transcribe
-            options = whisper.DecodingOptions(fp16=False)
+            options = whisper.DecodingOptions(fp16=False, language=language)
             result = whisper.decode(self.model, mel, options)
             # Access the text attribute of the first result
             return result[0].text if isinstance(result, list) else result.text
         except Exception as e:
             raise TranscriptionError(f"Transcription failed: {str(e)}")
 
+    def transcribe_batch(
+        self,
+        audio_paths: Sequence[str | Path],
+        batch_size: int = DECODE_BATCH_SIZE,
+        strategy: DecodingStrategy = DEFAULT_STRATEGY
+    ) -> list[TranscriptionResult]:
+        """Transcribe several files, detecting their languages in batches.
 
-processor = WhisperProcessor()
+        Languages are detected with one pass per batch of encoded audio, then
+        files are decoded in batches of the same language with the language
+        set explicitly so the decoder does not detect it again.
+        Files that fail to load get a result with `error` set instead of
+        failing the whole batch.
+        """
+        results = [TranscriptionResult() for _ in audio_paths]
+        mels = {}
+        for index, audio_path in enumerate(audio_paths):
+            try:
+                mels[index] = self.load_mel(audio_path)
+            except Exception as e:
+                results[index].error = f"Transcription failed: {str(e)}"
 
+        try:
+            features = {}
+            by_language: dict[str, list[int]] = {}
+            for indices in _chunks(list(mels), batch_size):
+                encoded = self.encode([mels[index] for index in indices])
+                languages = self.detect_languages(encoded)
+                for offset, index in enumerate(indices):
+                    language, probability = languages[offset]
+                    features[index] = encoded[offset]
+                    results[index].language = language
+                    results[index].language_probability = probability
+                    by_language.setdefault(language, []).append(index)
 
-def transcribe_audio(audio_path: str | Path) -> str:
+            for language, language_indices in by_language.items():
+                for indices in _chunks(language_indices, batch_size):
+                    texts = self.decode(
+                        torch.stack([features[index] for index in indices]),
+                        language,
+                        strategy
+                    )
+                    for index, text in zip(indices, texts):
+                        results[index].text = text
+        except Exception as e:
+            raise TranscriptionError(f"Transcription failed: {str(e)}")
+        return results
+
+
+_processors: dict[str, WhisperProcessor] = {}
+_processors_lock = threading.Lock()
+
+
+def get_processor(model_name: str = WHISPER_MODEL) -> WhisperProcessor:
+    """Return the shared processor for a model, loading it on first use.
+
+    The pre-forking server calls this before forking workers so the model
+    weights are shared copy-on-write instead of loaded once per worker.
+    """
+    with _processors_lock:
+        if model_name not in _processors:
+            _processors[model_name] = WhisperProcessor(model_name)
+        return _processors[model_name]
+
+
+def transcribe_audio(
+    audio_path: str | Path, language: str | None = None
+) -> str:
     """Transcribe audio file using Whisper model.
     Args:
         audio_path: Path to audio file
+        language: Language code to decode with, detected when not given
     Returns:
         Transcribed text as a string
     Raises:
         TranscriptionError: If transcription fails
     """
-    return processor.transcribe_audio(audio_path)
+    return get_processor().transcribe_audio(audio_path, language)
+
+
+def transcribe_audio_files(
+    audio_paths: Sequence[str | Path],
+    durations: Optional[Sequence[Optional[float]]] = None,
+    strategy: Optional[DecodingStrategy] = None
+) -> list[TranscriptionResult]:
+    """Transcribe several audio files with batched language detection.
+    Args:
+        audio_paths: Paths to audio files
+        durations: Duration of each file in seconds, None when unknown
+        strategy: Model and decoding settings, greedy with the default
+            model when not given
+    Returns:
+        One TranscriptionResult per path, in the same order
+    Raises:
+        TranscriptionError: If the batch cannot be transcribed
+    """
+    strategy = strategy or DEFAULT_STRATEGY
+    started = time.monotonic()
+    results = get_processor(strategy.model).transcribe_batch(
+        audio_paths, strategy=strategy
+    )
+    # Measured per second of audio decoded, for choosing strategies that
+    # fit latency budgets
+    real_time_factors.record(
+        strategy,
+        estimate_cost(durations or [None] * len(audio_paths)),
+        time.monotonic() - started
+    )
+    return results
@@ -0,0 +1,158 @@
+"""Train transcript dictionaries and convert stored transcripts.
+
+These work on a plain connection and the raw column values, so they can run
+from a migration as well as from `htx_transcriber.compress_transcripts`.
+"""
+from datetime import datetime
+from typing import Optional, Tuple
+
+from sqlalchemy import Integer, bindparam, column, insert, select, table
+from sqlalchemy import update
+from sqlalchemy.engine import Connection
+
+from htx_transcriber.models.compressed_text import (
+    TranscriptCodec,
+    is_compressed,
+    zstandard,
+)
+from htx_transcriber.models.transcript_dictionary import (
+    TranscriptDictionaryModel,
+)
+
+DICTIONARY_SIZE = 64 * 1024
+# Newest transcripts used to train a dictionary, and the fewest worth
+# training on
+MAX_TRAINING_SAMPLES = 5000
+MIN_TRAINING_SAMPLES = 50
+CONVERT_BATCH_SIZE = 500
+
+# Raw values, bypassing the CompressedText column type
+_transcriptions = table(
+    "transcriptions",
+    column("id", Integer),
+    column("transcribed_text"),
+)
+
+
+def train_dictionary(
+    connection: Connection,
+    codec: TranscriptCodec,
+    dict_size: int = DICTIONARY_SIZE,
+    max_samples: int = MAX_TRAINING_SAMPLES
+) -> int:
+    """Train a dictionary on stored transcripts and compress with it.
+
+    Returns:
+        ID of the new dictionary
+    Raises:
+        ValueError: Too few transcripts to train on
+    """
+    if zstandard is None:
+        raise ValueError("Training a dictionary needs the zstandard package")
+    values = connection.execute(
+        select(_transcriptions.c.transcribed_text)
+        .where(_transcriptions.c.transcribed_text.is_not(None))
+        .order_by(_transcriptions.c.id.desc())
+        .limit(max_samples)
+    ).scalars()
+    samples = [
+        sample for sample in (
+            codec.decompress(value).encode("utf-8") for value in values
+        ) if sample
+    ]
+    if len(samples) < MIN_TRAINING_SAMPLES:
+        raise ValueError(
+            f"Need at least {MIN_TRAINING_SAMPLES} transcripts to train a "
+            f"dictionary, found {len(samples)}"
+        )
+    try:
+        dictionary = zstandard.train_dictionary(dict_size, samples)
+    except zstandard.ZstdError as e:
+        raise ValueError(f"Could not train a dictionary: {e}")
+    dict_id = dictionary.dict_id()
+    data = dictionary.as_bytes()
+    dictionaries = TranscriptDictionaryModel.__table__
+    # The ID is a hash of the dictionary, so training again on unchanged
+    # transcripts gives a dictionary that is already stored
+    exists = connection.execute(
+        select(dictionaries.c.id).where(dictionaries.c.id == dict_id)
+    ).first()
+    if exists is None:
+        connection.execute(
+            insert(dictionaries).values(
+                id=dict_id,
+                data=data,
+                sample_count=len(samples),
+                created_at=datetime.now()
+            )
+        )
+    codec.use_dictionary(dict_id, data)
+    return dict_id
+
+
+def convert_batch(
+    connection: Connection,
+    codec: TranscriptCodec,
+    compress: bool,
+    after_id: int = 0,
+    batch_size: int = CONVERT_BATCH_SIZE
+) -> Tuple[Optional[int], int]:
+    """Compress or decompress the transcripts of one batch of rows.
+
+    Rows already in the requested form are left alone, so a conversion can
+    be stopped and restarted.
+
+    Args:
+        compress: Compress plain rows, otherwise decompress compressed rows
+        after_id: Convert rows with a greater ID
+    Returns:
+        ID of the last row in the batch, None when there were no rows left,
+        and the number of rows converted
+    """
+    rows = connection.execute(
+        select(_transcriptions.c.id, _transcriptions.c.transcribed_text)
+        .where(_transcriptions.c.id > after_id)
+        .order_by(_transcriptions.c.id)
+        .limit(batch_size)
+    ).all()
+    if not rows:
+        return None, 0
+    updates = []
+    for row_id, value in rows:
+        if value is None or is_compressed(value) == compress:
+            continue
+        text = codec.decompress(value)
+        updates.append({
+            "row_id": row_id,
+            "text": codec.compress(text) if compress else text,
+        })
+    if updates:
+        connection.execute(
+            update(_transcriptions)
+            .where(_transcriptions.c.id == bindparam("row_id"))
+            .values(transcribed_text=bindparam("text")),
+            updates
+        )
+    return rows[-1][0], len(updates)
+
+
+def convert_transcriptions(
+    connection: Connection,
+    codec: TranscriptCodec,
+    compress: bool,
+    batch_size: int = CONVERT_BATCH_SIZE
+) -> int:
+    """Convert every stored transcript in batches of `batch_size` rows.
+
+    Returns:
+        Number of rows converted
+    """
+    if compress and not codec.enabled:
+        raise ValueError("Transcript compression is not enabled")
+    after_id, converted = 0, 0
+    while after_id is not None:
+        after_id, count = convert_batch(
+            connection, codec, compress, after_id, batch_size
+        )
+        converted += count
+    return converted
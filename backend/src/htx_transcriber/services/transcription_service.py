@@ -1,11 +1,26 @@
 from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, BinaryIO
 from fastapi import UploadFile, HTTPException
-from sqlalchemy.orm import Session
-from htx_transcriber.services.transcribe_processor import transcribe_audio
+from sqlalchemy.orm import Session, defer
+from htx_transcriber.services.audio_archive import resolve_audio_path
+from htx_transcriber.services.audio_probe import (
+    AudioMetadata,
+    AudioProbeError,
+    probe_audio,
+)
+from htx_transcriber.services.decoding_strategy import DecodingPlan
+from htx_transcriber.services.transcribe_processor import (
+    TranscriptionResult,
+    transcribe_audio_files
+)
 from htx_transcriber.utils import add_file_version, split_file_name
-from htx_transcriber.settings import UPLOAD_DIR
+from htx_transcriber.settings import (
+    UPLOAD_DIR,
+    MAX_FILES_PER_REQUEST,
+    MAX_REQUEST_BYTES,
+    MAX_AUDIO_DURATION,
+)
 from htx_transcriber.models.transcription import TranscriptionModel
 from sqlalchemy.sql import select
 
@@ -24,93 +39,343 @@ STATUS_SUCCESS = "success"
 STATUS_ERROR = "error"
 
 
-def validate_audio_file(audio_file: UploadFile) -> None:
-    """Validate audio file type."""
-    if audio_file.content_type not in ALLOWED_AUDIO_TYPES:
-        error_msg = f"File type {audio_file.content_type} not allowed. "
+def validate_content_type(content_type: Optional[str]) -> None:
+    """Validate a client-supplied audio content type."""
+    if content_type not in ALLOWED_AUDIO_TYPES:
+        error_msg = f"File type {content_type} not allowed. "
         error_msg += f"Must be one of: {', '.join(ALLOWED_AUDIO_TYPES)}"
         raise HTTPException(status_code=400, detail=error_msg)
 
 
-def process_audio_file(audio_file: UploadFile, db: Session) -> Dict[str, Any]:
-    """Process a single audio file for transcription."""
+def validate_audio_file(audio_file: UploadFile) -> None:
+    """Validate audio file type."""
+    validate_content_type(audio_file.content_type)
+
+
+def inspect_audio_file(audio_file: UploadFile) -> AudioMetadata:
+    """Identify the real audio format from the file headers.
+
+    Only the headers are read, so corrupt or mislabelled files are rejected
+    before they are saved or decoded.
+    """
+    return inspect_audio_stream(audio_file.file, audio_file.filename)
+
+
+def inspect_audio_stream(
+    stream: BinaryIO, file_name: Optional[str]
+) -> AudioMetadata:
+    """Identify the audio format of a stream and check its duration."""
     try:
-        if not audio_file.filename:
-            return {
-                "filename": "unknown",
-                "status": STATUS_ERROR,
-                "message": "Filename is missing"
-            }
-        # Check if file already exists
-        first_version = add_file_version(audio_file.filename)
-        if db.query(TranscriptionModel).filter(
-            TranscriptionModel.audio_file_name == first_version
-        ).first():
-            # Search for latest file with similar name
-            query = db.query(
-                TranscriptionModel.audio_file_name
-            ).filter(
-                TranscriptionModel.audio_file_name.like(
-                    f"{split_file_name(audio_file.filename)[0]}%"
-                )
-            ).order_by(TranscriptionModel.created_at.desc())
-            last_similar_file = query.first()
-            # Update audio file name
-            if last_similar_file:
-                audio_file.filename = add_file_version(
-                    last_similar_file.audio_file_name
+        metadata = probe_audio(stream)
+    except AudioProbeError as e:
+        error_msg = f"File {file_name} is not valid audio: {str(e)}"
+        raise HTTPException(status_code=400, detail=error_msg)
+    if metadata.duration and metadata.duration > MAX_AUDIO_DURATION:
+        error_msg = f"Audio is {metadata.duration:.0f} seconds long. "
+        error_msg += f"At most {MAX_AUDIO_DURATION:.0f} seconds allowed"
+        raise HTTPException(status_code=413, detail=error_msg)
+    return metadata
+
+
+def validate_request_limits(audio_files: List[UploadFile]) -> None:
+    """Validate the number of files and total bytes in a request."""
+    if len(audio_files) > MAX_FILES_PER_REQUEST:
+        error_msg = f"Too many files: {len(audio_files)}. "
+        error_msg += f"At most {MAX_FILES_PER_REQUEST} files per request"
+        raise HTTPException(status_code=400, detail=error_msg)
+    total_bytes = sum(audio_file.size or 0 for audio_file in audio_files)
+    if total_bytes > MAX_REQUEST_BYTES:
+        error_msg = f"Request too large: {total_bytes} bytes. "
+        error_msg += f"At most {MAX_REQUEST_BYTES} bytes per request"
+        raise HTTPException(status_code=413, detail=error_msg)
+
+
+def resolve_file_name(file_name: str, db: Session) -> str:
+    """Return the next versioned name for an uploaded file."""
+    # Check if file already exists
+    first_version = add_file_version(file_name)
+    if db.query(TranscriptionModel).filter(
+        TranscriptionModel.audio_file_name == first_version
+    ).first():
+        # Search for latest file with similar name
+        query = db.query(
+            TranscriptionModel.audio_file_name
+        ).filter(
+            TranscriptionModel.audio_file_name.like(
+                f"{split_file_name(file_name)[0]}%"
+            )
+        ).order_by(TranscriptionModel.created_at.desc())
+        last_similar_file = query.first()
+        if last_similar_file:
+            return add_file_version(last_similar_file.audio_file_name)
+        return file_name
+    return first_version
+
+
+def save_audio_file(
+    audio_file: UploadFile, db: Session, reserved: set[str]
+) -> Path:
+    """Assign a versioned name to an upload and save it to disk.
+
+    Names already handed out in the same batch are kept in `reserved` so
+    two uploads with the same name do not get the same version.
+    """
+    file_name = resolve_file_name(audio_file.filename, db)
+    while file_name in reserved:
+        file_name = add_file_version(file_name)
+    reserved.add(file_name)
+    # Update audio file name
+    audio_file.filename = file_name
+    # Save file to disk
+    upload_dir = str(UPLOAD_DIR)
+    file_path = Path(upload_dir) / audio_file.filename
+    if not file_path.exists():
+        with open(file_path, "wb") as f:
+            f.write(audio_file.file.read())
+    return file_path
+
+
+def _error_result(filename: Optional[str], message: str) -> Dict[str, Any]:
+    return {
+        "filename": filename,
+        "status": STATUS_ERROR,
+        "message": message
+    }
+
+
+def _record_plan(
+    transcription: TranscriptionModel,
+    plan: DecodingPlan,
+    latency: Optional[float]
+) -> None:
+    transcription.decoding_strategy = plan.strategy.name
+    transcription.quality_tier = plan.tier
+    transcription.latency_budget = plan.latency_budget
+    transcription.latency_seconds = latency
+    transcription.sla_met = plan.sla_met(latency)
+
+
+def save_transcription(
+    file_name: str,
+    result: TranscriptionResult,
+    metadata: Optional[AudioMetadata],
+    db: Session,
+    plan: Optional[DecodingPlan] = None,
+    latency: Optional[float] = None
+) -> TranscriptionModel:
+    """Save a transcription and its audio metadata to the database.
+
+    `plan` is the decoding plan the audio was transcribed with and
+    `latency` the seconds from the start of its request to the end of
+    transcription.
+    """
+    transcription = TranscriptionModel(
+        audio_file_name=file_name,
+        transcribed_text=result.text,
+        language=result.language,
+        language_probability=result.language_probability,
+        created_at=datetime.now(),
+        updated_at=datetime.now()
+    )
+    if metadata:
+        transcription.audio_container = metadata.container
+        transcription.audio_codec = metadata.codec
+        transcription.duration = metadata.duration
+        transcription.sample_rate = metadata.sample_rate
+        transcription.channels = metadata.channels
+    if plan:
+        _record_plan(transcription, plan, latency)
+    db.add(transcription)
+    db.commit()
+    return transcription
+
+
+def process_audio_files(
+    audio_files: List[UploadFile],
+    db: Session,
+    metadata: Optional[List[Optional[AudioMetadata]]] = None,
+    plan: Optional[DecodingPlan] = None
+) -> List[Dict[str, Any]]:
+    """Process a batch of audio files for transcription.
+
+    All files are saved first and transcribed together so their languages
+    are detected in batches. `metadata` holds the header metadata of each
+    file, when it was inspected, and is stored with the transcription.
+    `plan` chooses the decoding strategy, recorded with each transcription
+    together with whether it met the request's latency budget.
+    Results are returned in upload order.
+    """
+    if metadata is None:
+        metadata = [None] * len(audio_files)
+    results: List[Dict[str, Any]] = [{} for _ in audio_files]
+    saved: List[tuple[int, Path]] = []
+    reserved: set[str] = set()
+    for index, audio_file in enumerate(audio_files):
+        try:
+            if not audio_file.filename:
+                results[index] = _error_result(
+                    "unknown", "Filename is missing"
                 )
-        else:
-            audio_file.filename = first_version
-        # Save file to disk
-        upload_dir = str(UPLOAD_DIR)
-        file_path = Path(upload_dir) / audio_file.filename
-        if not file_path.exists():
-            with open(file_path, "wb") as f:
-                f.write(audio_file.file.read())
-        # Transcribe the audio
-        transcribed_text = transcribe_audio(file_path)
-        # Save transcription to database
-        transcription = TranscriptionModel(
-            audio_file_name=audio_file.filename,
-            transcribed_text=transcribed_text,
-            created_at=datetime.now(),
-            updated_at=datetime.now()
+                continue
+            saved.append((index, save_audio_file(audio_file, db, reserved)))
+        except Exception as e:
+            results[index] = _error_result(audio_file.filename, str(e))
+        finally:
+            audio_file.file.close()
+
+    if not saved:
+        return results
+    # Transcribe the audio
+    try:
+        transcribed = transcribe_audio_files(
+            [path for _, path in saved],
+            [
+                metadata[index].duration if metadata[index] else None
+                for index, _ in saved
+            ],
+            plan.strategy if plan else None
         )
-        db.add(transcription)
-        db.commit()
-        return {
-            "filename": audio_file.filename,
-            "status": STATUS_SUCCESS,
-            "transcription": transcription.as_JSON()
-        }
     except Exception as e:
-        return {
-            "filename": audio_file.filename,
-            "status": STATUS_ERROR,
-            "message": str(e)
-        }
-    finally:
-        audio_file.file.close()
+        for index, _ in saved:
+            results[index] = _error_result(audio_files[index].filename, str(e))
+        return results
+    latency = plan.elapsed() if plan else None
+
+    for (index, _), result in zip(saved, transcribed):
+        audio_file = audio_files[index]
+        if result.error:
+            results[index] = _error_result(audio_file.filename, result.error)
+            continue
+        try:
+            transcription = save_transcription(
+                audio_file.filename, result, metadata[index], db, plan,
+                latency
+            )
+            results[index] = {
+                "filename": audio_file.filename,
+                "status": STATUS_SUCCESS,
+                "transcription": transcription.as_JSON()
+            }
+        except Exception as e:
+            db.rollback()
+            results[index] = _error_result(audio_file.filename, str(e))
+    return results
+
+
+def process_audio_file(audio_file: UploadFile, db: Session) -> Dict[str, Any]:
+    """Process a single audio file for transcription."""
+    return process_audio_files([audio_file], db)[0]
+
+
+def saved_transcription_ids(results: List[Dict[str, Any]]) -> List[int]:
+    """IDs of the transcriptions saved by `process_audio_files`."""
+    return [
+        result["transcription"]["id"]
+        for result in results
+        if result.get("status") == STATUS_SUCCESS
+    ]
+
+
+def get_transcription(
+    transcription_id: int, db: Session
+) -> TranscriptionModel:
+    transcription = db.get(TranscriptionModel, transcription_id)
+    if transcription is None:
+        raise HTTPException(status_code=404, detail="Transcription not found")
+    return transcription
 
 
-def get_all_transcriptions(db: Session) -> List[Dict[str, Any]]:
+def retranscribe(
+    transcription: TranscriptionModel,
+    db: Session,
+    plan: Optional[DecodingPlan] = None
+) -> Dict[str, Any]:
+    """Transcribe stored audio again, from its archive when it has one.
+
+    `plan` chooses the decoding strategy and is recorded as by
+    `save_transcription`.
+    """
+    strategy = plan.strategy if plan else None
+    audio_path = resolve_audio_path(transcription)
+    result = None
+    if audio_path.exists():
+        result = transcribe_audio_files(
+            [audio_path], [transcription.duration], strategy
+        )[0]
+    if result is None or (result.error and not audio_path.exists()):
+        # Compaction may have replaced the upload with its archive since
+        # the row was read
+        db.refresh(transcription)
+        audio_path = resolve_audio_path(transcription)
+        if not audio_path.exists():
+            raise HTTPException(
+                status_code=404,
+                detail=f"Audio of {transcription.audio_file_name} is missing"
+            )
+        result = transcribe_audio_files(
+            [audio_path], [transcription.duration], strategy
+        )[0]
+    if result.error:
+        return _error_result(transcription.audio_file_name, result.error)
+    transcription.transcribed_text = result.text
+    transcription.language = result.language
+    transcription.language_probability = result.language_probability
+    if plan:
+        _record_plan(transcription, plan, plan.elapsed())
+    transcription.updated_at = datetime.now()
+    db.commit()
+    return {
+        "filename": transcription.audio_file_name,
+        "status": STATUS_SUCCESS,
+        "transcription": transcription.as_JSON()
+    }
+
+
+def _transcriptions_query(db: Session, include_text: bool):
+    query = db.query(TranscriptionModel)
+    if not include_text:
+        # Leave the transcript out of the SELECT so it is neither read nor
+        # decompressed
+        query = query.options(defer(TranscriptionModel.transcribed_text))
+    return query
+
+
+def get_all_transcriptions(
+    db: Session, language: Optional[str] = None, include_text: bool = True
+) -> List[Dict[str, Any]]:
     """Get all transcriptions ordered by creation date."""
-    transcriptions = db.query(TranscriptionModel).order_by(
+    query = _transcriptions_query(db, include_text)
+    if language:
+        query = query.filter(TranscriptionModel.language == language)
+    transcriptions = query.order_by(
         TranscriptionModel.created_at.desc()
     ).all()
-    return [transcription.as_JSON() for transcription in transcriptions]
+    return [
+        transcription.as_JSON(include_text)
+        for transcription in transcriptions
+    ]
 
 
-def search_transcriptions(query: str, db: Session) -> List[Dict[str, Any]]:
+def search_transcriptions(
+    query: str,
+    db: Session,
+    language: Optional[str] = None,
+    include_text: bool = True
+) -> List[Dict[str, Any]]:
     """Search transcriptions by filename."""
-    transcriptions = db.query(TranscriptionModel).filter(
+    search = _transcriptions_query(db, include_text).filter(
         TranscriptionModel.audio_file_name.ilike(f"%{query.lower()}%")
-    ).order_by(
+    )
+    if language:
+        search = search.filter(TranscriptionModel.language == language)
+    transcriptions = search.order_by(
         TranscriptionModel.audio_file_name.desc(),
         TranscriptionModel.created_at.desc()
     ).all()
-    return [transcription.as_JSON() for transcription in transcriptions]
+    return [
+        transcription.as_JSON(include_text)
+        for transcription in transcriptions
+    ]
 
 
 def get_next_version(audio_file: UploadFile, db: Session) -> str:
@@ -0,0 +1,568 @@
+"""Resumable uploads, written chunk by chunk into a partial file."""
+import hashlib
+import math
+import os
+import shutil
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from htx_transcriber.database import SessionLocal
+from htx_transcriber.models.upload_session import (
+    UploadSessionModel,
+    UploadChunkModel,
+    UPLOAD_STATUS_OPEN,
+    UPLOAD_STATUS_COMPLETING,
+    UPLOAD_STATUS_COMPLETE,
+    EARLY_STATUS_RUNNING,
+    EARLY_STATUS_DONE,
+    EARLY_STATUS_FAILED,
+)
+from htx_transcriber.models.transcription import TranscriptionModel
+from htx_transcriber.services.admission import admission_controller
+from htx_transcriber.services.decoding_strategy import (
+    DEFAULT_STRATEGY,
+    admit_decoding,
+    plan_decoding,
+)
+from htx_transcriber.services.audio_probe import HEADER_BYTES
+from htx_transcriber.services.scheduler import WINDOW_SECONDS
+from htx_transcriber.services.transcribe_processor import (
+    TranscriptionError,
+    TranscriptionResult,
+    transcribe_audio_files,
+)
+from htx_transcriber.services.transcription_service import (
+    STATUS_SUCCESS,
+    STATUS_ERROR,
+    inspect_audio_stream,
+    resolve_file_name,
+    save_transcription,
+    validate_content_type,
+)
+from htx_transcriber.settings import (
+    UPLOAD_DIR,
+    UPLOAD_CHUNK_SIZE,
+    MAX_UPLOAD_CHUNK_BYTES,
+    MAX_UPLOAD_BYTES,
+    TRANSCRIPTION_QUEUE_TIMEOUT,
+    UPLOAD_SESSION_TTL,
+)
+from htx_transcriber.utils import add_file_version
+
+PARTIAL_DIR_NAME = ".partial"
+# Extra audio fetched past the window so the decoder never sees a cut frame
+WINDOW_MARGIN = 1.1
+
+# Early transcriptions running in this process, set once they finish
+_early_transcriptions: Dict[str, threading.Event] = {}
+_early_transcriptions_lock = threading.Lock()
+
+
+def _partial_dir() -> Path:
+    partial_dir = Path(str(UPLOAD_DIR)) / PARTIAL_DIR_NAME
+    partial_dir.mkdir(exist_ok=True)
+    return partial_dir
+
+
+def _partial_path(session_id: str) -> Path:
+    return _partial_dir() / session_id
+
+
+def create_upload_session(
+    file_name: str,
+    content_type: str,
+    total_size: int,
+    sha256: Optional[str],
+    db: Session
+) -> UploadSessionModel:
+    """Start a resumable upload and allocate its partial file."""
+    validate_content_type(content_type)
+    if not file_name:
+        raise HTTPException(status_code=400, detail="Filename is missing")
+    if total_size <= 0:
+        raise HTTPException(status_code=400, detail="File is empty")
+    if total_size > MAX_UPLOAD_BYTES:
+        error_msg = f"File too large: {total_size} bytes. "
+        error_msg += f"At most {MAX_UPLOAD_BYTES} bytes per upload"
+        raise HTTPException(status_code=413, detail=error_msg)
+
+    session = UploadSessionModel(
+        id=uuid.uuid4().hex,
+        file_name=file_name,
+        content_type=content_type,
+        total_size=total_size,
+        sha256=sha256.lower() if sha256 else None,
+        status=UPLOAD_STATUS_OPEN,
+        created_at=datetime.now(),
+        updated_at=datetime.now()
+    )
+    # Sparse file of the final size, so chunks are written in place
+    with open(_partial_path(session.id), "wb") as f:
+        f.truncate(total_size)
+    db.add(session)
+    db.commit()
+    return session
+
+
+def get_upload_session(session_id: str, db: Session) -> UploadSessionModel:
+    session = db.get(UploadSessionModel, session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return session
+
+
+def received_ranges(session_id: str, db: Session) -> List[Tuple[int, int]]:
+    """Merged [start, end) byte ranges received for an upload."""
+    chunks = db.query(
+        UploadChunkModel.offset, UploadChunkModel.length
+    ).filter(
+        UploadChunkModel.session_id == session_id
+    ).order_by(UploadChunkModel.offset).all()
+    ranges: List[Tuple[int, int]] = []
+    for offset, length in chunks:
+        end = offset + length
+        if ranges and offset <= ranges[-1][1]:
+            ranges[-1] = (ranges[-1][0], max(ranges[-1][1], end))
+        else:
+            ranges.append((offset, end))
+    return ranges
+
+
+def missing_ranges(
+    ranges: List[Tuple[int, int]], total_size: int
+) -> List[Tuple[int, int]]:
+    """[start, end) byte ranges not yet covered by `ranges`."""
+    missing = []
+    position = 0
+    for start, end in ranges:
+        if start > position:
+            missing.append((position, start))
+        position = max(position, end)
+    if position < total_size:
+        missing.append((position, total_size))
+    return missing
+
+
+def upload_status(session: UploadSessionModel, db: Session) -> Dict[str, Any]:
+    ranges = received_ranges(session.id, db)
+    return {
+        **session.as_JSON(),
+        "chunk_size": UPLOAD_CHUNK_SIZE,
+        "bytes_received": sum(end - start for start, end in ranges),
+        "received": ranges,
+        "missing": missing_ranges(ranges, session.total_size),
+    }
+
+
+def write_chunk(
+    session_id: str,
+    offset: int,
+    data: bytes,
+    checksum: Optional[str],
+    db: Session
+) -> Tuple[Dict[str, Any], Optional[int]]:
+    """Verify a chunk and write it at its offset in the partial file.
+
+    Returns:
+        The upload status, and the number of leading bytes to transcribe
+        early when this chunk completed the first window, otherwise None
+    """
+    session = get_upload_session(session_id, db)
+    if session.status != UPLOAD_STATUS_OPEN:
+        raise HTTPException(status_code=409, detail="Upload is not open")
+    if not data:
+        raise HTTPException(status_code=400, detail="Chunk is empty")
+    if len(data) > MAX_UPLOAD_CHUNK_BYTES:
+        error_msg = f"Chunk too large: {len(data)} bytes. "
+        error_msg += f"At most {MAX_UPLOAD_CHUNK_BYTES} bytes per chunk"
+        raise HTTPException(status_code=413, detail=error_msg)
+    if offset < 0 or offset + len(data) > session.total_size:
+        error_msg = f"Chunk at offset {offset} of {len(data)} bytes is "
+        error_msg += f"outside the {session.total_size} byte file"
+        raise HTTPException(status_code=400, detail=error_msg)
+    digest = hashlib.sha256(data).hexdigest()
+    if checksum and checksum.lower() != digest:
+        raise HTTPException(status_code=400, detail="Chunk checksum mismatch")
+
+    try:
+        fd = os.open(_partial_path(session.id), os.O_WRONLY)
+    except FileNotFoundError:
+        # Expired while the chunk was arriving
+        raise HTTPException(status_code=404, detail="Upload not found")
+    try:
+        os.pwrite(fd, data, offset)
+    finally:
+        os.close(fd)
+    session.updated_at = datetime.now()
+    db.add(UploadChunkModel(
+        session_id=session.id,
+        offset=offset,
+        length=len(data),
+        sha256=digest,
+        created_at=datetime.now()
+    ))
+    db.commit()
+    return upload_status(session, db), claim_early_transcription(session, db)
+
+
+def _window_bytes(session: UploadSessionModel) -> Optional[int]:
+    """Estimate how many leading bytes hold Whisper's window of audio.
+
+    Returns None for audio that completion would reject, such as files
+    longer than MAX_AUDIO_DURATION, so none of it is transcribed.
+    """
+    try:
+        with open(_partial_path(session.id), "rb") as f:
+            metadata = inspect_audio_stream(f, session.file_name)
+    except HTTPException:
+        return None
+    if not metadata.duration:
+        return None
+    fraction = min(1.0, WINDOW_SECONDS * WINDOW_MARGIN / metadata.duration)
+    return min(
+        session.total_size,
+        math.ceil(session.total_size * fraction) + HEADER_BYTES
+    )
+
+
+def claim_early_transcription(
+    session: UploadSessionModel, db: Session
+) -> Optional[int]:
+    """Claim the early transcription once the first window has arrived.
+
+    The claim is a conditional update, so only one request starts it even
+    when chunks land on several workers at once.
+    """
+    if session.early_status is not None:
+        return None
+    ranges = received_ranges(session.id, db)
+    prefix = ranges[0][1] if ranges and ranges[0][0] == 0 else 0
+    if prefix < min(HEADER_BYTES, session.total_size):
+        return None
+    window_bytes = _window_bytes(session)
+    if window_bytes is None or prefix < window_bytes:
+        return None
+    claimed = db.query(UploadSessionModel).filter(
+        UploadSessionModel.id == session.id,
+        UploadSessionModel.early_status.is_(None)
+    ).update(
+        {UploadSessionModel.early_status: EARLY_STATUS_RUNNING},
+        synchronize_session=False
+    )
+    db.commit()
+    if not claimed:
+        return None
+    with _early_transcriptions_lock:
+        _early_transcriptions[session.id] = threading.Event()
+    return window_bytes
+
+
+def run_early_transcription(
+    session_id: str,
+    window_bytes: int,
+    session_factory: Callable[[], Session] = SessionLocal
+) -> None:
+    """Transcribe the first window of an upload that is still arriving."""
+    db = session_factory()
+    partial_path = _partial_path(session_id)
+    head_path = partial_path.with_name(f"{session_id}.head")
+    try:
+        try:
+            with open(partial_path, "rb") as f:
+                head = f.read(window_bytes)
+        except FileNotFoundError:
+            # Expired or aborted since it was claimed
+            return
+        head_path.write_bytes(head)
+        values: Dict[Any, Any] = {
+            UploadSessionModel.early_bytes: len(head),
+            UploadSessionModel.early_sha256: hashlib.sha256(head).hexdigest(),
+        }
+        try:
+            with admission_controller.admit(WINDOW_SECONDS):
+                result = transcribe_audio_files([head_path])[0]
+            if result.error:
+                raise TranscriptionError(result.error)
+            values[UploadSessionModel.early_text] = result.text
+            values[UploadSessionModel.early_language] = result.language
+            values[UploadSessionModel.early_language_probability] = \
+                result.language_probability
+            values[UploadSessionModel.early_status] = EARLY_STATUS_DONE
+        except Exception:
+            # Completion falls back to transcribing the whole file
+            values[UploadSessionModel.early_status] = EARLY_STATUS_FAILED
+        values[UploadSessionModel.updated_at] = datetime.now()
+        # Matches no row when the upload expired meanwhile
+        db.query(UploadSessionModel).filter(
+            UploadSessionModel.id == session_id,
+            UploadSessionModel.early_status == EARLY_STATUS_RUNNING
+        ).update(values, synchronize_session=False)
+        db.commit()
+    finally:
+        head_path.unlink(missing_ok=True)
+        with _early_transcriptions_lock:
+            finished = _early_transcriptions.pop(session_id, None)
+        if finished is not None:
+            finished.set()
+        db.close()
+
+
+def _file_sha256(path: Path, size: Optional[int] = None) -> str:
+    """SHA-256 of a file, or of its first `size` bytes."""
+    digest = hashlib.sha256()
+    remaining = size
+    with open(path, "rb") as f:
+        while remaining is None or remaining > 0:
+            block = f.read(
+                1024 * 1024 if remaining is None
+                else min(1024 * 1024, remaining)
+            )
+            if not block:
+                break
+            digest.update(block)
+            if remaining is not None:
+                remaining -= len(block)
+    return digest.hexdigest()
+
+
+def _early_result(
+    session: UploadSessionModel, db: Session, wait: bool
+) -> Optional[TranscriptionResult]:
+    """The early transcript, if its audio is still the start of the file.
+
+    With `wait`, an early transcription running in this process is waited
+    for; ones running in other workers are not.
+    """
+    with _early_transcriptions_lock:
+        running = _early_transcriptions.get(session.id)
+    if wait and running is not None:
+        running.wait(TRANSCRIPTION_QUEUE_TIMEOUT)
+    db.refresh(session)
+    if session.early_status != EARLY_STATUS_DONE or \
+            not session.early_sha256:
+        return None
+    # Chunks in the window may have been sent again with other bytes
+    if _file_sha256(
+        _partial_path(session.id), session.early_bytes
+    ) != session.early_sha256:
+        return None
+    return TranscriptionResult(
+        text=session.early_text or "",
+        language=session.early_language,
+        language_probability=session.early_language_probability
+    )
+
+
+def _completed_upload(
+    session: UploadSessionModel, db: Session
+) -> Dict[str, Any]:
+    transcription = db.get(TranscriptionModel, session.transcription_id)
+    return {
+        "filename": transcription.audio_file_name,
+        "status": STATUS_SUCCESS,
+        "transcription": transcription.as_JSON()
+    }
+
+
+def _set_upload_status(
+    session_id: str, current: str, status: str, db: Session
+) -> bool:
+    """Move an upload from `current` to `status`, if no request has yet."""
+    updated = db.query(UploadSessionModel).filter(
+        UploadSessionModel.id == session_id,
+        UploadSessionModel.status == current
+    ).update(
+        {
+            UploadSessionModel.status: status,
+            UploadSessionModel.updated_at: datetime.now()
+        },
+        synchronize_session=False
+    )
+    db.commit()
+    return bool(updated)
+
+
+def complete_upload(
+    session_id: str,
+    db: Session,
+    tier: Optional[str] = None,
+    latency_budget: Optional[float] = None,
+    started_at: Optional[float] = None
+) -> Dict[str, Any]:
+    """Check that every byte arrived, then transcribe and save the file.
+
+    `tier` and `latency_budget` choose the decoding strategy as for
+    `/transcribe`, counting from `started_at`.
+
+    Completing an upload twice returns the saved transcription again, so a
+    client that lost the first response can safely retry. The upload is
+    claimed with a conditional update first, so when completion is retried
+    while the first attempt is still running, only one of them transcribes
+    and moves the file.
+
+    Raises:
+        AdmissionRejected: If no transcription slot is free; the upload
+            stays open and completion can be retried
+    """
+    session = get_upload_session(session_id, db)
+    if session.status == UPLOAD_STATUS_COMPLETE:
+        return _completed_upload(session, db)
+    if not _set_upload_status(
+        session.id, UPLOAD_STATUS_OPEN, UPLOAD_STATUS_COMPLETING, db
+    ):
+        db.refresh(session)
+        if session.status == UPLOAD_STATUS_COMPLETE:
+            return _completed_upload(session, db)
+        raise HTTPException(
+            status_code=409, detail="Upload is already being completed"
+        )
+    if started_at is None:
+        started_at = time.monotonic()
+    try:
+        result = _complete_claimed_upload(
+            session, db, tier, latency_budget, started_at
+        )
+    except BaseException:
+        db.rollback()
+        _set_upload_status(
+            session.id, UPLOAD_STATUS_COMPLETING, UPLOAD_STATUS_OPEN, db
+        )
+        raise
+    if result["status"] != STATUS_SUCCESS:
+        _set_upload_status(
+            session.id, UPLOAD_STATUS_COMPLETING, UPLOAD_STATUS_OPEN, db
+        )
+    return result
+
+
+def _complete_claimed_upload(
+    session: UploadSessionModel,
+    db: Session,
+    tier: Optional[str],
+    latency_budget: Optional[float],
+    started_at: float
+) -> Dict[str, Any]:
+    missing = missing_ranges(
+        received_ranges(session.id, db), session.total_size
+    )
+    if missing:
+        raise HTTPException(
+            status_code=409,
+            detail={"message": "Upload is incomplete", "missing": missing}
+        )
+    partial_path = _partial_path(session.id)
+    if session.sha256 and _file_sha256(partial_path) != session.sha256:
+        raise HTTPException(status_code=400, detail="File checksum mismatch")
+    with open(partial_path, "rb") as f:
+        metadata = inspect_audio_stream(f, session.file_name)
+
+    # The early transcript was decoded with the default strategy
+    result = _early_result(session, db, wait=True)
+    if result is not None and tier is None:
+        plan = plan_decoding(None, None, WINDOW_SECONDS, started_at)
+    else:
+        with admit_decoding(
+            tier, latency_budget, [metadata.duration], started_at
+        ) as plan:
+            if result is None:
+                # Another worker may have finished it in the meantime
+                result = _early_result(session, db, wait=False)
+            if result is None or plan.strategy != DEFAULT_STRATEGY:
+                result = transcribe_audio_files(
+                    [partial_path], [metadata.duration], plan.strategy
+                )[0]
+    latency = plan.elapsed()
+    if result.error:
+        return {
+            "filename": session.file_name,
+            "status": STATUS_ERROR,
+            "message": result.error
+        }
+
+    file_name = resolve_file_name(session.file_name, db)
+    while (Path(str(UPLOAD_DIR)) / file_name).exists():
+        file_name = add_file_version(file_name)
+    shutil.move(partial_path, Path(str(UPLOAD_DIR)) / file_name)
+    transcription = save_transcription(
+        file_name, result, metadata, db, plan, latency
+    )
+    session.status = UPLOAD_STATUS_COMPLETE
+    session.transcription_id = transcription.id
+    session.updated_at = datetime.now()
+    db.query(UploadChunkModel).filter(
+        UploadChunkModel.session_id == session.id
+    ).delete()
+    db.commit()
+    return {
+        "filename": file_name,
+        "status": STATUS_SUCCESS,
+        "transcription": transcription.as_JSON()
+    }
+
+
+def expire_upload_sessions(
+    session_factory: Callable[[], Session] = SessionLocal
+) -> int:
+    """Delete upload sessions that have not changed for UPLOAD_SESSION_TTL.
+
+    Open sessions lose their chunks and partial file. Completed sessions
+    only lose the row that let completion be retried; their transcription
+    is kept. Partial files without a session are deleted once as old.
+
+    Returns:
+        The number of sessions deleted
+    """
+    db = session_factory()
+    cutoff = datetime.now() - timedelta(seconds=UPLOAD_SESSION_TTL)
+    expired = 0
+    try:
+        session_ids = [
+            session_id for session_id, in db.query(UploadSessionModel.id)
+            .filter(UploadSessionModel.updated_at < cutoff)
+        ]
+        for session_id in session_ids:
+            db.query(UploadChunkModel).filter(
+                UploadChunkModel.session_id == session_id
+            ).delete(synchronize_session=False)
+            # Skipped if a chunk arrived since the query
+            deleted = db.query(UploadSessionModel).filter(
+                UploadSessionModel.id == session_id,
+                UploadSessionModel.updated_at < cutoff
+            ).delete(synchronize_session=False)
+            if not deleted:
+                db.rollback()
+                continue
+            db.commit()
+            _partial_path(session_id).unlink(missing_ok=True)
+            expired += 1
+        live = {
+            session_id for session_id, in db.query(UploadSessionModel.id)
+        }
+        for path in _partial_dir().iterdir():
+            session_id = path.name.split(".")[0]
+            if session_id not in live and \
+                    datetime.fromtimestamp(path.stat().st_mtime) < cutoff:
+                path.unlink(missing_ok=True)
+    finally:
+        db.close()
+    return expired
+
+
+def abort_upload(session_id: str, db: Session) -> None:
+    """Discard an open upload and its partial file."""
+    session = get_upload_session(session_id, db)
+    if session.status != UPLOAD_STATUS_OPEN:
+        raise HTTPException(status_code=409, detail="Upload is not open")
+    _partial_path(session.id).unlink(missing_ok=True)
+    db.query(UploadChunkModel).filter(
+        UploadChunkModel.session_id == session.id
+    ).delete()
+    db.delete(session)
+    db.commit()
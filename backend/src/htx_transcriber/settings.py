@@ -15,3 +15,94 @@ UPLOAD_DIR = os.getenv("UPLOAD_DIR")
 if not UPLOAD_DIR:
     raise ValueError("UPLOAD_DIR is not set")
 Path(UPLOAD_DIR).mkdir(exist_ok=True)
+
+# Admission control for the transcription stage
+MAX_CONCURRENT_TRANSCRIPTIONS = int(
+    os.getenv("MAX_CONCURRENT_TRANSCRIPTIONS", "2")
+)
+MAX_QUEUED_TRANSCRIPTIONS = int(os.getenv("MAX_QUEUED_TRANSCRIPTIONS", "8"))
+TRANSCRIPTION_QUEUE_TIMEOUT = float(
+    os.getenv("TRANSCRIPTION_QUEUE_TIMEOUT", "30")
+)
+RETRY_AFTER_SECONDS = int(os.getenv("RETRY_AFTER_SECONDS", "5"))
+# Queued requests are served first come, first served. Above 0, they are
+# served least audio first, except that one which has waited this many
+# seconds goes ahead of newer requests.
+SCHEDULER_MAX_DELAY = float(os.getenv("SCHEDULER_MAX_DELAY", "0"))
+
+# Per-request upload limits
+MAX_FILES_PER_REQUEST = int(os.getenv("MAX_FILES_PER_REQUEST", "20"))
+MAX_REQUEST_BYTES = int(
+    os.getenv("MAX_REQUEST_BYTES", str(500 * 1024 * 1024))
+)
+# Longest audio accepted, in seconds, as read from the file headers
+MAX_AUDIO_DURATION = float(os.getenv("MAX_AUDIO_DURATION", "14400"))
+
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "tiny")
+# Number of files encoded, language-detected and decoded together
+DECODE_BATCH_SIZE = int(os.getenv("DECODE_BATCH_SIZE", "8"))
+
+# Models a quality tier or latency budget can pick from, smallest first.
+# All of them are loaded at startup.
+WHISPER_MODELS = [
+    name.strip()
+    for name in os.getenv("WHISPER_MODELS", WHISPER_MODEL).split(",")
+    if name.strip()
+]
+if WHISPER_MODEL not in WHISPER_MODELS:
+    raise ValueError("WHISPER_MODELS must include WHISPER_MODEL")
+# Beam width of the beam search strategies
+DECODE_BEAM_SIZE = int(os.getenv("DECODE_BEAM_SIZE", "5"))
+# Latency budgets in seconds of the interactive and standard quality tiers
+INTERACTIVE_LATENCY_BUDGET = float(
+    os.getenv("INTERACTIVE_LATENCY_BUDGET", "10")
+)
+STANDARD_LATENCY_BUDGET = float(os.getenv("STANDARD_LATENCY_BUDGET", "60"))
+
+# Pre-forking server
+WEB_WORKERS = int(os.getenv("WEB_WORKERS", "1"))
+TORCH_THREADS_PER_WORKER = int(os.getenv("TORCH_THREADS_PER_WORKER", "0"))
+
+# Resumable uploads
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(8 * 1024 * 1024)))
+MAX_UPLOAD_CHUNK_BYTES = int(
+    os.getenv("MAX_UPLOAD_CHUNK_BYTES", str(64 * 1024 * 1024))
+)
+MAX_UPLOAD_BYTES = int(
+    os.getenv("MAX_UPLOAD_BYTES", str(2 * 1024 * 1024 * 1024))
+)
+# Seconds after its last chunk that an upload session and its partial file
+# are deleted
+UPLOAD_SESSION_TTL = float(os.getenv("UPLOAD_SESSION_TTL", str(24 * 3600)))
+
+# Transcript storage, "zstd" compresses new transcript bodies with the
+# newest trained dictionary. Needs the zstandard package.
+TRANSCRIPT_COMPRESSION = os.getenv("TRANSCRIPT_COMPRESSION", "")
+if TRANSCRIPT_COMPRESSION not in ("", "zstd"):
+    raise ValueError("TRANSCRIPT_COMPRESSION must be empty or zstd")
+TRANSCRIPT_COMPRESSION_LEVEL = int(
+    os.getenv("TRANSCRIPT_COMPRESSION_LEVEL", "9")
+)
+# Seconds between checks for a newly trained dictionary
+TRANSCRIPT_DICTIONARY_REFRESH = float(
+    os.getenv("TRANSCRIPT_DICTIONARY_REFRESH", "60")
+)
+
+# Opt in to compacting transcribed audio to 16 kHz mono, "flac" (lossless
+# at the rate Whisper reads, lossy against the upload) or "opus". The
+# archive replaces the upload unless KEEP_ORIGINAL_AUDIO is true. Empty, the
+# default, keeps uploads as they were sent.
+AUDIO_ARCHIVE_FORMAT = os.getenv("AUDIO_ARCHIVE_FORMAT", "")
+if AUDIO_ARCHIVE_FORMAT not in ("", "flac", "opus"):
+    raise ValueError("AUDIO_ARCHIVE_FORMAT must be empty, flac or opus")
+AUDIO_ARCHIVE_OPUS_BITRATE = os.getenv("AUDIO_ARCHIVE_OPUS_BITRATE", "32k")
+# Seconds an encode may run before it is killed and the upload kept
+AUDIO_ARCHIVE_TIMEOUT = float(os.getenv("AUDIO_ARCHIVE_TIMEOUT", "600"))
+# Keep the uploaded file next to its archive
+KEEP_ORIGINAL_AUDIO = os.getenv("KEEP_ORIGINAL_AUDIO", "false") == "true"
+
+# Token for the admin endpoints, sent as X-Admin-Token. Unset disables them.
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+# Sampling profiler started from POST /admin/profile
+PROFILER_INTERVAL = float(os.getenv("PROFILER_INTERVAL", "0.01"))
+MAX_PROFILE_SECONDS = float(os.getenv("MAX_PROFILE_SECONDS", "300"))
@@ -17,3 +17,32 @@ def add_file_version(file_name: str) -> str:
         return re.sub(r'ver_\d+$', f"ver_{next_number}", base_name) + extension
     else:
         return base_name + "_ver_1" + extension
+
+
+def read_memory_usage(pid: int | str = "self") -> dict[str, int]:
+    """Read RSS, PSS, shared and private memory in bytes from /proc.
+
+    PSS splits shared pages between the processes mapping them, so summing it
+    across workers gives the real memory cost of a multi-worker deployment.
+    Returns an empty dict where /proc/<pid>/smaps_rollup is not available.
+    """
+    fields = {
+        "Rss": "rss",
+        "Pss": "pss",
+        "Shared_Clean": "shared",
+        "Shared_Dirty": "shared",
+        "Private_Clean": "private",
+        "Private_Dirty": "private",
+    }
+    usage: dict[str, int] = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                name, _, value = line.partition(":")
+                if name in fields:
+                    key = fields[name]
+                    kilobytes = int(value.split()[0])
+                    usage[key] = usage.get(key, 0) + kilobytes * 1024
+    except OSError:
+        return {}
+    return usage
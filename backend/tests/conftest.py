@@ -5,6 +5,13 @@ from sqlalchemy.pool import StaticPool
 
 from htx_transcriber.database import Base
 from htx_transcriber.models.transcription import TranscriptionModel
+from htx_transcriber.models.transcript_dictionary import (
+    TranscriptDictionaryModel,
+)
+from htx_transcriber.models.upload_session import (
+    UploadSessionModel,
+    UploadChunkModel,
+)
 
 
 # Create a test database engine
@@ -44,7 +51,10 @@ def db_session(session_factory, tables):
         yield session
     finally:
         # Clean up all records to ensure test isolation
+        session.query(UploadChunkModel).delete()
+        session.query(UploadSessionModel).delete()
         session.query(TranscriptionModel).delete()
+        session.query(TranscriptDictionaryModel).delete()
         session.commit()
         session.rollback()
         session.close()
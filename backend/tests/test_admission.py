@@ -0,0 +1,164 @@
+import threading
+import pytest
+from unittest.mock import patch, MagicMock
+from fastapi import BackgroundTasks, HTTPException
+
+from htx_transcriber.api.transcribe import transcribe
+from htx_transcriber.services.admission import (
+    AdmissionController,
+    AdmissionRejected,
+)
+from htx_transcriber.services.transcription_service import (
+    validate_request_limits
+)
+
+
+def make_upload_file(filename="sample_audio.mp3", size=1024):
+    file = MagicMock()
+    file.filename = filename
+    file.content_type = "audio/mpeg"
+    file.size = size
+    return file
+
+
+def test_admit_within_limit():
+    """Test that callers within the concurrency limit are admitted."""
+    controller = AdmissionController(
+        max_concurrent=2, max_queue=0, queue_timeout=0.1
+    )
+    with controller.admit():
+        with controller.admit():
+            assert controller.stats()["in_flight"] == 2
+    stats = controller.stats()
+    assert stats["in_flight"] == 0
+    assert stats["admitted"] == 2
+    assert stats["rejected"] == 0
+
+
+def test_admit_rejects_when_queue_full():
+    """Test that callers are rejected when no queue slot is left."""
+    controller = AdmissionController(
+        max_concurrent=1, max_queue=0, queue_timeout=1, retry_after=7
+    )
+    with controller.admit():
+        with pytest.raises(AdmissionRejected) as excinfo:
+            with controller.admit():
+                pass
+    assert excinfo.value.retry_after == 7
+    assert controller.stats()["rejected"] == 1
+
+
+def test_admit_times_out_in_queue():
+    """Test that queued callers give up after the queue timeout."""
+    controller = AdmissionController(
+        max_concurrent=1, max_queue=1, queue_timeout=0.05
+    )
+    with controller.admit():
+        with pytest.raises(AdmissionRejected) as excinfo:
+            with controller.admit():
+                pass
+    assert "Timed out" in str(excinfo.value)
+
+
+def test_admit_waits_for_free_slot():
+    """Test that a queued caller runs once a slot frees up."""
+    controller = AdmissionController(
+        max_concurrent=1, max_queue=1, queue_timeout=5
+    )
+    entered = threading.Event()
+    release = threading.Event()
+
+    def hold_slot():
+        with controller.admit():
+            entered.set()
+            release.wait()
+
+    holder = threading.Thread(target=hold_slot)
+    holder.start()
+    entered.wait()
+    threading.Timer(0.05, release.set).start()
+    with controller.admit():
+        pass
+    holder.join()
+
+    stats = controller.stats()
+    assert stats["admitted"] == 2
+    assert stats["queue_depth"] == 0
+    assert stats["wait_seconds"]["max"] > 0
+
+
+def test_admit_serves_shortest_queued_job_first():
+    """Test that a freed slot goes to the queued job with the least work."""
+    controller = AdmissionController(
+        max_concurrent=1, max_queue=2, queue_timeout=5, max_delay=60
+    )
+    order = []
+    release = threading.Event()
+
+    def run(name, cost):
+        with controller.admit(cost):
+            order.append(name)
+
+    with controller.admit():
+        long_job = threading.Thread(target=run, args=("long", 2400))
+        long_job.start()
+        while controller.stats()["queue_depth"] < 1:
+            release.wait(0.01)
+        short_job = threading.Thread(target=run, args=("short", 10))
+        short_job.start()
+        while controller.stats()["queue_depth"] < 2:
+            release.wait(0.01)
+    long_job.join()
+    short_job.join()
+
+    assert order == ["short", "long"]
+
+
+def test_validate_request_limits_too_many_files():
+    """Test that requests with too many files are rejected."""
+    files = [make_upload_file(f"audio{i}.mp3") for i in range(3)]
+    with patch(
+        'htx_transcriber.services.transcription_service.'
+        'MAX_FILES_PER_REQUEST', 2
+    ):
+        with pytest.raises(HTTPException) as excinfo:
+            validate_request_limits(files)
+    assert excinfo.value.status_code == 400
+
+
+def test_validate_request_limits_too_many_bytes():
+    """Test that requests above the byte limit are rejected."""
+    files = [make_upload_file(size=600), make_upload_file(size=600)]
+    with patch(
+        'htx_transcriber.services.transcription_service.MAX_REQUEST_BYTES',
+        1000
+    ):
+        with pytest.raises(HTTPException) as excinfo:
+            validate_request_limits(files)
+    assert excinfo.value.status_code == 413
+
+
+@patch('htx_transcriber.api.transcribe.process_audio_files')
+@patch('htx_transcriber.api.transcribe.inspect_audio_file')
+def test_transcribe_returns_503_when_saturated(
+    mock_inspect, mock_process, db_session
+):
+    """Test that the endpoint sheds load with Retry-After when saturated."""
+    mock_inspect.return_value.duration = 10.0
+    controller = AdmissionController(
+        max_concurrent=1, max_queue=0, queue_timeout=0.1, retry_after=3
+    )
+    with patch(
+        'htx_transcriber.services.decoding_strategy.admission_controller',
+        controller
+    ):
+        with controller.admit():
+            with pytest.raises(HTTPException) as excinfo:
+                transcribe(
+                    BackgroundTasks(), [make_upload_file()], db_session,
+                    tier=None, latency_budget=None
+                )
+
+    assert excinfo.value.status_code == 503
+    assert excinfo.value.headers == {"Retry-After": "3"}
+    mock_process.assert_not_called()
@@ -0,0 +1,241 @@
+import shutil
+import subprocess
+import wave
+from datetime import datetime
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from htx_transcriber.models.transcription import TranscriptionModel
+from htx_transcriber.services.audio_archive import (
+    ArchiveError,
+    archive_stats,
+    compact_transcription,
+    compact_transcriptions,
+    encode_archive,
+    resolve_audio_path,
+)
+from htx_transcriber.services.decoding_strategy import (
+    STRATEGIES,
+    DecodingPlan,
+)
+from htx_transcriber.services.transcribe_processor import TranscriptionResult
+from htx_transcriber.services.transcription_service import retranscribe
+
+
+@pytest.fixture
+def upload_dir(tmp_path):
+    with patch(
+        'htx_transcriber.services.audio_archive.UPLOAD_DIR', tmp_path
+    ):
+        yield tmp_path
+
+
+def add_transcription(db_session, upload_dir, size=1000):
+    (upload_dir / "meeting_ver_1.wav").write_bytes(b"\0" * size)
+    transcription = TranscriptionModel(
+        audio_file_name="meeting_ver_1.wav",
+        transcribed_text="Old text",
+        duration=10.0,
+        created_at=datetime.now(),
+        updated_at=datetime.now()
+    )
+    db_session.add(transcription)
+    db_session.commit()
+    return transcription
+
+
+def fake_encode(archive_bytes):
+    def encode(source, target, archive_format):
+        target.write_bytes(b"\0" * archive_bytes)
+    return encode
+
+
+@patch('htx_transcriber.services.audio_archive.encode_archive')
+def test_compact_transcription(mock_encode, db_session, upload_dir):
+    """Test that the archive replaces the upload and is recorded."""
+    mock_encode.side_effect = fake_encode(100)
+    transcription = add_transcription(db_session, upload_dir)
+
+    assert compact_transcription(transcription.id, db_session, "flac")
+
+    assert transcription.archive_file_name == "meeting_ver_1.wav.flac"
+    assert transcription.archive_format == "flac"
+    assert transcription.original_size == 1000
+    assert transcription.archive_size == 100
+    assert not (upload_dir / "meeting_ver_1.wav").exists()
+    assert resolve_audio_path(transcription) == (
+        upload_dir / "archive" / "meeting_ver_1.wav.flac"
+    )
+    assert archive_stats(db_session)["archive_bytes"] == 100
+    # Compaction runs once per row
+    assert not compact_transcription(transcription.id, db_session, "flac")
+
+
+@patch('htx_transcriber.services.audio_archive.encode_archive')
+def test_compact_keeps_smaller_upload(mock_encode, db_session, upload_dir):
+    """Test that an archive larger than the upload is discarded."""
+    mock_encode.side_effect = fake_encode(2000)
+    transcription = add_transcription(db_session, upload_dir)
+
+    assert not compact_transcription(transcription.id, db_session, "flac")
+
+    assert transcription.archived_at is not None
+    assert transcription.archive_file_name is None
+    assert (upload_dir / "meeting_ver_1.wav").exists()
+    assert not (upload_dir / "archive" / "meeting_ver_1.wav.flac").exists()
+    assert resolve_audio_path(transcription) == (
+        upload_dir / "meeting_ver_1.wav"
+    )
+
+
+@patch('htx_transcriber.services.audio_archive.KEEP_ORIGINAL_AUDIO', True)
+@patch('htx_transcriber.services.audio_archive.encode_archive')
+def test_compact_keeps_original(mock_encode, db_session, upload_dir):
+    """Test that the upload is kept when configured."""
+    mock_encode.side_effect = fake_encode(100)
+    transcription = add_transcription(db_session, upload_dir)
+
+    assert compact_transcription(transcription.id, db_session, "flac")
+    assert (upload_dir / "meeting_ver_1.wav").exists()
+
+
+@patch('htx_transcriber.services.audio_archive.AUDIO_ARCHIVE_FORMAT', "flac")
+@patch('htx_transcriber.services.audio_archive.encode_archive')
+def test_compaction_failure_keeps_upload(
+    mock_encode, db_session, session_factory, upload_dir
+):
+    """Test that a failed compaction leaves the row to be retried."""
+    mock_encode.side_effect = RuntimeError("ffmpeg failed")
+    transcription = add_transcription(db_session, upload_dir)
+
+    compact_transcriptions([transcription.id], session_factory)
+
+    db_session.refresh(transcription)
+    assert transcription.archived_at is None
+    assert (upload_dir / "meeting_ver_1.wav").exists()
+
+
+@patch('htx_transcriber.services.audio_archive.encode_archive')
+def test_archive_is_off_by_default(
+    mock_encode, db_session, session_factory, upload_dir
+):
+    """Test that uploads are kept as sent unless a format is set."""
+    transcription = add_transcription(db_session, upload_dir)
+
+    compact_transcriptions([transcription.id], session_factory)
+
+    mock_encode.assert_not_called()
+    assert (upload_dir / "meeting_ver_1.wav").exists()
+
+
+@patch('htx_transcriber.services.transcription_service.transcribe_audio_files')
+@patch('htx_transcriber.services.audio_archive.encode_archive')
+def test_retranscribe_reads_archive(
+    mock_encode, mock_transcribe, db_session, upload_dir
+):
+    """Test that re-transcription decodes the archive."""
+    mock_encode.side_effect = fake_encode(100)
+    mock_transcribe.return_value = [
+        TranscriptionResult(text="New text", language="en")
+    ]
+    transcription = add_transcription(db_session, upload_dir)
+    compact_transcription(transcription.id, db_session, "flac")
+
+    result = retranscribe(transcription, db_session)
+
+    assert result["status"] == "success"
+    assert result["transcription"]["transcribed_text"] == "New text"
+    mock_transcribe.assert_called_once_with(
+        [upload_dir / "archive" / "meeting_ver_1.wav.flac"], [10.0], None
+    )
+
+
+@patch('htx_transcriber.services.transcription_service.transcribe_audio_files')
+@patch('htx_transcriber.services.audio_archive.encode_archive')
+def test_retranscribe_during_compaction(
+    mock_encode, mock_transcribe, db_session, session_factory, upload_dir
+):
+    """Test that re-transcription follows an upload archived meanwhile."""
+    mock_encode.side_effect = fake_encode(100)
+    transcription = add_transcription(db_session, upload_dir)
+
+    def compact(audio_paths, durations, strategy):
+        if mock_transcribe.call_count == 2:
+            return [TranscriptionResult(text="New text", language="en")]
+        other = session_factory()
+        try:
+            compact_transcription(transcription.id, other, "flac")
+        finally:
+            other.close()
+        return [TranscriptionResult(error="No such file")]
+
+    mock_transcribe.side_effect = compact
+
+    result = retranscribe(transcription, db_session)
+
+    assert result["transcription"]["transcribed_text"] == "New text"
+    assert [call.args[0] for call in mock_transcribe.call_args_list] == [
+        [upload_dir / "meeting_ver_1.wav"],
+        [upload_dir / "archive" / "meeting_ver_1.wav.flac"],
+    ]
+
+
+@patch('htx_transcriber.services.transcription_service.transcribe_audio_files')
+def test_retranscribe_records_plan(mock_transcribe, db_session, upload_dir):
+    """Test that re-transcription decodes and records a tier's strategy."""
+    mock_transcribe.return_value = [
+        TranscriptionResult(text="New text", language="en")
+    ]
+    transcription = add_transcription(db_session, upload_dir)
+    plan = DecodingPlan(STRATEGIES[-1], "batch", None)
+
+    result = retranscribe(transcription, db_session, plan)
+
+    assert mock_transcribe.call_args.args[2] == STRATEGIES[-1]
+    saved = result["transcription"]
+    assert saved["decoding_strategy"] == STRATEGIES[-1].name
+    assert saved["quality_tier"] == "batch"
+    assert transcription.latency_seconds is not None
+
+
+def stuck_encode(command, **kwargs):
+    # ffmpeg writes part of its output before it is killed
+    Path(command[-1]).write_bytes(b"\0")
+    raise subprocess.TimeoutExpired(command, kwargs["timeout"])
+
+
+@patch(
+    'htx_transcriber.services.audio_archive.subprocess.run',
+    side_effect=stuck_encode
+)
+def test_encode_archive_timeout(mock_run, tmp_path):
+    """Test that a stuck encode fails and leaves no partial archive."""
+    source = tmp_path / "meeting.wav"
+    source.write_bytes(b"\0")
+
+    with pytest.raises(ArchiveError):
+        encode_archive(source, tmp_path / "meeting.wav.flac", "flac")
+
+    assert list(tmp_path.iterdir()) == [source]
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="needs ffmpeg")
+def test_encode_archive(tmp_path):
+    """Test that audio is archived as 16 kHz mono."""
+    source = tmp_path / "stereo.wav"
+    with wave.open(str(source), "wb") as wav:
+        wav.setnchannels(2)
+        wav.setsampwidth(2)
+        wav.setframerate(48000)
+        wav.writeframes(b"\x01\x00\x02\x00" * 48000)
+    target = tmp_path / "stereo.wav.flac"
+
+    encode_archive(source, target, "flac")
+
+    from htx_transcriber.services.audio_probe import probe_audio
+    with open(target, "rb") as f:
+        metadata = probe_audio(f)
+    assert metadata.sample_rate == 16000
+    assert metadata.channels == 1
@@ -0,0 +1,146 @@
+import io
+import struct
+import wave
+import pytest
+from unittest.mock import patch, MagicMock
+from fastapi import HTTPException
+
+from htx_transcriber.services.audio_probe import (
+    HEADER_BYTES,
+    AudioProbeError,
+    probe_audio,
+)
+from htx_transcriber.services.transcription_service import inspect_audio_file
+
+
+def make_wav(seconds=2, sample_rate=16000, channels=2):
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(b"\x00\x00" * channels * sample_rate * seconds)
+    buffer.seek(0)
+    return buffer
+
+
+def make_flac(sample_rate=44100, channels=2, total_samples=441000):
+    packed = (sample_rate << 44) | ((channels - 1) << 41) | \
+        (15 << 36) | total_samples
+    streaminfo = b"\x10\x00\x10\x00" + b"\x00" * 6 + \
+        packed.to_bytes(8, "big") + b"\x00" * 16
+    return io.BytesIO(b"fLaC" + b"\x80\x00\x00\x22" + streaminfo)
+
+
+def make_ogg_page(packet, granule):
+    header = b"OggS\x00\x02" + struct.pack("<q", granule) + b"\x00" * 12
+    return header + bytes([1, len(packet)]) + packet
+
+
+def make_mp3(frames=100, tag_size=10):
+    # MPEG-1 layer III, 128 kbit/s, 44.1 kHz, joint stereo
+    header = b"\xff\xfb\x90\x40"
+    frame = header + b"\x00" * (417 - len(header))
+    # ID3v2 sizes are synchsafe, 7 bits per byte
+    size = bytes((tag_size >> shift) & 0x7F for shift in (21, 14, 7, 0))
+    return io.BytesIO(b"ID3\x03\x00\x00" + size + b"\x00" * tag_size +
+                      frame * frames)
+
+
+def test_probe_wav():
+    metadata = probe_audio(make_wav(seconds=2, channels=2))
+
+    assert metadata.container == "wav"
+    assert metadata.codec == "pcm_s16le"
+    assert metadata.duration == 2
+    assert metadata.sample_rate == 16000
+    assert metadata.channels == 2
+
+
+def test_probe_flac():
+    metadata = probe_audio(make_flac())
+
+    assert metadata.container == "flac"
+    assert metadata.duration == 10
+    assert metadata.sample_rate == 44100
+    assert metadata.channels == 2
+
+
+def test_probe_ogg_opus():
+    head = b"OpusHead\x01\x01" + struct.pack("<HI", 312, 48000) + \
+        b"\x00\x00\x00"
+    stream = io.BytesIO(
+        make_ogg_page(head, 0) + make_ogg_page(b"\x00" * 20, 48000 * 3 + 312)
+    )
+
+    metadata = probe_audio(stream)
+
+    assert metadata.codec == "opus"
+    assert metadata.channels == 1
+    assert metadata.duration == 3
+
+
+def test_probe_mp3_after_id3_tag():
+    metadata = probe_audio(make_mp3(frames=100))
+
+    assert metadata.container == "mp3"
+    assert metadata.sample_rate == 44100
+    assert metadata.channels == 2
+    assert metadata.duration == pytest.approx(100 * 1152 / 44100, rel=0.01)
+
+
+@pytest.mark.parametrize(
+    "tag_size", [HEADER_BYTES - 100, HEADER_BYTES - 12, 200 * 1024]
+)
+def test_probe_mp3_after_large_id3_tag(tag_size):
+    """Test that frames are found after a tag ending near or past the
+    first read, such as one with embedded cover art."""
+    metadata = probe_audio(make_mp3(frames=100, tag_size=tag_size))
+
+    assert metadata.container == "mp3"
+    assert metadata.sample_rate == 44100
+    assert metadata.duration == pytest.approx(100 * 1152 / 44100, rel=0.01)
+
+
+def test_probe_rejects_non_audio():
+    with pytest.raises(AudioProbeError):
+        probe_audio(io.BytesIO(b"%PDF-1.7\n" + b"\x00" * 4096))
+
+
+def test_probe_rejects_empty_file():
+    with pytest.raises(AudioProbeError):
+        probe_audio(io.BytesIO(b""))
+
+
+def test_probe_rewinds_stream():
+    stream = make_wav()
+    probe_audio(stream)
+    assert stream.tell() == 0
+
+
+def test_inspect_audio_file_rejects_mislabelled_file():
+    """Test that the real format wins over the client's content type."""
+    file = MagicMock()
+    file.filename = "document.mp3"
+    file.content_type = "audio/mpeg"
+    file.file = io.BytesIO(b"%PDF-1.7\n" + b"\x00" * 4096)
+
+    with pytest.raises(HTTPException) as excinfo:
+        inspect_audio_file(file)
+
+    assert excinfo.value.status_code == 400
+
+
+@patch(
+    'htx_transcriber.services.transcription_service.MAX_AUDIO_DURATION', 1
+)
+def test_inspect_audio_file_rejects_long_audio():
+    """Test that audio above the duration limit is rejected early."""
+    file = MagicMock()
+    file.filename = "long.wav"
+    file.file = make_wav(seconds=2)
+
+    with pytest.raises(HTTPException) as excinfo:
+        inspect_audio_file(file)
+
+    assert excinfo.value.status_code == 413
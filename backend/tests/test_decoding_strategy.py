@@ -0,0 +1,153 @@
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from htx_transcriber.models.transcription import TranscriptionModel
+from htx_transcriber.services.decoding_strategy import (
+    CUSTOM_TIER,
+    DEFAULT_STRATEGY,
+    DecodingPlan,
+    RealTimeFactors,
+    available_strategies,
+    choose_strategy,
+    plan_decoding,
+    resolve_quality_tier,
+    tier_stats,
+)
+from htx_transcriber.services.scheduler import estimate_cost
+from htx_transcriber.services.transcribe_processor import TranscriptionResult
+from htx_transcriber.services.transcription_service import save_transcription
+
+STRATEGIES = available_strategies(["tiny", "small"], beam_size=5)
+
+
+def test_strategies_from_fastest_to_most_accurate():
+    """Test that strategies are named and ordered by model and search."""
+    assert [strategy.name for strategy in STRATEGIES] == [
+        "tiny/greedy",
+        "tiny/greedy+fallback",
+        "tiny/beam5+fallback",
+        "small/greedy",
+        "small/greedy+fallback",
+        "small/beam5+fallback",
+    ]
+
+
+def test_resolve_quality_tier():
+    """Test that tiers get their budget unless one is given."""
+    assert resolve_quality_tier(None, None) == (None, None)
+    assert resolve_quality_tier("batch", None) == ("batch", None)
+    assert resolve_quality_tier("interactive", 3.0) == ("interactive", 3.0)
+    assert resolve_quality_tier(None, 3.0) == (CUSTOM_TIER, 3.0)
+    for tier, budget in (("fastest", None), (None, 0.0)):
+        with pytest.raises(HTTPException) as excinfo:
+            resolve_quality_tier(tier, budget)
+        assert excinfo.value.status_code == 400
+
+
+def test_choose_strategy_fits_budget():
+    """Test that the most accurate strategy predicted to fit is chosen."""
+    factors = RealTimeFactors()
+    for strategy, rtf in zip(STRATEGIES, [0.01, 0.02, 0.05, 0.1, 0.2, 0.5]):
+        factors.record(strategy, 100.0, 100.0 * rtf)
+
+    def choose(audio_seconds, remaining):
+        return choose_strategy(
+            audio_seconds, remaining, STRATEGIES, factors
+        ).name
+
+    # 60 seconds of audio with 10 seconds left may use 8 seconds
+    assert choose(60.0, 10.0) == "small/greedy"
+    assert choose(60.0, 100.0) == "small/beam5+fallback"
+    assert choose(60.0, None) == "small/beam5+fallback"
+    # Nothing fits, the fastest strategy runs
+    assert choose(600.0, 1.0) == "tiny/greedy"
+
+
+def test_choose_strategy_for_decoded_audio():
+    """Test that a long file is planned as the 30 seconds decoded."""
+    factors = RealTimeFactors()
+    for strategy, rtf in zip(STRATEGIES, [0.01, 0.02, 0.05, 0.1, 0.2, 0.5]):
+        factors.record(strategy, 100.0, 100.0 * rtf)
+    audio_seconds = estimate_cost([600.0, 10.0])
+
+    assert audio_seconds == 40.0
+    # 40 seconds decoded at 0.2 take the 8 seconds allowed, 610 would not
+    assert choose_strategy(
+        audio_seconds, 10.0, STRATEGIES, factors
+    ).name == "small/greedy+fallback"
+
+
+def test_real_time_factors_are_smoothed():
+    """Test that measurements replace the prior, then are smoothed."""
+    factors = RealTimeFactors(smoothing=0.5)
+    strategy = STRATEGIES[0]
+    assert factors.get(strategy) == strategy.prior_rtf()
+
+    factors.record(strategy, 10.0, 2.0)
+    factors.record(strategy, 10.0, 4.0)
+
+    assert factors.get(strategy) == pytest.approx(0.3)
+    assert factors.stats()[strategy.name]["runs"] == 2
+    # Strategies yet to run are scaled like the measured ones
+    unmeasured = STRATEGIES[-1]
+    assert factors.get(unmeasured) == pytest.approx(
+        unmeasured.prior_rtf() * 0.3 / strategy.prior_rtf()
+    )
+
+
+def test_plan_decoding_counts_time_queued():
+    """Test that time spent before admission comes out of the budget."""
+    started_at = time.monotonic() - 9.9
+    plan = plan_decoding("interactive", 10.0, 30.0, started_at)
+    # Nothing fits in the tenth of a second left, the fastest runs
+    assert plan.strategy == DEFAULT_STRATEGY
+    assert plan.tier == "interactive"
+    assert plan.sla_met(9.0) is True
+    assert plan.sla_met(12.0) is False
+
+    batch = plan_decoding("batch", None, 30.0, started_at)
+    assert batch.strategy.beam_size is not None
+    assert batch.sla_met(600.0) is None
+
+    default = plan_decoding(None, None, 30.0, started_at)
+    assert default.strategy == DEFAULT_STRATEGY
+    assert default.tier is None
+
+
+def save(db_session, name, plan, latency):
+    return save_transcription(
+        name, TranscriptionResult(text="text", language="en"), None,
+        db_session, plan, latency
+    )
+
+
+def test_tier_stats(db_session):
+    """Test that the SLA hit rate and strategies are reported per tier."""
+    interactive = DecodingPlan(STRATEGIES[0], "interactive", 10.0)
+    batch = DecodingPlan(STRATEGIES[-1], "batch", None)
+    save(db_session, "a.wav", interactive, 4.0)
+    save(db_session, "b.wav", interactive, 12.0)
+    save(db_session, "e.wav", interactive, 9.0)
+    save(db_session, "f.wav", interactive, 3.0)
+    saved = save(db_session, "c.wav", batch, 90.0)
+    save_transcription(
+        "d.wav", TranscriptionResult(text="text"), None, db_session
+    )
+
+    assert saved.as_JSON()["decoding_strategy"] == "small/beam5+fallback"
+    assert saved.sla_met is None
+    stats = tier_stats(db_session)
+
+    assert set(stats) == {"interactive", "batch"}
+    assert stats["interactive"]["transcriptions"] == 4
+    assert stats["interactive"]["sla_met"] == 3
+    assert stats["interactive"]["sla_hit_rate"] == 0.75
+    assert stats["interactive"]["latency_seconds"]["max"] == 12.0
+    assert stats["interactive"]["strategies"] == {"tiny/greedy": 4}
+    assert stats["batch"]["sla_hit_rate"] is None
+    untiered = db_session.query(TranscriptionModel).filter_by(
+        audio_file_name="d.wav"
+    ).one()
+    assert untiered.decoding_strategy is None
@@ -0,0 +1,107 @@
+import io
+from unittest.mock import patch
+
+import pytest
+
+from htx_transcriber.loadgen import (
+    Sample,
+    StubProcessor,
+    find_saturation,
+    make_wav,
+    parse_mix,
+    parse_upload_mix,
+    summarize,
+)
+from htx_transcriber.services.audio_probe import probe_audio
+
+
+def test_parse_mix():
+    """Test that request and upload mixes are parsed and validated."""
+    assert parse_mix("transcribe=1,search=2.5") == [
+        ("transcribe", 1.0), ("search", 2.5)
+    ]
+    assert parse_upload_mix("10:6,600:1") == [(10.0, 6.0), (600.0, 1.0)]
+    for spec in ("upload=1", "search", "search=-1", "search=0"):
+        with pytest.raises(ValueError):
+            parse_mix(spec)
+    with pytest.raises(ValueError):
+        parse_upload_mix("0:1")
+
+
+def test_make_wav_duration():
+    """Test that generated uploads have the requested format and length."""
+    metadata = probe_audio(io.BytesIO(make_wav(2.5, 16000, 2)))
+    assert metadata.duration == pytest.approx(2.5)
+    assert metadata.sample_rate == 16000
+    assert metadata.channels == 2
+
+
+def test_summarize():
+    """Test that latency counts successes and errors are broken down."""
+    samples = [
+        Sample("GET /search", 1.0, 0.1, 200),
+        Sample("GET /search", 1.0, 0.3, 200),
+        Sample("POST /transcribe", 1.0, 2.0, 200, decoded_seconds=60),
+        Sample("POST /transcribe", 1.0, 0.01, 503),
+    ]
+
+    report = summarize(samples, elapsed=2.0)
+
+    assert report["requests"] == 4
+    assert report["throughput"] == 1.5
+    assert report["error_rate"] == 0.25
+    assert report["decoded_seconds_per_second"] == 30
+    search = report["endpoints"]["GET /search"]
+    assert search["latency_ms"]["p50"] == 100
+    assert search["latency_ms"]["max"] == 300
+    transcribe = report["endpoints"]["POST /transcribe"]
+    assert transcribe["errors"] == {"503": 1}
+    assert transcribe["latency_ms"]["max"] == 2000
+
+
+def step(concurrency, throughput, error_rate=0.0):
+    return {
+        "concurrency": concurrency,
+        "throughput": throughput,
+        "error_rate": error_rate,
+    }
+
+
+def test_saturation_when_throughput_levels_off():
+    """Test that saturation is the last step that still scaled."""
+    saturation = find_saturation([step(1, 2), step(2, 4), step(4, 4.2)])
+    assert saturation["reached"]
+    assert saturation["reason"] == "throughput"
+    assert saturation["concurrency"] == 2
+    assert saturation["at_concurrency"] == 4
+
+
+def test_saturation_on_errors():
+    """Test that errors mark saturation even while throughput grows."""
+    saturation = find_saturation([step(1, 2), step(2, 4, error_rate=0.05)])
+    assert saturation["reason"] == "errors"
+    assert saturation["concurrency"] == 1
+
+    assert not find_saturation([step(1, 2), step(2, 4)])["reached"]
+
+
+def test_stub_processor():
+    """Test that the stub returns one searchable result per file."""
+    results = StubProcessor(rtf=0).transcribe_batch(["a.wav", "b.wav"])
+    assert len(results) == 2
+    assert all(result.language == "en" and result.text for result in results)
+
+
+@patch('htx_transcriber.loadgen.time.sleep')
+def test_stub_processor_sleeps_for_decoded_audio(mock_sleep, tmp_path):
+    """Test that the stub only takes time for Whisper's 30 second window."""
+    paths = []
+    for seconds in (600, 10):
+        path = tmp_path / f"{seconds}.wav"
+        path.write_bytes(make_wav(seconds, 8000, 1))
+        paths.append(path)
+
+    StubProcessor(rtf=0.1).transcribe_batch(paths)
+
+    mock_sleep.assert_called_once()
+    assert mock_sleep.call_args.args[0] == pytest.approx(4.0)
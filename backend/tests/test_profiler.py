@@ -0,0 +1,113 @@
+import sys
+import threading
+from unittest.mock import patch
+
+import pytest
+from fastapi import HTTPException
+
+from htx_transcriber.api.admin import require_admin
+from htx_transcriber.services.profiler import (
+    Profile,
+    ProfilerBusy,
+    SamplingProfiler,
+)
+
+
+def blocked_endpoint(started, release):
+    started.set()
+    release.wait()
+
+
+@pytest.fixture
+def endpoint_thread():
+    started, release = threading.Event(), threading.Event()
+    thread = threading.Thread(
+        target=blocked_endpoint, args=(started, release)
+    )
+    thread.start()
+    started.wait()
+    yield thread
+    release.set()
+    thread.join()
+
+
+def sample(profile, thread, seconds=0.01):
+    profile.add_stack(sys._current_frames()[thread.ident], seconds)
+
+
+def test_samples_are_attributed_to_routes(endpoint_thread):
+    """Test that stacks are recorded from the endpoint frame down."""
+    profile = Profile(0.01, {blocked_endpoint.__code__: "POST /transcribe"})
+    sample(profile, endpoint_thread)
+    sample(profile, endpoint_thread)
+
+    [line] = profile.collapsed().splitlines()
+    stack, count = line.rsplit(" ", 1)
+    frames = stack.split(";")
+    assert count == "2"
+    assert frames[0] == "POST /transcribe"
+    assert frames[1].startswith("blocked_endpoint (")
+    assert frames[-1].startswith("Condition.wait (")
+
+
+def test_threads_without_application_code_are_skipped(endpoint_thread):
+    """Test that stacks with no route or application frame are dropped."""
+    profile = Profile(0.01, {})
+    sample(profile, endpoint_thread)
+    assert profile.collapsed() == "\n"
+
+
+def test_speedscope_profile_per_route(endpoint_thread):
+    """Test that speedscope output has one weighted profile per route."""
+    profile = Profile(0.01, {blocked_endpoint.__code__: "GET /search"})
+    profile.requests["GET /search"] = 3
+    sample(profile, endpoint_thread, 0.02)
+    sample(profile, endpoint_thread, 0.03)
+
+    result = profile.speedscope()
+
+    [route_profile] = result["profiles"]
+    assert route_profile["name"] == "GET /search (3 requests)"
+    assert route_profile["weights"] == [pytest.approx(0.05)]
+    frames = result["shared"]["frames"]
+    assert frames[route_profile["samples"][0][0]]["name"] == (
+        "blocked_endpoint"
+    )
+
+
+def test_profile_stops_after_requests():
+    """Test that a profile ends once enough requests finish."""
+    profiler = SamplingProfiler()
+    profile = profiler.start(seconds=30, interval=0.01, routes={}, requests=2)
+    with pytest.raises(ProfilerBusy):
+        profiler.start(seconds=30, interval=0.01, routes={})
+
+    profiler.request_finished("POST /transcribe")
+    profiler.request_finished("GET /transcriptions")
+
+    assert profiler.wait(5)
+    assert profiler.profile is None
+    assert profile.requests == {
+        "POST /transcribe": 1, "GET /transcriptions": 1
+    }
+    # Requests after the profile ended are not counted
+    profiler.request_finished("POST /transcribe")
+    assert profile.requests["POST /transcribe"] == 1
+
+
+def test_admin_endpoints_disabled_without_token():
+    """Test that admin endpoints are hidden when no token is set."""
+    with patch('htx_transcriber.api.admin.ADMIN_TOKEN', None):
+        with pytest.raises(HTTPException) as excinfo:
+            require_admin("anything")
+    assert excinfo.value.status_code == 404
+
+
+def test_admin_endpoints_require_token():
+    """Test that a wrong or missing admin token is rejected."""
+    with patch('htx_transcriber.api.admin.ADMIN_TOKEN', "secret"):
+        for token in (None, "wrong"):
+            with pytest.raises(HTTPException) as excinfo:
+                require_admin(token)
+            assert excinfo.value.status_code == 403
+        require_admin("secret")
@@ -0,0 +1,38 @@
+from types import SimpleNamespace
+
+from htx_transcriber.services.scheduler import (
+    WINDOW_SECONDS,
+    estimate_cost,
+    select_next,
+)
+
+
+def make_job(cost, enqueued_at):
+    return SimpleNamespace(cost=cost, enqueued_at=enqueued_at)
+
+
+def test_estimate_cost_uses_window_for_unknown_duration():
+    assert estimate_cost([10.0, None]) == 10.0 + WINDOW_SECONDS
+
+
+def test_estimate_cost_counts_only_decoded_audio():
+    """Test that a long file costs one window, like the audio decoded."""
+    assert estimate_cost([600.0]) == WINDOW_SECONDS
+    assert estimate_cost([600.0, 10.0]) == WINDOW_SECONDS + 10.0
+    assert estimate_cost([10.0] * 4) > estimate_cost([2400.0])
+
+
+def test_select_next_prefers_shortest_job():
+    jobs = [make_job(2400, 0.0), make_job(10, 1.0), make_job(10, 0.5)]
+    assert select_next(jobs, now=2.0, max_delay=15) is jobs[2]
+
+
+def test_select_next_serves_overdue_job_first():
+    """Test that a long job is not starved by a stream of short ones."""
+    jobs = [make_job(2400, 0.0), make_job(10, 14.0), make_job(5, 15.0)]
+    assert select_next(jobs, now=16.0, max_delay=15) is jobs[0]
+
+
+def test_select_next_without_delay_is_first_come_first_served():
+    jobs = [make_job(2400, 1.0), make_job(10, 0.5), make_job(5, 2.0)]
+    assert select_next(jobs, now=3.0, max_delay=0) is jobs[1]
@@ -0,0 +1,82 @@
+import logging
+import threading
+import time
+from unittest.mock import patch
+
+from htx_transcriber.server import Arbiter
+
+
+def fast_restarts(function):
+    for name, value in (
+        ("RESTART_DELAY", 0.01),
+        ("POLL_INTERVAL", 0.01),
+        ("MAX_FAST_CRASHES", 3),
+    ):
+        function = patch(f"htx_transcriber.server.{name}", value)(function)
+    return function
+
+
+@fast_restarts
+@patch("htx_transcriber.server.run_worker")
+def test_arbiter_gives_up_on_workers_crashing_at_startup(
+    mock_run_worker, caplog
+):
+    """Test that crashes are reported and not restarted forever."""
+    mock_run_worker.side_effect = RuntimeError("bad config")
+    arbiter = Arbiter(sock=None, workers=1, threads=0)
+
+    arbiter.run()
+
+    assert arbiter.failed
+    assert not arbiter.workers
+    exits = [
+        record.getMessage() for record in caplog.records
+        if "exited with status" in record.getMessage()
+    ]
+    assert len(exits) == 3
+    assert all("status 1" in message for message in exits)
+
+
+@fast_restarts
+@patch("htx_transcriber.server.MIN_WORKER_UPTIME", 0)
+@patch("htx_transcriber.server.run_worker")
+def test_arbiter_restarts_workers_until_stopped(mock_run_worker, caplog):
+    """Test that workers that exit are reaped and started again."""
+    caplog.set_level(logging.INFO, logger="htx_transcriber.server")
+    mock_run_worker.side_effect = lambda sock, threads: time.sleep(0.05)
+    arbiter = Arbiter(sock=None, workers=2, threads=0)
+    stop = threading.Timer(0.5, arbiter.handle_stop, (None, None))
+    stop.start()
+
+    arbiter.run()
+
+    assert not arbiter.failed
+    assert not arbiter.workers
+    assert not arbiter.restarts
+    started = [
+        record for record in caplog.records
+        if record.getMessage().startswith("Started worker")
+    ]
+    assert len(started) > 2
+
+
+@patch("htx_transcriber.server.POLL_INTERVAL", 0.01)
+@patch("htx_transcriber.server.RESTART_DELAY", 30)
+@patch("htx_transcriber.server.run_worker")
+def test_arbiter_stop_cancels_pending_restart(mock_run_worker, caplog):
+    """Test that a worker waiting to restart is not started on shutdown."""
+    caplog.set_level(logging.INFO, logger="htx_transcriber.server")
+    arbiter = Arbiter(sock=None, workers=1, threads=0)
+    stop = threading.Timer(0.3, arbiter.handle_stop, (None, None))
+    stop.start()
+    started_at = time.monotonic()
+
+    arbiter.run()
+
+    assert time.monotonic() - started_at < 5
+    assert not arbiter.restarts
+    started = [
+        record for record in caplog.records
+        if record.getMessage().startswith("Started worker")
+    ]
+    assert len(started) == 1
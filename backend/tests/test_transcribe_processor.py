@@ -0,0 +1,195 @@
+import torch
+from unittest.mock import MagicMock, patch
+
+from htx_transcriber.services.decoding_strategy import (
+    DEFAULT_STRATEGY,
+    DecodingStrategy,
+)
+from htx_transcriber.services.transcribe_processor import (
+    WhisperProcessor,
+    get_processor,
+    transcribe_audio_files,
+)
+
+
+def load_mel(audio_path):
+    if audio_path == "bad.mp3":
+        raise RuntimeError("corrupt")
+    # Tag each mel with the first letter of its file name
+    return torch.full((2,), float(ord(audio_path[0])))
+
+
+def make_processor(languages):
+    """Create a processor whose model stages are mocked."""
+    processor = WhisperProcessor.__new__(WhisperProcessor)
+    processor.model = MagicMock()
+    processor.load_mel = MagicMock(side_effect=load_mel)
+    processor.encode = MagicMock(side_effect=lambda mels: torch.stack(mels))
+    processor.detect_languages = MagicMock(
+        side_effect=lambda features: [
+            languages.pop(0) for _ in range(features.shape[0])
+        ]
+    )
+    processor.decode = MagicMock(
+        side_effect=lambda features, language, strategy: [
+            f"{language} text"
+        ] * features.shape[0]
+    )
+    return processor
+
+
+def test_transcribe_batch_decodes_by_language():
+    """Test that files are decoded in batches grouped by language."""
+    processor = make_processor([("en", 0.9), ("fr", 0.8), ("en", 0.7)])
+
+    results = processor.transcribe_batch(
+        ["a.mp3", "b.mp3", "c.mp3"], batch_size=2
+    )
+
+    assert [result.language for result in results] == ["en", "fr", "en"]
+    assert [result.text for result in results] == [
+        "en text", "fr text", "en text"
+    ]
+    assert results[1].language_probability == 0.8
+    # Languages are detected once per encoded batch
+    assert processor.detect_languages.call_count == 2
+    # One decode per language, with the language set explicitly
+    decoded = [call.args[1] for call in processor.decode.call_args_list]
+    assert decoded == ["en", "fr"]
+
+
+def test_transcribe_batch_isolates_failed_files():
+    """Test that a file which fails to load does not fail the batch."""
+    processor = make_processor([("en", 0.9)])
+
+    results = processor.transcribe_batch(["bad.mp3", "good.mp3"])
+
+    assert results[0].error == "Transcription failed: corrupt"
+    assert results[1].error is None
+    assert results[1].text == "en text"
+
+
+def test_transcribe_batch_encodes_in_upload_order():
+    """Test that files are encoded in batches of at most batch_size."""
+    processor = make_processor([("en", 0.9)] * 4)
+
+    results = processor.transcribe_batch(
+        ["a.mp3", "b.mp3", "c.mp3", "d.mp3"], batch_size=2
+    )
+
+    batches = [
+        [chr(int(mel[0])) for mel in call.args[0]]
+        for call in processor.encode.call_args_list
+    ]
+    assert batches == [["a", "b"], ["c", "d"]]
+    assert processor.decode.call_count == 2
+    assert [result.text for result in results] == ["en text"] * 4
+
+
+@patch('htx_transcriber.services.transcribe_processor.real_time_factors')
+@patch('htx_transcriber.services.transcribe_processor.get_processor')
+def test_real_time_factor_counts_decoded_audio(mock_get, mock_factors):
+    """Test that only the 30 seconds decoded of a long file are measured."""
+    mock_get.return_value.transcribe_batch.return_value = []
+
+    transcribe_audio_files(["long.mp3", "short.mp3"], [600.0, 10.0])
+
+    strategy, audio_seconds, _ = mock_factors.record.call_args.args
+    assert strategy == DEFAULT_STRATEGY
+    assert audio_seconds == 40.0
+
+
+def decoding_result(
+    text, compression_ratio=1.5, avg_logprob=-0.3, no_speech_prob=0.1
+):
+    return MagicMock(
+        text=text,
+        compression_ratio=compression_ratio,
+        avg_logprob=avg_logprob,
+        no_speech_prob=no_speech_prob
+    )
+
+
+@patch('htx_transcriber.services.transcribe_processor.whisper.decode')
+def test_decode_falls_back_to_higher_temperatures(mock_decode):
+    """Test that only failed decodes are retried at the next temperature."""
+    mock_decode.side_effect = [
+        [decoding_result("ok"), decoding_result("again again", 3.0)],
+        [decoding_result("unsure", avg_logprob=-2.0)],
+        [decoding_result("fixed")],
+    ]
+    processor = WhisperProcessor.__new__(WhisperProcessor)
+    processor.model = MagicMock()
+    strategy = DecodingStrategy("tiny", None, (0.0, 0.2, 0.4, 0.6))
+
+    texts = processor.decode(torch.zeros(2, 3), "en", strategy)
+
+    assert texts == ["ok", "fixed"]
+    options = [call.args[2] for call in mock_decode.call_args_list]
+    assert [option.temperature for option in options] == [0.0, 0.2, 0.4]
+    # Retries decode only the failed item
+    assert mock_decode.call_args_list[1].args[1].shape[0] == 1
+
+
+@patch('htx_transcriber.services.transcribe_processor.whisper.decode')
+def test_decode_does_not_retry_silence(mock_decode):
+    """Test that a silent window is kept even when it looks repetitive."""
+    mock_decode.return_value = [
+        decoding_result("", 3.0, avg_logprob=-2.0, no_speech_prob=0.9)
+    ]
+    processor = WhisperProcessor.__new__(WhisperProcessor)
+    processor.model = MagicMock()
+    strategy = DecodingStrategy("tiny", None, (0.0, 0.2))
+
+    assert processor.decode(torch.zeros(1, 3), "en", strategy) == [""]
+    mock_decode.assert_called_once()
+
+
+@patch('htx_transcriber.services.transcribe_processor.whisper.decode')
+def test_beam_search_decodes_items_one_at_a_time(mock_decode):
+    """Test that beam search and its fallback sample per item."""
+    mock_decode.side_effect = [
+        decoding_result("ok"),
+        decoding_result("again again", 3.0),
+        decoding_result("fixed"),
+    ]
+    processor = WhisperProcessor.__new__(WhisperProcessor)
+    processor.model = MagicMock()
+    strategy = DecodingStrategy("tiny", 5, (0.0, 0.2))
+
+    texts = processor.decode(torch.zeros(2, 3), "en", strategy)
+
+    assert texts == ["ok", "fixed"]
+    options = [call.args[2] for call in mock_decode.call_args_list]
+    assert [option.beam_size for option in options] == [5, 5, None]
+    assert options[2].temperature == 0.2
+    assert options[2].best_of == 5
+
+
+@patch('htx_transcriber.services.transcribe_processor.whisper.decode')
+def test_greedy_decode_does_not_fall_back(mock_decode):
+    """Test that the default strategy decodes once, greedily."""
+    mock_decode.return_value = [decoding_result("loop loop", 3.0)]
+    processor = WhisperProcessor.__new__(WhisperProcessor)
+    processor.model = MagicMock()
+
+    assert processor.decode(torch.zeros(1, 3), "en") == ["loop loop"]
+    [call] = mock_decode.call_args_list
+    assert call.args[2].beam_size is None
+
+
+@patch.dict(
+    'htx_transcriber.services.transcribe_processor._processors', clear=True
+)
+@patch('htx_transcriber.services.transcribe_processor.WhisperProcessor')
+def test_get_processor_loads_each_model_once(mock_processor):
+    """Test that processors are cached per model."""
+    mock_processor.side_effect = lambda name: MagicMock(name=name)
+
+    tiny = get_processor("tiny")
+
+    assert get_processor("tiny") is tiny
+    assert get_processor("small") is not tiny
+    assert [call.args for call in mock_processor.call_args_list] == [
+        ("tiny",), ("small",)
+    ]
@@ -0,0 +1,171 @@
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import text
+
+from htx_transcriber.models.compressed_text import (
+    TranscriptCodec,
+    dictionary_loader,
+    is_compressed,
+)
+from htx_transcriber.models.transcription import TranscriptionModel
+from htx_transcriber.services.transcript_storage import (
+    convert_transcriptions,
+    train_dictionary,
+)
+
+zstandard = pytest.importorskip("zstandard")
+
+WORDS = (
+    "the meeting starts at nine and the team reviews the audio files "
+    "before the transcripts are shared with everyone on the project"
+).split()
+
+
+def make_transcripts(count):
+    return [
+        " ".join(WORDS[(index + offset) % len(WORDS)] for offset in range(80))
+        + f" item {index}"
+        for index in range(count)
+    ]
+
+
+def raw_values(db_session):
+    return db_session.execute(
+        text("SELECT transcribed_text FROM transcriptions ORDER BY id")
+    ).scalars().all()
+
+
+def add_transcripts(db_session, transcripts):
+    for index, transcript in enumerate(transcripts):
+        db_session.add(TranscriptionModel(
+            audio_file_name=f"audio{index}_ver_1.mp3",
+            transcribed_text=transcript,
+            created_at=datetime.now(),
+            updated_at=datetime.now()
+        ))
+    db_session.commit()
+
+
+def test_codec_round_trip_with_dictionary(engine):
+    """Test that frames carry their dictionary and decompress with it."""
+    writer = TranscriptCodec(True, dictionary_loader(engine))
+    samples = [sample.encode() for sample in make_transcripts(200)]
+    dictionary = zstandard.train_dictionary(4096, samples)
+    writer.use_dictionary(dictionary.dict_id(), dictionary.as_bytes())
+
+    value = writer.compress("hello world")
+    assert is_compressed(value)
+    assert zstandard.get_frame_parameters(value).dict_id == (
+        dictionary.dict_id()
+    )
+    assert writer.decompress(value) == "hello world"
+
+    # Another codec only finds the dictionary through its loader
+    reader = TranscriptCodec(
+        False,
+        lambda dict_id: (dict_id, dictionary.as_bytes())
+        if dict_id == dictionary.dict_id() else None
+    )
+    assert reader.decompress(value) == "hello world"
+    with pytest.raises(ValueError):
+        TranscriptCodec(False, lambda dict_id: None).decompress(value)
+
+
+def test_codec_passes_plain_text_through(engine):
+    """Test that disabled compression stores and reads plain text."""
+    codec = TranscriptCodec(False, dictionary_loader(engine))
+    assert codec.compress("hello") == "hello"
+    assert codec.decompress("hello") == "hello"
+
+
+def test_compressed_column_round_trip(db_session, engine):
+    """Test that the column stores zstd frames and reads back text."""
+    codec = TranscriptCodec(True, dictionary_loader(engine))
+    with patch(
+        "htx_transcriber.models.compressed_text.transcript_codec", codec
+    ):
+        add_transcripts(db_session, ["First transcription"])
+        db_session.expire_all()
+        transcription = db_session.query(TranscriptionModel).one()
+        assert transcription.transcribed_text == "First transcription"
+    assert is_compressed(raw_values(db_session)[0])
+
+
+def test_convert_transcriptions_in_batches(db_session, engine):
+    """Test that stored rows are compressed and restored in batches."""
+    transcripts = make_transcripts(5)
+    add_transcripts(db_session, transcripts)
+    codec = TranscriptCodec(True, dictionary_loader(engine))
+
+    connection = db_session.connection()
+    assert convert_transcriptions(
+        connection, codec, compress=True, batch_size=2
+    ) == 5
+    assert all(is_compressed(value) for value in raw_values(db_session))
+    # Converted rows are skipped when the conversion runs again
+    assert convert_transcriptions(connection, codec, compress=True) == 0
+
+    assert convert_transcriptions(
+        connection, codec, compress=False, batch_size=2
+    ) == 5
+    assert raw_values(db_session) == transcripts
+
+
+def test_convert_requires_compression_enabled(db_session, engine):
+    """Test that compressing with a disabled codec is refused."""
+    codec = TranscriptCodec(False, dictionary_loader(engine))
+    with pytest.raises(ValueError):
+        convert_transcriptions(db_session.connection(), codec, compress=True)
+
+
+def test_train_dictionary(db_session, engine):
+    """Test that a trained dictionary is stored and used for new rows."""
+    add_transcripts(db_session, make_transcripts(60))
+    codec = TranscriptCodec(True, dictionary_loader(engine))
+
+    dict_id = train_dictionary(db_session.connection(), codec, dict_size=4096)
+    db_session.commit()
+
+    value = codec.compress("the meeting starts at nine")
+    assert zstandard.get_frame_parameters(value).dict_id == dict_id
+    # A fresh codec loads the newest dictionary from the table
+    fresh = TranscriptCodec(True, dictionary_loader(engine))
+    value = fresh.compress("the meeting starts at nine")
+    assert zstandard.get_frame_parameters(value).dict_id == dict_id
+
+
+@patch('htx_transcriber.models.compressed_text.time.monotonic')
+def test_codec_picks_up_new_dictionary(mock_monotonic):
+    """Test that a dictionary trained elsewhere is used after a while."""
+    samples = [sample.encode() for sample in make_transcripts(200)]
+    dictionary = zstandard.train_dictionary(4096, samples)
+    dictionaries = []
+    codec = TranscriptCodec(
+        True,
+        lambda dict_id: dictionaries[-1] if dictionaries else None,
+        refresh_interval=60
+    )
+    mock_monotonic.return_value = 1000.0
+    value = codec.compress("hello world")
+    assert zstandard.get_frame_parameters(value).dict_id == 0
+
+    dictionaries.append((dictionary.dict_id(), dictionary.as_bytes()))
+    mock_monotonic.return_value = 1030.0
+    value = codec.compress("hello world")
+    assert zstandard.get_frame_parameters(value).dict_id == 0
+    mock_monotonic.return_value = 1060.0
+    value = codec.compress("hello world")
+    assert zstandard.get_frame_parameters(value).dict_id == (
+        dictionary.dict_id()
+    )
+    assert codec.decompress(value) == "hello world"
+
+
+def test_train_dictionary_needs_enough_transcripts(db_session, engine):
+    """Test that training on too few transcripts is refused."""
+    add_transcripts(db_session, make_transcripts(3))
+    codec = TranscriptCodec(True, dictionary_loader(engine))
+    with pytest.raises(ValueError):
+        train_dictionary(db_session.connection(), codec)
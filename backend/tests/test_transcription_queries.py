@@ -53,3 +53,33 @@ def test_search_transcriptions_case_insensitive(
 
     assert len(result) == 1
     assert result[0]["audio_file_name"] == "audio2_ver_1.mp3"
+
+
+def test_filter_transcriptions_by_language(
+    db_session, multiple_transcriptions
+):
+    """Test filtering transcriptions by detected language."""
+    multiple_transcriptions[0].language = "fr"
+    multiple_transcriptions[1].language = "en"
+    db_session.commit()
+
+    result = get_all_transcriptions(db_session, language="fr")
+    assert [item["audio_file_name"] for item in result] == [
+        "audio1_ver_1.mp3"
+    ]
+
+    result = search_transcriptions("audio", db_session, language="en")
+    assert [item["audio_file_name"] for item in result] == [
+        "audio2_ver_1.mp3"
+    ]
+
+
+def test_get_transcriptions_without_text(db_session, multiple_transcriptions):
+    """Test that metadata-only listing leaves the transcript out."""
+    result = get_all_transcriptions(db_session, include_text=False)
+    assert len(result) == 3
+    assert all("transcribed_text" not in item for item in result)
+
+    result = search_transcriptions("audio1", db_session, include_text=False)
+    assert result[0]["audio_file_name"] == "audio1_ver_1.mp3"
+    assert "transcribed_text" not in result[0]
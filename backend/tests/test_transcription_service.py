@@ -5,6 +5,7 @@ from fastapi import HTTPException
 
 from htx_transcriber.services.transcription_service import (
     process_audio_file,
+    process_audio_files,
     validate_audio_file,
     get_all_transcriptions,
     search_transcriptions,
@@ -12,7 +13,10 @@ from htx_transcriber.services.transcription_service import (
     STATUS_ERROR,
     ALLOWED_AUDIO_TYPES
 )
-from htx_transcriber.services.transcribe_processor import TranscriptionError
+from htx_transcriber.services.transcribe_processor import (
+    TranscriptionError,
+    TranscriptionResult
+)
 from htx_transcriber.models.transcription import TranscriptionModel
 
 
@@ -71,7 +75,7 @@ def test_validate_audio_file_missing_content_type():
 
 
 # Processing tests
-@patch('htx_transcriber.services.transcription_service.transcribe_audio')
+@patch('htx_transcriber.services.transcription_service.transcribe_audio_files')
 @patch('htx_transcriber.services.transcription_service.UPLOAD_DIR', 
        Path('/tmp/uploads'))
 @patch('os.path.exists')
@@ -83,7 +87,9 @@ def test_process_audio_file_success(
     """Test successful processing of an audio file."""
     # Setup mocks
     mock_exists.return_value = False
-    mock_transcribe.return_value = "Transcribed text"
+    mock_transcribe.return_value = [
+        TranscriptionResult("Transcribed text", "en", 0.97)
+    ]
 
     # Call the function
     result = process_audio_file(mock_upload_file, db_session)
@@ -102,9 +108,11 @@ def test_process_audio_file_success(
     assert transcription is not None
     assert transcription.audio_file_name == "sample_audio_ver_1.mp3"
     assert transcription.transcribed_text == "Transcribed text"
+    assert transcription.language == "en"
+    assert transcription.language_probability == 0.97
 
 
-@patch('htx_transcriber.services.transcription_service.transcribe_audio')
+@patch('htx_transcriber.services.transcription_service.transcribe_audio_files')
 def test_process_audio_file_transcription_error(
     mock_transcribe, db_session, mock_upload_file
 ):
@@ -124,14 +132,16 @@ def test_process_audio_file_transcription_error(
     assert transcription is None
 
 
-@patch('htx_transcriber.services.transcription_service.transcribe_audio')
+@patch('htx_transcriber.services.transcription_service.transcribe_audio_files')
 def test_process_audio_file_existing_file(
     mock_transcribe, db_session, mock_upload_file, sample_transcription
 ):
     """Test handling of existing files."""
     # Setup mocks
     mock_upload_file.filename = "sample_audio.mp3"
-    mock_transcribe.return_value = "New transcribed text"
+    mock_transcribe.return_value = [
+        TranscriptionResult("New transcribed text", "en", 0.9)
+    ]
 
     # Call the function
     result = process_audio_file(mock_upload_file, db_session)
@@ -165,6 +175,36 @@ def test_process_audio_file_missing_filename(db_session):
     assert transcription is None
 
 
+@patch('htx_transcriber.services.transcription_service.transcribe_audio_files')
+@patch('htx_transcriber.services.transcription_service.save_audio_file')
+def test_process_audio_files_batch(
+    mock_save, mock_transcribe, db_session
+):
+    """Test that a batch is transcribed in one call and keeps its order."""
+    files = []
+    for name in ["first.mp3", "second.mp3", None]:
+        file = MagicMock()
+        file.filename = name
+        files.append(file)
+    mock_save.side_effect = lambda f, db, reserved: Path(f.filename)
+    mock_transcribe.return_value = [
+        TranscriptionResult("Bonjour", "fr", 0.8),
+        TranscriptionResult(error="Transcription failed: corrupt"),
+    ]
+
+    results = process_audio_files(files, db_session)
+
+    mock_transcribe.assert_called_once_with(
+        [Path("first.mp3"), Path("second.mp3")], [None, None], None
+    )
+    assert results[0]["status"] == STATUS_SUCCESS
+    assert results[0]["transcription"]["language"] == "fr"
+    assert results[1]["status"] == STATUS_ERROR
+    assert "corrupt" in results[1]["message"]
+    assert results[2]["message"] == "Filename is missing"
+    assert db_session.query(TranscriptionModel).count() == 1
+
+
 # Query tests
 def test_get_all_transcriptions_empty(db_session):
     """Test getting all transcriptions when database is empty."""
@@ -0,0 +1,316 @@
+import hashlib
+import io
+import os
+import wave
+from datetime import datetime, timedelta
+import pytest
+from unittest.mock import patch
+from fastapi import HTTPException
+
+from htx_transcriber.models.transcription import TranscriptionModel
+from htx_transcriber.models.upload_session import (
+    UploadSessionModel,
+    UploadChunkModel,
+    EARLY_STATUS_DONE,
+    EARLY_STATUS_RUNNING,
+    UPLOAD_STATUS_OPEN,
+    UPLOAD_STATUS_COMPLETING,
+    UPLOAD_STATUS_COMPLETE,
+)
+from htx_transcriber.services.decoding_strategy import DEFAULT_STRATEGY
+from htx_transcriber.services.transcribe_processor import TranscriptionResult
+from htx_transcriber.services.upload_service import (
+    complete_upload,
+    create_upload_session,
+    expire_upload_sessions,
+    missing_ranges,
+    run_early_transcription,
+    write_chunk,
+)
+
+
+def make_wav_bytes(seconds):
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(16000)
+        wav.writeframes(b"\x01\x00" * 16000 * seconds)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def upload_dir(tmp_path):
+    with patch(
+        'htx_transcriber.services.upload_service.UPLOAD_DIR', tmp_path
+    ):
+        yield tmp_path
+
+
+def start_upload(data, db_session, sha256=None):
+    return create_upload_session(
+        "lecture.wav", "audio/wav", len(data), sha256, db_session
+    )
+
+
+def test_missing_ranges():
+    assert missing_ranges([(0, 10), (20, 30)], 40) == [(10, 20), (30, 40)]
+    assert missing_ranges([], 5) == [(0, 5)]
+    assert missing_ranges([(0, 5)], 5) == []
+
+
+def test_write_chunks_out_of_order(db_session, upload_dir):
+    """Test that chunks can arrive in any order and are merged."""
+    data = b"abcdefghij"
+    session = start_upload(data, db_session)
+
+    status, _ = write_chunk(session.id, 5, data[5:], None, db_session)
+    assert status["missing"] == [(0, 5)]
+    status, _ = write_chunk(session.id, 0, data[:5], None, db_session)
+
+    assert status["received"] == [(0, 10)]
+    assert status["bytes_received"] == 10
+    assert (upload_dir / ".partial" / session.id).read_bytes() == data
+
+
+def test_write_chunk_rejects_bad_checksum(db_session, upload_dir):
+    session = start_upload(b"abcdefghij", db_session)
+
+    with pytest.raises(HTTPException) as excinfo:
+        write_chunk(session.id, 0, b"abcde", "0" * 64, db_session)
+
+    assert excinfo.value.status_code == 400
+    assert "checksum" in excinfo.value.detail
+
+
+def test_write_chunk_rejects_out_of_range(db_session, upload_dir):
+    session = start_upload(b"abcdefghij", db_session)
+
+    with pytest.raises(HTTPException) as excinfo:
+        write_chunk(session.id, 8, b"abcde", None, db_session)
+
+    assert excinfo.value.status_code == 400
+
+
+def test_complete_upload_rejects_missing_bytes(db_session, upload_dir):
+    session = start_upload(b"abcdefghij", db_session)
+    write_chunk(session.id, 0, b"abcde", None, db_session)
+
+    with pytest.raises(HTTPException) as excinfo:
+        complete_upload(session.id, db_session)
+
+    assert excinfo.value.status_code == 409
+    assert excinfo.value.detail["missing"] == [(5, 10)]
+
+
+@patch('htx_transcriber.services.upload_service.transcribe_audio_files')
+@patch(
+    'htx_transcriber.services.upload_service.claim_early_transcription',
+    return_value=None
+)
+def test_complete_upload_transcribes_file(
+    mock_claim, mock_transcribe, db_session, upload_dir
+):
+    """Test that a completed upload is verified, moved and transcribed."""
+    data = make_wav_bytes(seconds=1)
+    session = start_upload(
+        data, db_session, sha256=hashlib.sha256(data).hexdigest()
+    )
+    mock_transcribe.return_value = [TranscriptionResult("Hello", "en", 0.9)]
+    for offset in range(0, len(data), 8192):
+        write_chunk(
+            session.id, offset, data[offset:offset + 8192], None, db_session
+        )
+
+    result = complete_upload(session.id, db_session)
+
+    assert result["filename"] == "lecture_ver_1.wav"
+    assert result["transcription"]["transcribed_text"] == "Hello"
+    assert result["transcription"]["duration"] == 1
+    assert (upload_dir / "lecture_ver_1.wav").read_bytes() == data
+    assert db_session.get(UploadSessionModel, session.id).status == \
+        UPLOAD_STATUS_COMPLETE
+    # Completing again returns the same transcription
+    assert complete_upload(session.id, db_session) == result
+    assert db_session.query(TranscriptionModel).count() == 1
+
+
+@patch('htx_transcriber.services.upload_service.transcribe_audio_files')
+def test_early_transcription_is_used_on_complete(
+    mock_transcribe, db_session, session_factory, upload_dir
+):
+    """Test that the first window is transcribed before the upload ends."""
+    data = make_wav_bytes(seconds=120)
+    session = start_upload(data, db_session)
+    mock_transcribe.return_value = [TranscriptionResult("Early", "en", 0.8)]
+
+    # The first half of a two minute file covers the 30 second window
+    half = len(data) // 2
+    _, window_bytes = write_chunk(
+        session.id, 0, data[:half], None, db_session
+    )
+    assert window_bytes is not None and window_bytes < half
+    run_early_transcription(session.id, window_bytes, session_factory)
+    db_session.refresh(session)
+    assert session.early_status == EARLY_STATUS_DONE
+
+    _, window_bytes = write_chunk(
+        session.id, half, data[half:], None, db_session
+    )
+    assert window_bytes is None
+    result = complete_upload(session.id, db_session)
+
+    assert result["transcription"]["transcribed_text"] == "Early"
+    mock_transcribe.assert_called_once()
+
+
+def write_early_transcription(data, db_session, session_factory):
+    """Send the first half of `data` and transcribe its first window."""
+    session = start_upload(data, db_session)
+    _, window_bytes = write_chunk(
+        session.id, 0, data[:len(data) // 2], None, db_session
+    )
+    run_early_transcription(session.id, window_bytes, session_factory)
+    write_chunk(
+        session.id, len(data) // 2, data[len(data) // 2:], None, db_session
+    )
+    return session
+
+
+@patch('htx_transcriber.services.upload_service.transcribe_audio_files')
+def test_rewritten_head_is_transcribed_again(
+    mock_transcribe, db_session, session_factory, upload_dir
+):
+    """Test that an early transcript of bytes since replaced is unused."""
+    data = make_wav_bytes(seconds=120)
+    mock_transcribe.side_effect = [
+        [TranscriptionResult("Early", "en", 0.8)],
+        [TranscriptionResult("Full", "en", 0.9)],
+    ]
+    session = write_early_transcription(data, db_session, session_factory)
+
+    write_chunk(session.id, 1000, b"\x00" * 1000, None, db_session)
+    result = complete_upload(session.id, db_session)
+
+    assert result["transcription"]["transcribed_text"] == "Full"
+    assert mock_transcribe.call_count == 2
+
+
+@patch('htx_transcriber.services.upload_service.transcribe_audio_files')
+def test_complete_upload_decodes_for_tier(
+    mock_transcribe, db_session, session_factory, upload_dir
+):
+    """Test that a tier is planned and recorded as for /transcribe."""
+    data = make_wav_bytes(seconds=120)
+    mock_transcribe.side_effect = [
+        [TranscriptionResult("Early", "en", 0.8)],
+        [TranscriptionResult("Full", "en", 0.9)],
+    ]
+    session = write_early_transcription(data, db_session, session_factory)
+
+    result = complete_upload(session.id, db_session, tier="batch")
+
+    transcription = result["transcription"]
+    assert transcription["transcribed_text"] == "Full"
+    assert transcription["quality_tier"] == "batch"
+    strategy = mock_transcribe.call_args.args[2]
+    assert strategy != DEFAULT_STRATEGY
+    assert transcription["decoding_strategy"] == strategy.name
+
+
+@patch('htx_transcriber.services.upload_service.transcribe_audio_files')
+def test_early_transcription_of_expired_upload(
+    mock_transcribe, db_session, session_factory, upload_dir
+):
+    """Test that an upload expiring mid transcription is left deleted."""
+    data = make_wav_bytes(seconds=120)
+    session = start_upload(data, db_session)
+    write_chunk(session.id, 0, data[:len(data) // 2], None, db_session)
+    db_session.refresh(session)
+    assert session.early_status == EARLY_STATUS_RUNNING
+    session_id = session.id
+
+    def expire(*args):
+        session.updated_at = datetime.now() - timedelta(days=2)
+        db_session.commit()
+        expire_upload_sessions(session_factory)
+        return [TranscriptionResult("Early", "en", 0.8)]
+
+    mock_transcribe.side_effect = expire
+    run_early_transcription(session_id, 1000, session_factory)
+
+    db_session.expire_all()
+    assert db_session.get(UploadSessionModel, session_id) is None
+    # Nothing is left to transcribe once the partial file is gone
+    run_early_transcription(session_id, 1000, session_factory)
+    assert mock_transcribe.call_count == 1
+
+
+def test_complete_upload_is_claimed_once(db_session, upload_dir):
+    """Test that a completion running elsewhere is not repeated."""
+    data = make_wav_bytes(seconds=1)
+    session = start_upload(data, db_session)
+    write_chunk(session.id, 0, data, None, db_session)
+    session.status = UPLOAD_STATUS_COMPLETING
+    db_session.commit()
+
+    with pytest.raises(HTTPException) as excinfo:
+        complete_upload(session.id, db_session)
+
+    assert excinfo.value.status_code == 409
+    assert (upload_dir / ".partial" / session.id).exists()
+
+
+def test_failed_completion_reopens_upload(db_session, upload_dir):
+    """Test that an upload can be completed again after a failure."""
+    data = make_wav_bytes(seconds=1)
+    session = start_upload(data, db_session, sha256="0" * 64)
+    write_chunk(session.id, 0, data, None, db_session)
+
+    with pytest.raises(HTTPException) as excinfo:
+        complete_upload(session.id, db_session)
+
+    assert excinfo.value.status_code == 400
+    db_session.refresh(session)
+    assert session.status == UPLOAD_STATUS_OPEN
+
+
+@patch('htx_transcriber.services.transcription_service.MAX_AUDIO_DURATION', 60)
+def test_no_early_transcription_for_audio_too_long(db_session, upload_dir):
+    """Test that audio over the duration limit is never transcribed."""
+    data = make_wav_bytes(seconds=120)
+    session = start_upload(data, db_session)
+
+    _, window_bytes = write_chunk(
+        session.id, 0, data[:len(data) // 2], None, db_session
+    )
+
+    assert window_bytes is None
+    db_session.refresh(session)
+    assert session.early_status is None
+
+
+def test_expire_upload_sessions(db_session, session_factory, upload_dir):
+    """Test that stale sessions, their chunks and partial files go."""
+    stale = start_upload(b"abcdefghij", db_session)
+    write_chunk(stale.id, 0, b"abcde", None, db_session)
+    fresh = start_upload(b"abcdefghij", db_session)
+    stale.updated_at = datetime.now() - timedelta(days=2)
+    db_session.commit()
+    stale_id, fresh_id = stale.id, fresh.id
+    orphan = upload_dir / ".partial" / "orphan.head"
+    orphan.write_bytes(b"abc")
+    old = (datetime.now() - timedelta(days=2)).timestamp()
+    os.utime(orphan, (old, old))
+
+    assert expire_upload_sessions(session_factory) == 1
+
+    db_session.expire_all()
+    assert db_session.get(UploadSessionModel, stale_id) is None
+    assert db_session.query(UploadChunkModel).filter_by(
+        session_id=stale_id
+    ).count() == 0
+    assert not (upload_dir / ".partial" / stale_id).exists()
+    assert not orphan.exists()
+    assert db_session.get(UploadSessionModel, fresh_id) is not None
+    assert (upload_dir / ".partial" / fresh_id).exists()
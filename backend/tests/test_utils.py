@@ -1,5 +1,8 @@
+import sys
+import pytest
 from htx_transcriber.utils import (
     add_file_version,
+    read_memory_usage,
     split_file_name
 )
 
@@ -17,3 +20,15 @@ def test_add_file_version():
     assert add_file_version("test_2_ver_2.mp3") == "test_2_ver_3.mp3"
     assert add_file_version("test3.mp3") == "test3_ver_1.mp3"
     assert add_file_version("test_ver_3.mp3") == "test_ver_4.mp3"
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="needs /proc")
+def test_read_memory_usage():
+    usage = read_memory_usage()
+    assert usage["rss"] > 0
+    assert usage["pss"] > 0
+    assert usage["shared"] + usage["private"] == usage["rss"]
+
+
+def test_read_memory_usage_missing_process():
+    assert read_memory_usage(-1) == {}